@@ -1,20 +1,87 @@
 from pydantic_settings import BaseSettings
+import logging
 import os
 
 class Settings(BaseSettings):
+    LOG_LEVEL: str = "INFO"
     UPLOAD_DIR: str = "uploads"
     PROCESSED_DIR: str = "processed"
     MUSIC_UPLOAD_DIR: str = "bg_music"
     ALLOWED_EXTENSIONS: list = ["mp4", "mov", "avi"]
     CORS_ORIGINS: list = ["*"]
     WHISPER_MODEL: str = "base"
+    WHISPER_PRELOAD_MODELS: list = []
+    WHISPER_POOL_SIZE: int = 1
+    TRANSCRIBE_WORKERS: int = 1
+    TRANSCRIBE_TIMEOUT: float = 1800.0
+    TRANSCRIBE_CHUNKED: bool = True  # only with TRANSCRIBE_WORKERS (or WHISPER_POOL_SIZE when 0) > 1
+    TRANSCRIBE_CHUNK_SECONDS: float = 120.0
+    TRANSCRIBE_CHUNK_MIN_SECONDS: float = 600.0
+    TRANSCRIPT_CACHE_DIR: str = "transcripts"
+    TRANSCRIPT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    AUDIO_CACHE_DIR: str = "audio_cache"
+    RENDER_CACHE_DIR: str = "render_cache"
+    RENDER_CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    BROLL_DIR: str = "brolls"
+    BROLL_CACHE_DIR: str = "broll_cache"
+    STATE_DB_PATH: str = "state/state.db"  # ":memory:" only works with RENDER_WORKERS = 0
+    RENDER_WORKERS: int = 1  # worker processes started with the API; 0 = run jobs in the API process
+    WORKER_CONCURRENCY: int = 2
+    JOB_CONCURRENCY: dict = {
+        "ai_edit": 1,
+        "add_broll": 1,
+        "add_captions": 2,
+        "add_music": 2,
+        "remove_duplicates": 2,
+    }
+    JOB_MAX_LOAD: float = 1.0  # 1-minute load per core above which workers stop taking extra jobs
+    JOB_LEASE_SECONDS: float = 60.0
+    WORKER_POLL_SECONDS: float = 0.5
+    EVENTS_POLL_SECONDS: float = 0.5  # how often the event stream checks the task store
+    EVENTS_KEEPALIVE_SECONDS: float = 15.0
+    # Per directory setting: hours since last use before deletion, and total size cap (oldest go first)
+    STORAGE_RETENTION_HOURS: dict = {
+        "UPLOAD_DIR": 72,
+        "MUSIC_UPLOAD_DIR": 72,
+        "PROCESSED_DIR": 48,
+        "AUDIO_CACHE_DIR": 24,
+    }
+    STORAGE_QUOTA_BYTES: dict = {
+        "UPLOAD_DIR": 4 * 1024 * 1024 * 1024,
+        "MUSIC_UPLOAD_DIR": 512 * 1024 * 1024,
+        "PROCESSED_DIR": 4 * 1024 * 1024 * 1024,
+        "AUDIO_CACHE_DIR": 1024 * 1024 * 1024,
+    }
+    JANITOR_INTERVAL_SECONDS: float = 600.0
     DEFAULT_DUP_THRESH: float = 0.85
+    DEDUPE_SCOPE: str = "adjacent"  # adjacent | transcript
+    DEFAULT_DEDUPE_MODE: str = "transcript"  # transcript | visual | both
+    VISUAL_DEDUPE_FPS: float = 2.0
+    VISUAL_DEDUPE_MIN_SECONDS: float = 2.0
+    VISUAL_DEDUPE_MAX_DISTANCE: int = 3
+    DEFAULT_CUT_MODE: str = "reencode"  # reencode | smart
+    DEFAULT_MUSIC_MODE: str = "remux"
+    DEFAULT_ENCODER_PROFILE: str = "final"
+    PREVIEW_ENABLED: bool = True
     DEFAULT_FONT_SIZE: int = 28
+    DEFAULT_CAPTION_BACKEND: str = "ass"
+    DEFAULT_RENDER_MODE: str = "single"  # single | chunked
+    RENDER_CHUNK_WORKERS: int = 0  # 0 = one per CPU core, at most 4
+    RENDER_CHUNK_MIN_SECONDS: float = 60.0
     API_KEY: str = os.getenv("API_KEY", "sk-ADD YOUR KEY")
     BASE_URL: str = "https://api.deepseek.com"
     MODEL_NAME: str = "deepseek-chat"
+    AI_EDIT_FUSED: bool = True
     
     class Config:
         env_file = ".env"
 
-# settings = Settings()
\ No newline at end of file
+# settings = Settings()
+
+
+def configure_logging(settings: Settings):
+    """Log to stderr at LOG_LEVEL; call once per process (API and each render worker)"""
+    logging.basicConfig(
+        level=settings.LOG_LEVEL,
+        format="%(asctime)s %(processName)s %(name)s %(levelname)s: %(message)s"
+    )
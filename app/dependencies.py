@@ -1,5 +1,9 @@
 from app.config import Settings
 from app.graph import create_workflow
+from app.services.janitor import StorageJanitor
+from app.services.job_queue import JobQueue
+from app.services.model_pool import WhisperModelPool
+from app.services.transcription import TranscriptionService
 from app.services.video_processor import VideoProcessor
 import os
 
@@ -8,14 +12,63 @@ def get_settings() -> Settings:
     settings = Settings()
     return settings
 
+model_pool = None
+
+def get_model_pool() -> WhisperModelPool:
+    global model_pool
+    if model_pool is None:
+        settings = get_settings()
+        model_pool = WhisperModelPool(
+            [settings.WHISPER_MODEL, *settings.WHISPER_PRELOAD_MODELS],
+            settings.WHISPER_POOL_SIZE
+        )
+    return model_pool
+
+transcription_service = None
+
+def get_transcription_service() -> TranscriptionService:
+    global transcription_service
+    if transcription_service is None:
+        transcription_service = TranscriptionService(get_settings(), get_model_pool())
+    return transcription_service
+
+def init_transcription():
+    return get_transcription_service().start()
+
+def shutdown_transcription():
+    if transcription_service is not None:
+        transcription_service.shutdown()
+
 video_processor = None
 
 def get_video_processor() -> VideoProcessor:
     global video_processor
     if not video_processor:
-        video_processor = VideoProcessor(get_settings())
+        video_processor = VideoProcessor(get_settings(), get_transcription_service())
     return video_processor
 
+job_queue = None
+
+def get_job_queue() -> JobQueue:
+    global job_queue
+    if job_queue is None:
+        settings = get_settings()
+        job_queue = JobQueue(
+            get_video_processor().active_tasks.db,
+            settings.JOB_CONCURRENCY,
+            settings.JOB_LEASE_SECONDS
+        )
+    return job_queue
+
+janitor = None
+
+def get_janitor() -> StorageJanitor:
+    global janitor
+    if janitor is None:
+        processor = get_video_processor()
+        janitor = StorageJanitor(get_settings(), processor.active_tasks, processor.file_versions, get_job_queue())
+    return janitor
+
 graph = None
 
 def init_graph():
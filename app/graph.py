@@ -1,4 +1,5 @@
 
+import logging
 from typing import Any, Dict, List, Optional, TypedDict
 
 from langchain_core.output_parsers import JsonOutputParser
@@ -8,6 +9,9 @@ from langgraph.graph import END, StateGraph
 
 from app.config import Settings
 from app.models.processing import AIEditRequest
+from app.services import cancellation, metrics
+
+logger = logging.getLogger(__name__)
 
 
 class GraphState(TypedDict):
@@ -17,6 +21,8 @@ class GraphState(TypedDict):
     filename: Optional[str]
     music_file_id: Optional[str]
     music_filename: Optional[str]
+    encoder_profile: Optional[str]
+    render_mode: Optional[str]
     current_step: int
     plan: List[Dict]
     results: List[Any]
@@ -56,32 +62,34 @@ def create_workflow(processor):
     parser = JsonOutputParser()
     
     async def planner_node(state: GraphState):
-        print(f"[planner_node] Entered with state: {state}")
+        logger.debug(f"[planner_node] Entered with state: {state}")
         if state.get('plan'):
-            print("[planner_node] Plan already exists, returning state.")
+            logger.debug("[planner_node] Plan already exists, returning state.")
             return state
             
         # Get available tools from MCP registry
         available_tools = list(processor.mcp_registry.tools.keys())
-        print(f"[planner_node] Available tools: {available_tools}")
+        logger.debug(f"[planner_node] Available tools: {available_tools}")
         
         # Construct the planning chain
         chain = PLANNER_PROMPT | llm | parser
         
         # Generate plan
-        plan = await chain.ainvoke({
-            "user_input": state["user_input"],
-            "tools": available_tools,
-            "style_preference": state.get("style_preference", "cinematic"),
-            "output_format": state.get("output_format", "mp4")
-        })
+        with metrics.span("graph_planning"):
+            plan = await chain.ainvoke({
+                "user_input": state["user_input"],
+                "tools": available_tools,
+                "style_preference": state.get("style_preference", "cinematic"),
+                "output_format": state.get("output_format", "mp4")
+            })
         for step in plan:
-            print('CHECK state.get("filename", "")', state.get("filename", ""))
             step["args"]["filename"] = state.get("filename", "")
             step["args"]["music_file_id"] = state.get("music_file_id", "")
             step["args"]["music_filename"] = state.get("music_filename", "")
+            step["args"]["encoder_profile"] = state.get("encoder_profile")
+            step["args"]["render_mode"] = state.get("render_mode")
 
-        print(f"[planner_node] Plan generated: {plan}")
+        logger.info(f"[planner_node] Plan generated: {plan}")
         
         return {
             **state,
@@ -90,7 +98,7 @@ def create_workflow(processor):
         }
     
     async def error_handler_node(state: GraphState):
-        print(f"[error_handler_node] Handling error: {state.get('error')}")
+        logger.error(f"[error_handler_node] Handling error: {state.get('error')}")
         processor.active_tasks[state["task_id"]] = {
             "status": "failed",
             "error": state["error"]
@@ -102,11 +110,28 @@ def create_workflow(processor):
     # Define Nodes
     workflow.add_node("planner", planner_node)
     workflow.add_node("execute_step", create_execute_node(processor))
+    workflow.add_node("render_plan", create_render_plan_node(processor))
     workflow.add_node("error_handler", error_handler_node)
 
     workflow.set_entry_point("planner")
     # Define Edges
-    workflow.add_edge("planner", "execute_step")
+    workflow.add_conditional_edges(
+        "planner",
+        lambda state: "fused" if processor.settings.AI_EDIT_FUSED else "stepwise",
+        {
+            "fused": "render_plan",
+            "stepwise": "execute_step"
+        }
+    )
+    workflow.add_conditional_edges(
+        "render_plan",
+        decide_next_step,
+        {
+            "continue": "render_plan",
+            "error": "error_handler",
+            "complete": END
+        }
+    )
     workflow.add_conditional_edges(
         "execute_step",
         decide_next_step,
@@ -123,9 +148,9 @@ def create_workflow(processor):
 # Execution Node Factory
 def create_execute_node(processor):
     async def execute_node(state: GraphState):
-        print(f"[execute_node] Entered with state: {state}")
+        logger.debug(f"[execute_node] Entered with state: {state}")
         if state.get("error"):
-            print(f"[execute_node] Error detected in state: {state['error']}")
+            logger.warning(f"[execute_node] Error detected in state: {state['error']}")
             return {
                 **state,
                 "error": str(e)
@@ -133,7 +158,7 @@ def create_execute_node(processor):
             
         current_step = state["current_step"]
         step = state["plan"][current_step]
-        print(f"[execute_node] Executing step {current_step}: {step}")
+        logger.info(f"[execute_node] Executing step {current_step}: {step}")
 
         tool_cls = processor.mcp_registry.tools.get(step["name"])
         if not tool_cls:
@@ -152,9 +177,11 @@ def create_execute_node(processor):
                 "current_step": current_step + 1,
                 "results": [*state["results"], result]
             }
+        except cancellation.TaskCancelled:
+            raise
         except Exception as e:
-            print(f"[execute_node] Failed to fetch step: {e}")
-            print('state["results"]', state["results"])
+            logger.error(f"[execute_node] Step {current_step} failed: {e}")
+            logger.debug(f"[execute_node] Results so far: {state['results']}")
             return {
                 **state,
                 "error": str(e)
@@ -162,6 +189,37 @@ def create_execute_node(processor):
             
     return execute_node
 
+# Fused execution: the whole plan becomes one timeline and one encode
+def create_render_plan_node(processor):
+    async def render_plan_node(state: GraphState):
+        logger.info(f"[render_plan_node] Rendering plan: {state['plan']}")
+        try:
+            result = await processor.render_plan(
+                state["task_id"],
+                state["file_id"],
+                {
+                    "filename": state.get("filename", ""),
+                    "encoder_profile": state.get("encoder_profile"),
+                    "render_mode": state.get("render_mode"),
+                    "plan": state["plan"]
+                }
+            )
+            return {
+                **state,
+                "current_step": len(state["plan"]),
+                "results": [*state["results"], result]
+            }
+        except cancellation.TaskCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"[render_plan_node] Failed to render plan: {e}")
+            return {
+                **state,
+                "error": str(e)
+            }
+
+    return render_plan_node
+
 # Conditional Edge Logic
 def decide_next_step(state: GraphState):
     if state.get("error"):
@@ -169,3 +227,33 @@ def decide_next_step(state: GraphState):
     if state["current_step"] >= len(state["plan"]):
         return "complete"
     return "continue"
+
+
+# Runs in a render worker; streams node updates into the task status
+async def execute_workflow(graph, state, processor):
+    task_id = state["task_id"]
+    # try:
+    async for step in graph.astream(state):
+        # Stop between nodes once cancelled; the worker cancels a node in flight
+        cancellation.check()
+        node_state = next(iter(step.values()), None) or state
+        task = processor.active_tasks.get(task_id, {})
+        if task.get("status") == "failed":
+            continue
+        processor.active_tasks[task_id] = {
+            "status": f"step_{node_state['current_step']}",
+            "current_step": node_state["current_step"],
+            "total_steps": len(node_state["plan"]),
+            **{key: task[key] for key in ("preview", "result") if key in task}
+        }
+
+    # Keep a failure or the rendered result recorded by the last step
+    task = processor.active_tasks.get(task_id, {})
+    if task.get("status") == "failed":
+        # Raised so the worker records the job as failed, not done
+        raise RuntimeError(task.get("error") or "AI edit failed")
+    processor.active_tasks[task_id] = {
+        "status": "completed",
+        "message": "processing complete",
+        **({"result": task["result"]} if "result" in task else {})
+    }
@@ -1,3 +1,7 @@
+import asyncio
+import logging
+import os
+
 from fastapi import Depends, FastAPI, Request
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
@@ -5,19 +9,48 @@ from fastapi.templating import Jinja2Templates
 from fastapi_mcp import FastApiMCP
 from starlette.middleware.cors import CORSMiddleware
 
-from app.config import Settings
-from app.dependencies import init_graph
+from app.config import Settings, configure_logging
+from app.dependencies import (get_janitor, init_graph, init_transcription,
+                              shutdown_transcription)
+from app import worker
+from app.services import chunked_render
+
+logger = logging.getLogger(__name__)
 
 
 def create_app(settings: Settings) -> FastAPI:
+    configure_logging(settings)
     app = FastAPI(
         title="Video Processing API",
         description="API for automated video editing workflows",
         version="1.0.0"
     )
+    render_workers = []
+    background = []
+
     @app.on_event("startup")
     async def startup_event():
+        background.append(asyncio.create_task(get_janitor().run(settings.JANITOR_INTERVAL_SECONDS)))
+        if settings.RENDER_WORKERS:
+            # Rendering and transcription run in the workers, never in the web process
+            render_workers.extend(worker.start_workers(settings.RENDER_WORKERS))
+            return
+        # Start transcription workers (or warm the in-process pool) off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, init_transcription)
         init_graph()
+        render_workers.append(asyncio.create_task(worker.serve(f"api-{os.getpid()}")))
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        for task in background:
+            task.cancel()
+        if settings.RENDER_WORKERS:
+            worker.stop_workers(render_workers)
+            return
+        for task in render_workers:
+            task.cancel()
+        shutdown_transcription()
+        chunked_render.shutdown()
 
     # Middleware
     app.add_middleware(
@@ -35,9 +68,10 @@ def create_app(settings: Settings) -> FastAPI:
 
 
     # Routes
-    from app.routes import files, processing
+    from app.routes import files, metrics, processing
     app.include_router(files.router, prefix="/api/files", tags=["files"])
     app.include_router(processing.router, prefix="/api/process", tags=["processing"])
+    app.include_router(metrics.router, tags=["metrics"])
 
     # Static files
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -46,7 +80,7 @@ def create_app(settings: Settings) -> FastAPI:
 
     @app.middleware("http")
     async def debug_routes(request: Request, call_next):
-        print(f"\n→ Incoming request: {request.method} {request.url.path}")
+        logger.debug(f"Incoming request: {request.method} {request.url.path}")
         response = await call_next(request)
         return response
     
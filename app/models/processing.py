@@ -48,6 +48,20 @@ class AIEditRequest(BaseModel):
         description="Desired output format",
         enum=["mp4", "mov", "webm"]
     )
+    encoder_profile: Optional[str] = Field(
+        None,
+        description="Encoder profile for the rendered output (defaults to the server setting)",
+        enum=["draft", "final", "archive"]
+    )
+    render_mode: Optional[str] = Field(
+        None,
+        description="Encode long renders in parallel chunks or in one pass (defaults to the server setting)",
+        enum=["chunked", "single"]
+    )
+    priority: Optional[int] = Field(
+        0,
+        description="Queue priority; higher runs first"
+    )
     additional_context: Optional[dict] = Field(
         {},
         description="Additional parameters for the AI edit (e.g., {'target_length': 60, 'brand_colors': ['#FF0000']})"
@@ -1,10 +1,12 @@
+import asyncio
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
 from fastapi.responses import FileResponse
 
 from app.config import Settings
-from app.dependencies import get_settings
+from app.dependencies import get_janitor, get_settings
+from app.services.janitor import StorageJanitor
 from app.services.file_manager import save_upload_file
 
 router = APIRouter()
@@ -53,3 +55,11 @@ async def download_processed_file(
         media_type="application/octet-stream",
         filename=filename
     )
+
+
+@router.get("/storage")
+async def storage_status(janitor: StorageJanitor = Depends(get_janitor)):
+    """Disk held per managed directory and what the janitor has reclaimed so far"""
+    # Walking the directories is blocking I/O
+    usage = await asyncio.get_running_loop().run_in_executor(None, janitor.usage)
+    return {"usage": usage, "reclaimed": janitor.reclaimed()}
@@ -0,0 +1,51 @@
+import asyncio
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.config import Settings
+from app.dependencies import get_janitor, get_job_queue, get_settings
+from app.services import metrics
+from app.services.janitor import StorageJanitor
+from app.services.job_queue import JobQueue
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(
+    settings: Settings = Depends(get_settings),
+    queue: JobQueue = Depends(get_job_queue),
+    janitor: StorageJanitor = Depends(get_janitor)
+):
+    """Prometheus scrape endpoint: stage timings from every worker plus live queue state"""
+    counts = queue.counts()
+    job_types = sorted({*settings.JOB_CONCURRENCY, *counts["queued"], *counts["running"]})
+    reclaimed = janitor.reclaimed()
+    gauges = {
+        "queue_depth": (
+            "Jobs waiting for a render worker",
+            [({"job_type": t}, counts["queued"].get(t, 0)) for t in job_types]
+        ),
+        "active_renders": (
+            "Jobs being processed by render workers",
+            [({"job_type": t}, counts["running"].get(t, 0)) for t in job_types]
+        ),
+        "workers": (
+            "Render workers with a recent heartbeat",
+            [({}, len(queue.workers()))]
+        ),
+    }
+    counters = {
+        "storage_reclaimed_bytes_total": (
+            "Bytes deleted by the storage janitor",
+            [
+                ({"directory": directory, "reason": reason}, totals["bytes"])
+                for directory, reasons in reclaimed.items()
+                for reason, totals in reasons.items()
+            ]
+        ),
+    }
+    # Reads the shared state database; keep it off the event loop
+    text = await asyncio.get_running_loop().run_in_executor(None, metrics.exposition, gauges, counters)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
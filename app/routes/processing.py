@@ -1,32 +1,46 @@
+import asyncio
+import json
 import uuid
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
-from app.dependencies import get_graph, get_video_processor
+from app.dependencies import get_job_queue, get_video_processor
 from app.models.processing import AIEditRequest, ProcessRequest
+from app.services.job_queue import JobQueue
 from app.services.video_processor import VideoProcessor
 
 router = APIRouter()
 
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def enqueue_job(processor, queue, job_type, file_id, payload, priority=0, task_id=None) -> str:
+    """Record the task and hand it to the render workers; nothing runs in the web process
+
+    A request identical to one still queued or running gets its own task_id, aliased
+    to the existing task, instead of a second render.
+    """
+    task_id = task_id or str(uuid.uuid4())
+    processor.active_tasks[task_id] = {"status": "processing", "stage": "queued", "file_id": file_id}
+    job_id = queue.enqueue(task_id, job_type, payload, file_id=file_id, priority=priority or 0)
+    if job_id != task_id:
+        processor.active_tasks.alias(task_id, job_id, file_id)
+    return task_id
+
 @router.post("/{file_id}/remove-duplicates")
 async def process_remove_duplicates(
     file_id: str,
     request: ProcessRequest,
-    background_tasks: BackgroundTasks,
     processor: VideoProcessor = Depends(get_video_processor),
+    queue: JobQueue = Depends(get_job_queue),
 ):
     # try:
-    print('request.params', request.params)
     if not file_id or not request.params['filename']:
         raise HTTPException(status_code=400, detail="Missing file information")
 
-    task_id = str(uuid.uuid4())
-    processor.active_tasks[task_id] = {"status": "processing"}
-    background_tasks.add_task(
-        processor.process_remove_duplicates,
-        task_id,
-        file_id,
-        request.params
+    task_id = enqueue_job(
+        processor, queue, "remove_duplicates", file_id, {"params": request.params}, request.params.get("priority")
     )
     
     return {"task_id": task_id, "status": "processing_started"}
@@ -40,18 +54,12 @@ async def process_remove_duplicates(
 async def process_add_captions(
     file_id: str,
     request: ProcessRequest,
-    background_tasks: BackgroundTasks,
     processor: VideoProcessor = Depends(get_video_processor),
+    queue: JobQueue = Depends(get_job_queue),
 ):
     # try:
-    task_id = str(uuid.uuid4())
-    processor.active_tasks[task_id] = {"status": "processing"}
-
-    background_tasks.add_task(
-        processor.add_captions,
-        task_id,
-        file_id,
-        request.params
+    task_id = enqueue_job(
+        processor, queue, "add_captions", file_id, {"params": request.params}, request.params.get("priority")
     )
     return {"task_id": task_id, "status": "processing_started"}
     # except Exception as e:
@@ -64,17 +72,12 @@ async def process_add_captions(
 async def add_music_endpoint(
     file_id: str,
     request: ProcessRequest,
-    background_tasks: BackgroundTasks,
     processor: VideoProcessor = Depends(get_video_processor),
+    queue: JobQueue = Depends(get_job_queue),
 ):
     # try:
-    task_id = str(uuid.uuid4())
-    processor.active_tasks[task_id] = {"status": "processing"}
-    background_tasks.add_task(
-        processor.add_music,
-        task_id,
-        file_id,
-        request.params
+    task_id = enqueue_job(
+        processor, queue, "add_music", file_id, {"params": request.params}, request.params.get("priority")
     )
     return {"task_id": task_id, "status": "processing_started"}
     # except Exception as e:
@@ -87,17 +90,12 @@ async def add_music_endpoint(
 async def add_broll_endpoint(
     file_id: str,
     request: ProcessRequest,
-    background_tasks: BackgroundTasks,
-    processor: VideoProcessor = Depends(get_video_processor)
+    processor: VideoProcessor = Depends(get_video_processor),
+    queue: JobQueue = Depends(get_job_queue)
 ):
     try:
-        task_id = str(uuid.uuid4())
-        processor.active_tasks[task_id] = {"status": "processing"}
-        background_tasks.add_task(
-            processor.add_broll,
-            task_id,
-            file_id,
-            request.params
+        task_id = enqueue_job(
+            processor, queue, "add_broll", file_id, {"params": request.params}, request.params.get("priority")
         )
         return {"task_id": task_id, "status": "processing_started"}
     except Exception as e:
@@ -107,28 +105,101 @@ async def add_broll_endpoint(
         )
 
 
+@router.get("/models/status")
+async def get_model_status(
+    queue: JobQueue = Depends(get_job_queue)
+):
+    # Models live in the render workers, which report their pools with each heartbeat
+    return {"workers": queue.workers(), "jobs": queue.counts()}
+
+
+@router.delete("/{task_id}")
+async def cancel_task(
+    task_id: str,
+    processor: VideoProcessor = Depends(get_video_processor),
+    queue: JobQueue = Depends(get_job_queue)
+):
+    """Cancel a queued or running task; its worker stops the render and frees the slot
+
+    A job that other requests were coalesced into keeps running while any of
+    them still wants it; only the cancelling request's task_id is released.
+    """
+    task = processor.active_tasks.view(task_id)
+    if not task:
+        raise HTTPException(404, detail="Unknown task ID")
+    if task.get("status") in TERMINAL_STATUSES:
+        return {"task_id": task_id, "status": task["status"]}
+
+    if task.get("alias_of"):
+        leader_id = processor.active_tasks.unalias(task_id)
+        if leader_id:
+            # Its own client left earlier; this was the last request waiting on the job
+            cancel_job(processor, queue, leader_id)
+        return {"task_id": task_id, "status": "cancelled"}
+
+    if processor.active_tasks.detach(task_id):
+        return {"task_id": task_id, "status": "cancelled"}
+    return {"task_id": task_id, "status": cancel_job(processor, queue, task_id) or task.get("status")}
+
+
+def cancel_job(processor, queue, job_id: str):
+    """Cancel the queued job behind job_id and record it on the job's task"""
+    state = queue.cancel(job_id)
+    if state == "cancelled":
+        processor.active_tasks.patch(job_id, status="cancelled", stage="cancelled")
+    elif state == "cancelling":
+        processor.active_tasks.patch(job_id, stage="cancelling")
+    return state
+
+
 @router.get("/{task_id}/status")
 async def get_status(
     task_id: str,
     processor: VideoProcessor = Depends(get_video_processor)
 ):
-    task = processor.active_tasks.get(task_id)
-    print('here task', task)
+    task = processor.active_tasks.view(task_id)
     if not task:
         raise HTTPException(404, detail="Unknown task ID")
-    print('get_status task', task)
     return {"task_id": task_id, **task}
 
 
+@router.get("/{task_id}/events")
+async def task_events(
+    task_id: str,
+    processor: VideoProcessor = Depends(get_video_processor)
+):
+    """Server-sent events: the task record each time it changes, until it finishes"""
+    settings = processor.settings
+    if not processor.active_tasks.view(task_id):
+        raise HTTPException(404, detail="Unknown task ID")
+
+    async def stream():
+        last, idle = None, 0.0
+        while True:
+            task = processor.active_tasks.view(task_id) or {"status": "failed", "error": "Unknown task ID"}
+            event = json.dumps({"task_id": task_id, **task})
+            if event != last:
+                last, idle = event, 0.0
+                yield f"data: {event}\n\n"
+            elif idle >= settings.EVENTS_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            if task.get("status") in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(settings.EVENTS_POLL_SECONDS)
+            idle += settings.EVENTS_POLL_SECONDS
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.post('/ai-edit')
 async def ai_edit(
     request: AIEditRequest,
-    background_tasks: BackgroundTasks,
-    processor: VideoProcessor = Depends(get_video_processor)
+    processor: VideoProcessor = Depends(get_video_processor),
+    queue: JobQueue = Depends(get_job_queue)
 ):
     task_id = str(uuid.uuid4())
-    processor.active_tasks[task_id] = {"status": "processing"}
-    graph = get_graph()
     initial_state = {
         "task_id": task_id,
         "user_input": request.user_input,
@@ -136,38 +207,14 @@ async def ai_edit(
         "filename": request.filename,
         "music_file_id": request.music_file_id,
         "music_filename": request.music_filename,
+        "encoder_profile": request.encoder_profile,
+        "render_mode": request.render_mode,
         "current_step": 0,
         "plan": [],
         "results": []
     }
-    print('CHECK request.filename', request.filename)
-    
-    background_tasks.add_task(
-        execute_workflow,
-        graph,
-        initial_state,
-        processor
-    )
-    
-    return {"task_id": task_id, "status": "processing_started"}
 
+    enqueue_job(processor, queue, "ai_edit", request.file_id, {"state": initial_state},
+                priority=request.priority, task_id=task_id)
 
-async def execute_workflow(graph, state, processor):
-    # try:
-    async for step in graph.astream(state):
-        processor.active_tasks[state["task_id"]] = {
-            "status": f"step_{state['current_step']}",
-            "current_step": state["current_step"],
-            "total_steps": len(state["plan"])
-        }
-
-    processor.active_tasks[state["task_id"]] = {
-        "status": "completed",
-        "message": "processing complete"
-    }
-
-    # except Exception as e:
-    #     processor.active_tasks[state["task_id"]] = {
-    #         "status": "failed",
-    #         "error": str(e)
-    #     }
\ No newline at end of file
+    return {"task_id": task_id, "status": "processing_started"}
@@ -0,0 +1,65 @@
+import os
+import uuid
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from app.services.chunking import SAMPLE_RATE
+from app.services.ffmpeg_tools import ffmpeg_binary, run_tool
+from app.services.file_hashing import content_hash
+
+
+class PcmWindow(NamedTuple):
+    """A [start, end) sample range of a PCM sidecar; cheap to pickle to workers"""
+    path: str
+    start: int
+    end: int
+
+    def read(self) -> np.ndarray:
+        pcm = load_pcm(self.path)
+        return pcm[self.start:self.end].astype(np.float32) / 32768.0
+
+
+def load_pcm(path) -> np.ndarray:
+    """Memory-map a sidecar as int16 samples without reading it"""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=np.int16)
+    return np.memmap(path, dtype=np.int16, mode='r')
+
+
+class AudioStore:
+    """16 kHz mono PCM sidecars, extracted once per file content"""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def sidecar_path(self, file_path) -> Path:
+        return self.cache_dir / f"{content_hash(file_path)}.pcm"
+
+    def extract(self, file_path) -> Path:
+        sidecar = self.sidecar_path(file_path)
+        if sidecar.exists():
+            return sidecar
+
+        temp = sidecar.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        cmd = [
+            ffmpeg_binary(), "-nostdin", "-y", "-threads", "0",
+            "-i", str(file_path),
+            "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            str(temp)
+        ]
+        try:
+            run_tool(cmd)
+        except RuntimeError:
+            temp.unlink(missing_ok=True)
+            raise
+        os.replace(temp, sidecar)
+        return sidecar
+
+    def load(self, file_path):
+        """Return (sidecar path, memory-mapped int16 samples), extracting on first use"""
+        sidecar = self.extract(file_path)
+        return sidecar, load_pcm(sidecar)
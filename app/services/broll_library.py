@@ -0,0 +1,139 @@
+import logging
+import os
+import re
+import threading
+import uuid
+from pathlib import Path
+from typing import NamedTuple
+
+from werkzeug.utils import secure_filename
+
+from app.services.ffmpeg_tools import (ffmpeg_binary, probe_duration,
+                                       probe_video, run_tool)
+from app.services.file_hashing import content_hash
+
+logger = logging.getLogger(__name__)
+
+# Renditions are intermediates that get composited and re-encoded, so keep them near-lossless
+RENDITION_CRF = 18
+
+
+class BrollClip(NamedTuple):
+    path: str
+    tags: tuple
+    duration: float
+    width: int
+    height: int
+    fps: float
+
+
+def clip_tags(filename: str) -> tuple:
+    """Lower-case alphanumeric words of a filename, e.g. 'City_Night-2.mp4' -> ('city', 'night', '2')"""
+    return tuple(t for t in re.split(r'[^a-z0-9]+', Path(filename).stem.lower()) if t)
+
+
+def parse_rate(rate: str) -> float:
+    num, _, den = (rate or "0/1").partition("/")
+    try:
+        return float(num) / float(den or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+class BrollLibrary:
+    """Tag index over the B-roll folder plus cached letterboxed renditions per frame size"""
+
+    def __init__(self, broll_dir: str, cache_dir: str):
+        self.broll_dir = Path(broll_dir)
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._signature = None
+        self._clips = {}
+        self._index = {}
+
+    def refresh(self):
+        """Rebuild the index when the folder changed; a stat of the directory otherwise"""
+        try:
+            signature = self.broll_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            signature = None
+
+        with self._lock:
+            if signature == self._signature:
+                return
+            clips, index = {}, {}
+            if signature is not None:
+                for name in sorted(os.listdir(self.broll_dir)):
+                    if not name.endswith(".mp4"):
+                        continue
+                    clip = self._clips.get(name) or self._probe(name)
+                    if clip is None:
+                        continue
+                    clips[name] = clip
+                    for tag in clip.tags:
+                        index.setdefault(tag, []).append(name)
+            self._clips, self._index, self._signature = clips, index, signature
+            logger.info(f"B-roll library: {len(clips)} clips, {len(index)} tags")
+
+    def _probe(self, name: str):
+        path = self.broll_dir / name
+        try:
+            probe = probe_video(path)
+            return BrollClip(
+                path=str(path),
+                tags=clip_tags(name),
+                duration=probe_duration(path),
+                width=int(probe.get("width", 0)),
+                height=int(probe.get("height", 0)),
+                fps=parse_rate(probe.get("r_frame_rate"))
+            )
+        except RuntimeError as e:
+            logger.warning(f"Skipping unreadable B-roll {name}: {e}")
+            return None
+
+    def signature(self):
+        """Changes whenever clips are added or removed, for caches of renders using them"""
+        self.refresh()
+        return self._signature
+
+    def find(self, keyword: str):
+        """First clip (by filename) whose name contains the keyword"""
+        self.refresh()
+        key = secure_filename(keyword).lower()
+        if not key:
+            return None
+        with self._lock:
+            names = self._index.get(key)
+            if not names:
+                # Keywords may also match inside a tag or across a separator ('new_york')
+                names = sorted(n for n in self._clips if key in n.lower())
+            return self._clips[names[0]] if names else None
+
+    def rendition(self, clip: BrollClip, size, duration: float) -> Path:
+        """Scaled, letterboxed, silent copy of a clip at `size`, black-padded to `duration`"""
+        width, height = int(size[0]), int(size[1])
+        target = self.cache_dir / f"{content_hash(clip.path)[:24]}_{width}x{height}_{duration:g}s.mp4"
+        if target.exists():
+            return target
+
+        temp = target.with_suffix(f".{uuid.uuid4().hex}.tmp.mp4")
+        vf = (
+            f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1,"
+            f"tpad=stop_mode=add:stop_duration={duration:g}:color=black"
+        )
+        cmd = [
+            ffmpeg_binary(), "-nostdin", "-y", "-v", "error",
+            "-i", clip.path, "-t", f"{duration:g}", "-an",
+            "-vf", vf,
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", str(RENDITION_CRF),
+            "-pix_fmt", "yuv420p", "-f", "mp4", str(temp)
+        ]
+        try:
+            run_tool(cmd)
+        except RuntimeError:
+            temp.unlink(missing_ok=True)
+            raise
+        os.replace(temp, target)
+        return target
@@ -0,0 +1,71 @@
+import contextvars
+import subprocess
+import threading
+from contextlib import contextmanager
+
+# Token of the task whose code is running; copied into executor threads by progress.run_blocking
+current_token = contextvars.ContextVar("current_cancel_token", default=None)
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task's code once the task has been cancelled"""
+
+
+class CancelToken:
+    """Cancellation flag for one task plus the subprocesses it currently runs"""
+
+    def __init__(self, task_id: str = None):
+        self.task_id = task_id
+        self.cancelled = False
+        self._procs = set()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Flag the task and terminate its subprocesses; its code raises at the next check"""
+        with self._lock:
+            self.cancelled = True
+            procs = list(self._procs)
+        for proc in procs:
+            _terminate(proc)
+
+    def check(self):
+        if self.cancelled:
+            raise TaskCancelled(f"Task {self.task_id} was cancelled")
+
+
+def _terminate(proc: subprocess.Popen):
+    try:
+        proc.terminate()
+    except OSError:
+        pass
+
+
+def check():
+    """Raise TaskCancelled if the current task has been cancelled"""
+    token = current_token.get()
+    if token:
+        token.check()
+
+
+def is_cancelled() -> bool:
+    token = current_token.get()
+    return bool(token and token.cancelled)
+
+
+@contextmanager
+def track(proc: subprocess.Popen):
+    """Terminate proc if the current task is (or gets) cancelled while it runs"""
+    token = current_token.get()
+    if token is None:
+        yield proc
+        return
+    with token._lock:
+        token._procs.add(proc)
+        cancelled = token.cancelled
+    if cancelled:
+        _terminate(proc)
+    try:
+        yield proc
+    finally:
+        with token._lock:
+            token._procs.discard(proc)
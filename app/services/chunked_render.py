@@ -0,0 +1,178 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from app.services import cancellation, encoding, progress
+from app.services.ffmpeg_tools import ffmpeg_binary, run_tool
+
+logger = logging.getLogger(__name__)
+
+# Chunks shorter than this cost more in process/seek overhead than they save
+MIN_CHUNK_SECONDS = 10.0
+
+# How often a render waiting on its chunks checks for cancellation
+CANCEL_POLL_SECONDS = 0.5
+
+# Worker processes when RENDER_CHUNK_WORKERS is 0; each one decodes the source and holds a timeline
+MAX_AUTO_WORKERS = 4
+
+_executor = None
+_executor_workers = 0
+_active_renders = 0
+
+# Timeline-only VideoProcessor of each render worker process, and the settings it was built from
+_worker_processor = None
+_worker_settings = None
+
+
+def default_workers() -> int:
+    return max(1, min(os.cpu_count() or 1, MAX_AUTO_WORKERS))
+
+
+def render_spec(settings, input_path, segments, plan, output_path, track_base, profile) -> dict:
+    """Everything a chunk worker needs to rebuild the video side of a timeline, picklable
+
+    The parent mixes the audio once, so music steps are left out, and writes the
+    caption tracks at track_base that the workers' subtitle filters read.
+    """
+    return {
+        "settings": settings,
+        "input_path": str(input_path),
+        "segments": segments,
+        "plan": [step for step in plan if step["name"] != "add_music"],
+        "output_path": str(output_path),
+        "track_base": str(track_base),
+        "profile": profile,
+    }
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        shutdown()
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown(kill: bool = False):
+    global _executor
+    if _executor is not None:
+        if kill:
+            # Running chunks can't be cancelled through the executor
+            for process in list(_executor._processes.values()):
+                process.terminate()
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def chunk_bounds(duration: float, fps: float, workers: int):
+    """Frame-aligned (start, end) bounds so no frame is dropped or doubled at the joins"""
+    total_frames = int(round(duration * fps))
+    chunks = max(1, min(workers, int(duration // MIN_CHUNK_SECONDS)))
+    per_chunk = -(-total_frames // chunks)
+
+    bounds = []
+    for first in range(0, total_frames, per_chunk):
+        last = min(total_frames, first + per_chunk)
+        # Stop half a frame early so MoviePy's arange emits exactly last - first frames
+        end = duration if last == total_frames else (last - 0.5) / fps
+        bounds.append((first / fps, end))
+    return bounds
+
+
+def _render_chunk(spec, start, end, chunk_path, threads):
+    global _worker_processor, _worker_settings
+    if _worker_processor is None or _worker_settings != spec["settings"]:
+        # Deferred: the web process imports this module before VideoProcessor exists
+        from app.services.video_processor import VideoProcessor
+        _worker_processor = VideoProcessor.timeline_only(spec["settings"])
+        _worker_settings = spec["settings"]
+
+    profile = spec["profile"]
+    clip, _, render = _worker_processor.build_timeline(
+        spec["input_path"], spec["segments"], spec["plan"], spec["track_base"], profile,
+        write_tracks=False, window=(start, end)
+    )
+    filters = render['video_filters']
+    if filters:
+        # Timed filters (subtitles) must see timeline time, not chunk-local time
+        filters = [f"setpts=PTS+{start:.6f}/TB", *filters, "setpts=PTS-STARTPTS"]
+
+    kwargs = encoding.moviepy_write_kwargs(profile, chunk_path, filters)
+    kwargs["threads"] = threads
+    chunk = clip.subclip(start, end)
+    chunk.write_videofile(str(chunk_path), audio=False, logger=None, **kwargs)
+    chunk.close()
+    clip.close()
+    return chunk_path
+
+
+def render_chunked(clip, spec: dict, temp_path, workers: int):
+    """Render timeline chunks in parallel worker processes and join them without re-encoding
+
+    `clip` is the parent's already-built timeline; it supplies the duration and the
+    audio track, which is mixed once here while the workers encode video from `spec`.
+    """
+    global _active_renders
+    bounds = chunk_bounds(clip.duration, clip.fps, workers)
+    threads = max(1, (os.cpu_count() or 1) // len(bounds))
+    executor = get_executor(workers)
+    _active_renders += 1
+    try:
+        _render_chunks(executor, clip, spec, bounds, threads, temp_path)
+    finally:
+        _active_renders -= 1
+    logger.info(f"Chunked render: {len(bounds)} chunks on {workers} workers -> {spec['output_path']}")
+    return temp_path
+
+
+def _render_chunks(executor, clip, spec, bounds, threads, temp_path):
+    profile = spec["profile"]
+    with tempfile.TemporaryDirectory(dir=Path(spec["output_path"]).parent, prefix=".chunks-") as workdir:
+        chunk_paths = [Path(workdir) / f"chunk_{i:04d}.mp4" for i in range(len(bounds))]
+        futures = [
+            executor.submit(_render_chunk, spec, start, end, str(chunk_path), threads)
+            for (start, end), chunk_path in zip(bounds, chunk_paths)
+        ]
+
+        audio_path = None
+        if clip.audio is not None:
+            audio_path = Path(workdir) / "audio.m4a"
+            clip.audio.write_audiofile(
+                str(audio_path), fps=44100, codec='aac',
+                bitrate=profile["audio_bitrate"], logger=None
+            )
+
+        progress.update(0, len(futures), "encode")
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+            if finished:
+                progress.update(len(futures) - len(pending), len(futures), "encode")
+            if cancellation.is_cancelled():
+                for future in pending:
+                    future.cancel()
+                if _active_renders == 1:
+                    # No other render shares the pool: stop the chunks still encoding too
+                    shutdown(kill=True)
+                cancellation.check()
+
+        concat_list = Path(workdir) / "concat.txt"
+        concat_list.write_text("".join(f"file '{p.name}'\n" for p in chunk_paths))
+        cmd = [
+            ffmpeg_binary(), "-nostdin", "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", str(concat_list),
+        ]
+        if audio_path:
+            cmd += ["-i", str(audio_path), "-map", "0:v:0", "-map", "1:a:0"]
+        cmd += ["-c", "copy", "-movflags", "+faststart", "-f", "mp4", str(temp_path)]
+        run_tool(cmd)
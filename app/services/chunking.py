@@ -0,0 +1,68 @@
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAMES_PER_SECOND = 100  # Whisper mel frames, the unit of segment 'seek'
+
+
+def frame_energy(audio: np.ndarray, frame: int, n_frames: int, block_frames: int = 1200):
+    """RMS per frame, converted block by block so memory-mapped PCM is never copied whole"""
+    energy = np.empty(n_frames, dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(n_frames, first + block_frames)
+        block = np.asarray(audio[first * frame:last * frame], dtype=np.float32)
+        block = block.reshape(last - first, frame)
+        energy[first:last] = np.sqrt(np.mean(block * block, axis=1))
+    return energy
+
+
+def silence_windows(audio: np.ndarray, chunk_seconds: float, search_seconds: float = 10.0,
+                    frame_seconds: float = 0.05, sample_rate: int = SAMPLE_RATE):
+    """Split audio into ~chunk_seconds windows, cutting at the quietest frame near each boundary"""
+    total = len(audio)
+    chunk = int(chunk_seconds * sample_rate)
+    if total <= chunk:
+        return [(0, total)]
+
+    frame = max(1, int(frame_seconds * sample_rate))
+    n_frames = total // frame
+    energy = frame_energy(audio, frame, n_frames)
+
+    search = int(search_seconds * sample_rate) // frame
+    boundaries = [0]
+    target = chunk
+    while target < total - chunk // 2:
+        center = target // frame
+        lo, hi = max(boundaries[-1] // frame + 1, center - search), min(n_frames, center + search)
+        cut = (lo + int(np.argmin(energy[lo:hi]))) * frame if lo < hi else target
+        boundaries.append(cut)
+        target = cut + chunk
+    boundaries.append(total)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def stitch_transcripts(parts):
+    """Merge (offset_seconds, transcript) pairs into one transcript with the usual schema"""
+    segments = []
+    text = []
+    language = None
+
+    for offset, transcript in parts:
+        language = language or transcript.get('language')
+        text.append(transcript.get('text', ''))
+        for seg in transcript.get('segments', []):
+            seg = {
+                **seg,
+                'id': len(segments),
+                'seek': seg.get('seek', 0) + int(round(offset * FRAMES_PER_SECOND)),
+                'start': round(seg['start'] + offset, 2),
+                'end': round(seg['end'] + offset, 2),
+            }
+            if 'words' in seg:
+                seg['words'] = [
+                    {**w, 'start': round(w['start'] + offset, 2), 'end': round(w['end'] + offset, 2)}
+                    for w in seg['words']
+                ]
+            segments.append(seg)
+
+    return {'text': ''.join(text), 'segments': segments, 'language': language}
@@ -0,0 +1,79 @@
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+from moviepy.video.VideoClip import VideoClip
+
+
+def resolve_position(pos, frame_size, overlay_size):
+    """Top-left pixel of an overlay, accepting MoviePy's 'center'/'bottom'/... and relative forms"""
+    (fw, fh), (ow, oh) = frame_size, overlay_size
+    if isinstance(pos, str):
+        pos = {"center": ("center", "center"), "left": ("left", "center"),
+               "right": ("right", "center"), "top": ("center", "top"),
+               "bottom": ("center", "bottom")}[pos]
+    x, y = pos
+    x = {"left": 0, "center": (fw - ow) / 2, "right": fw - ow}.get(x, x)
+    y = {"top": 0, "center": (fh - oh) / 2, "bottom": fh - oh}.get(y, y)
+    return int(round(x)), int(round(y))
+
+
+class OverlayCompositor(VideoClip):
+    """Base clip plus timed overlays, blending only the overlays' rectangles
+
+    Overlays sit in a start-sorted index; with the longest overlay duration as a
+    bound, the ones active at t are found with two bisections. Frames with no
+    active overlay are the base frame untouched.
+    """
+
+    def __init__(self, base, overlays):
+        self.base = base
+        self.overlays = sorted(overlays, key=lambda c: c.start)
+        self._starts = [c.start for c in self.overlays]
+        self._max_duration = max(
+            ((c.end if c.end is not None else float("inf")) - c.start for c in self.overlays),
+            default=0.0
+        )
+        super().__init__(make_frame=self._make_frame, duration=base.duration)
+        self.size = base.size
+        self.fps = getattr(base, "fps", None)
+        self.audio = base.audio
+
+    def active_overlays(self, t):
+        lo = bisect_left(self._starts, t - self._max_duration)
+        hi = bisect_right(self._starts, t)
+        return [c for c in self.overlays[lo:hi] if c.end is None or t < c.end]
+
+    def _make_frame(self, t):
+        frame = self.base.get_frame(t)
+        active = self.active_overlays(t)
+        if not active:
+            return frame
+
+        # Reader frames are shared/read-only, so blend into a private copy
+        frame = np.array(frame, dtype=np.uint8)
+        fh, fw = frame.shape[:2]
+        for overlay in active:
+            ct = t - overlay.start
+            pixels = overlay.get_frame(ct)
+            oh, ow = pixels.shape[:2]
+            pos = overlay.pos(ct)
+            if overlay.relative_pos:
+                pos = (pos[0] * fw, pos[1] * fh)
+            x, y = resolve_position(pos, (fw, fh), (ow, oh))
+
+            # Clip the overlay rectangle to the frame
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + ow, fw), min(y + oh, fh)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            src = pixels[y0 - y:y1 - y, x0 - x:x1 - x, :3]
+            region = frame[y0:y1, x0:x1]
+
+            if overlay.mask is None:
+                region[...] = src
+                continue
+            alpha = overlay.mask.get_frame(ct)[y0 - y:y1 - y, x0 - x:x1 - x, None]
+            blended = region * (1.0 - alpha) + src * alpha
+            np.clip(blended, 0, 255, out=blended)
+            region[...] = blended.astype(np.uint8)
+        return frame
@@ -0,0 +1,128 @@
+import logging
+import zlib
+from difflib import SequenceMatcher
+from itertools import combinations
+
+import numpy as np
+
+from app.services.text_matching import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# 80% of the shorter phrase must be a shared prefix for a restarted sentence
+PREFIX_OVERLAP = 0.8
+
+# Character shingles and MinHash/LSH layout; 32 bands of 2 rows flag pairs from ~0.2 Jaccard,
+# every candidate is then confirmed with the exact similarity test
+SHINGLE_CHARS = 5
+NUM_PERM = 64
+BANDS = 32
+PREFIX_WORDS = 4
+
+# Non-adjacent retakes need some substance; short interjections repeat naturally
+MIN_RETAKE_WORDS = 4
+MAX_BUCKET = 64
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+
+def is_similar(norm_a: str, norm_b: str, threshold: float) -> bool:
+    return SequenceMatcher(None, norm_a, norm_b).ratio() >= threshold
+
+
+def is_near_duplicate(norm_a: str, norm_b: str, threshold: float) -> bool:
+    """Either a high similarity ratio, or one normalized phrase starts with the other"""
+    if is_similar(norm_a, norm_b, threshold):
+        return True
+
+    min_len = min(len(norm_a), len(norm_b))
+    if not min_len:
+        return False
+    prefix_length = 0
+    for a_char, b_char in zip(norm_a, norm_b):
+        if a_char != b_char:
+            break
+        prefix_length += 1
+    return prefix_length / min_len >= PREFIX_OVERLAP
+
+
+def minhash(text: str) -> np.ndarray:
+    shingles = {text[i:i + SHINGLE_CHARS] for i in range(max(1, len(text) - SHINGLE_CHARS + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # a*h + b stays below 2**63 for 31-bit a, b and 32-bit h
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE
+    return permuted.min(axis=1)
+
+
+def retake_candidates(texts, indices):
+    """Pairs (i, j), i < j, that share an LSH band or an opening phrase"""
+    buckets = {}
+    rows = NUM_PERM // BANDS
+    for i in indices:
+        signature = minhash(texts[i])
+        for band in range(BANDS):
+            key = (band, signature[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(i)
+        words = texts[i].split()
+        buckets.setdefault(("prefix", " ".join(words[:PREFIX_WORDS])), []).append(i)
+
+    pairs = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        if len(members) > MAX_BUCKET:
+            # A hub bucket would go quadratic; its neighbours in time are the likely retakes
+            pairs.update(zip(members, members[1:]))
+        else:
+            pairs.update(combinations(members, 2))
+    return pairs
+
+
+def duplicate_groups(segments, threshold: float, scope: str = "adjacent"):
+    """Group segment indices that are takes of the same line
+
+    Neighbouring segments are always compared, as before, and a restarted
+    sentence (one starting with the other) counts as a take. With scope
+    'transcript', MinHash/LSH also proposes non-adjacent pairs across the whole
+    transcript; those need the similarity ratio alone, since a later sentence
+    that merely opens the same way is new content, not a retake.
+    """
+    texts = [normalize_text(seg['text']) for seg in segments]
+    parent = list(range(len(segments)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[min(ri, rj)] = max(ri, rj)
+
+    for i in range(len(segments) - 1):
+        if is_near_duplicate(texts[i], texts[i + 1], threshold):
+            union(i, i + 1)
+
+    if scope == "transcript":
+        substantial = [i for i, t in enumerate(texts) if len(t.split()) >= MIN_RETAKE_WORDS]
+        for i, j in sorted(retake_candidates(texts, substantial)):
+            if j - i > 1 and find(i) != find(j) and is_similar(texts[i], texts[j], threshold):
+                union(i, j)
+
+    groups = {}
+    for i in range(len(segments)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda g: g[-1])
+
+
+def keep_last_takes(segments, threshold: float, scope: str = "adjacent"):
+    """Drop every take but the last of each duplicate group, in timeline order"""
+    groups = duplicate_groups(segments, threshold, scope)
+    dropped = sum(len(g) - 1 for g in groups)
+    logger.info(f"Dedupe ({scope}): {len(segments)} segments, {len(groups)} kept, {dropped} earlier takes removed")
+    return [segments[g[-1]] for g in groups]
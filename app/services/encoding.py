@@ -0,0 +1,147 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Named encoder settings; 'final' is what every render used before profiles existed
+ENCODER_PROFILES = {
+    "draft": {
+        "preset": "ultrafast",
+        "crf": 30,
+        "profile": "main",
+        "level": "4.0",
+        "max_height": 480,
+        "audio_bitrate": "96k",
+        "audio_quality": None,
+        "x264_params": None,
+    },
+    "proxy": {
+        "preset": "ultrafast",
+        "crf": 32,
+        "profile": "main",
+        "level": "3.0",
+        "max_height": 360,
+        "audio_bitrate": "64k",
+        "audio_quality": None,
+        "x264_params": None,
+    },
+    "final": {
+        "preset": "fast",
+        "crf": 23,
+        "profile": "main",
+        "level": "4.0",
+        "max_height": None,
+        "audio_bitrate": "192k",
+        "audio_quality": "90",
+        "x264_params": "b-adapt=2",
+    },
+    "archive": {
+        "preset": "slow",
+        "crf": 18,
+        "profile": "high",
+        "level": "4.1",
+        "max_height": None,
+        "audio_bitrate": "256k",
+        "audio_quality": "90",
+        "x264_params": "b-adapt=2",
+    },
+}
+
+_active_encodes = 0
+_lock = threading.Lock()
+
+# Jobs every render worker on the host may run at once; serve() refreshes it as workers come and go
+_host_slots = 1
+
+
+def get_profile(name: str) -> dict:
+    profile = ENCODER_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Unknown encoder profile '{name}' (choose from {sorted(ENCODER_PROFILES)})")
+    return profile
+
+
+@contextmanager
+def encode_slot():
+    """Count concurrent encodes so each one gets a fair share of the cores"""
+    global _active_encodes
+    with _lock:
+        _active_encodes += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _active_encodes -= 1
+
+
+def set_host_slots(slots: int):
+    global _host_slots
+    _host_slots = max(1, slots)
+
+
+def encoder_threads(concurrent_jobs: int = None) -> int:
+    """The cores shared over every job slot on the host, or over concurrent_jobs
+
+    Sized by slots, not by what happens to be running, so the first job of an
+    idle host does not take every core from the ones claimed after it.
+    """
+    jobs = concurrent_jobs if concurrent_jobs is not None else max(_host_slots, _active_encodes)
+    return max(1, (os.cpu_count() or 1) // max(1, jobs))
+
+
+def video_filters(profile: dict, extra_filters=None) -> list:
+    filters = list(extra_filters or [])
+    if profile["max_height"]:
+        # Downscale only, keep the width even for yuv420p
+        filters.append(f"scale=-2:'min(ih,{profile['max_height']})'")
+    return filters
+
+
+def ffmpeg_video_args(profile: dict, threads: int = None) -> list:
+    args = [
+        "-c:v", "libx264",
+        "-preset", profile["preset"],
+        "-crf", str(profile["crf"]),
+        "-profile:v", profile["profile"],
+        "-level", profile["level"],
+        "-pix_fmt", "yuv420p",
+        "-threads", str(threads or encoder_threads()),
+    ]
+    if profile["x264_params"]:
+        args += ["-x264-params", profile["x264_params"]]
+    return args
+
+
+def ffmpeg_audio_args(profile: dict) -> list:
+    return ["-c:a", "aac", "-b:a", profile["audio_bitrate"], "-ar", "44100"]
+
+
+def moviepy_write_kwargs(profile: dict, output_path, extra_filters=None) -> dict:
+    """write_videofile arguments for a profile (threads sized at call time)"""
+    filters = video_filters(profile, extra_filters)
+    ffmpeg_params = [
+        '-movflags', '+faststart',        # REQUIRED for web playback
+        '-pix_fmt', 'yuv420p',           # REQUIRED for browser compatibility
+        '-vsync', 'vfr',                 # Better for edited content
+        '-crf', str(profile["crf"]),     # Quality/compression balance
+        '-profile:v', profile["profile"],
+        '-level', profile["level"],
+        '-b:a', profile["audio_bitrate"],
+    ]
+    if profile["x264_params"]:
+        ffmpeg_params += ['-x264-params', profile["x264_params"]]
+    if profile["audio_quality"]:
+        ffmpeg_params += ['-aq', profile["audio_quality"]]
+    if filters:
+        ffmpeg_params += ['-vf', ','.join(filters)]
+    return {
+        "codec": 'libx264',
+        "audio_codec": 'aac',
+        "threads": encoder_threads(),
+        "write_logfile": True,
+        "ffmpeg_params": ffmpeg_params,
+        "preset": profile["preset"],
+        "audio_fps": 44100,
+        "temp_audiofile": str(Path(output_path).with_suffix('.tmp.m4a')),
+        "remove_temp": False,  # Helps prevent premature file closure
+    }
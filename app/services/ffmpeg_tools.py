@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from fractions import Fraction
+from functools import lru_cache
+from pathlib import Path
+
+from moviepy.config import get_setting
+
+from app.services import cancellation, metrics
+
+# Sources a browser can play as-is, so their video stream may be copied
+COPYABLE = {"h264": {"yuv420p", "yuvj420p"}}
+
+
+def ffmpeg_binary() -> str:
+    return get_setting("FFMPEG_BINARY")
+
+
+@lru_cache(maxsize=None)
+def ffprobe_binary():
+    """FFPROBE_BINARY, else ffprobe next to ffmpeg or on PATH; None when there is none
+
+    imageio-ffmpeg, which MoviePy installs, ships ffmpeg without ffprobe.
+    """
+    if os.getenv("FFPROBE_BINARY"):
+        return os.getenv("FFPROBE_BINARY")
+    ffmpeg = Path(ffmpeg_binary())
+    sibling = ffmpeg.with_name("ffprobe" + ffmpeg.suffix)
+    if sibling.is_file():
+        return str(sibling)
+    return shutil.which("ffprobe")
+
+
+def run_tool(cmd, on_progress=None) -> str:
+    """Run ffmpeg/ffprobe; on_progress(seconds) receives ffmpeg's encoded position as it runs
+
+    The process is terminated if the calling task is cancelled, which then raises
+    TaskCancelled rather than the tool's failure.
+    """
+    if on_progress is not None:
+        return _run_with_progress(cmd, on_progress)
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with cancellation.track(proc):
+        stdout, stderr = proc.communicate()
+    if proc.returncode != 0:
+        cancellation.check()
+        raise RuntimeError(f"{Path(cmd[0]).name} failed: {stderr.decode(errors='ignore')[-500:]}")
+    return stdout.decode()
+
+
+def _run_with_progress(cmd, on_progress) -> str:
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        with cancellation.track(proc):
+            for line in proc.stdout:
+                key, _, value = line.decode(errors="ignore").strip().partition("=")
+                if key == "out_time_us" and value.isdigit():
+                    on_progress(int(value) / 1_000_000)
+            returncode = proc.wait()
+        if returncode != 0:
+            cancellation.check()
+            stderr.seek(0)
+            raise RuntimeError(f"{Path(cmd[0]).name} failed: {stderr.read().decode(errors='ignore')[-500:]}")
+    return ""
+
+
+def _split_fields(text: str) -> list:
+    """Split an ffmpeg stream description on commas outside parentheses"""
+    fields, depth, current = [], 0, ""
+    for char in text:
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == "," and depth == 0:
+            fields.append(current.strip())
+            current = ""
+        else:
+            current += char
+    return [*fields, current.strip()]
+
+
+def _frame_rate(fps: float) -> str:
+    """ffprobe-style rational for the rounded rate ffmpeg prints (29.97 -> 30000/1001)"""
+    ntsc = round(fps * 1.001)
+    if not fps.is_integer() and abs(ntsc / 1.001 - fps) < 0.01:
+        return f"{ntsc * 1000}/1001"
+    rate = Fraction(fps).limit_denominator(1001)
+    return f"{rate.numerator}/{rate.denominator}"
+
+
+def _parse_stream(kind: str, description: str) -> dict:
+    fields = _split_fields(description)
+    head = re.match(r"(\w+)(?: \(([^)]*)\))?", fields[0])
+    stream = {"codec_name": head.group(1)}
+    if head.group(2) and "/" not in head.group(2):
+        stream["profile"] = head.group(2)
+    if kind == "Video":
+        if len(fields) > 1:
+            stream["pix_fmt"] = re.match(r"\w*", fields[1]).group(0)
+        for field in fields[2:]:
+            size = re.match(r"(\d+)x(\d+)", field)
+            if size and "width" not in stream:
+                stream["width"], stream["height"] = int(size.group(1)), int(size.group(2))
+            if field.endswith(" fps"):
+                stream["r_frame_rate"] = _frame_rate(float(field[:-4]))
+    return stream
+
+
+def ffmpeg_info(path) -> dict:
+    """Duration, start time and first video/audio stream from `ffmpeg -i`'s banner
+
+    The fallback when there is no ffprobe; fields ffmpeg doesn't print are absent.
+    """
+    result = subprocess.run(
+        [ffmpeg_binary(), "-hide_banner", "-nostdin", "-i", str(path)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    banner = result.stderr.decode(errors="ignore")
+    info = {"streams": {}}
+    duration = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", banner)
+    if duration:
+        hours, minutes, seconds = duration.groups()
+        info["duration"] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    start = re.search(r"start: (-?\d+(?:\.\d+)?)", banner)
+    if start:
+        info["start_time"] = float(start.group(1))
+    for kind, description in re.findall(r"Stream #\d+:\d+\S*: (Video|Audio): (.*)", banner):
+        info["streams"].setdefault(kind, _parse_stream(kind, description))
+    if not duration and not info["streams"]:
+        raise RuntimeError(f"ffmpeg could not read {path}: {banner.strip()[-500:]}")
+    return info
+
+
+def probe_stream(path, selector: str, entries: str) -> dict:
+    ffprobe = ffprobe_binary()
+    with metrics.span("probe"):
+        if ffprobe is None:
+            kind = {"v": "Video", "a": "Audio"}[selector.split(":")[0]]
+            return ffmpeg_info(path)["streams"].get(kind, {})
+        out = run_tool([
+            ffprobe, "-v", "error", "-select_streams", selector,
+            "-show_entries", f"stream={entries}", "-of", "json", str(path)
+        ])
+    streams = json.loads(out).get("streams", [])
+    return streams[0] if streams else {}
+
+
+def probe_video(path) -> dict:
+    return probe_stream(
+        path, "v:0",
+        "codec_name,pix_fmt,profile,level,width,height,r_frame_rate,"
+        "color_range,color_space,color_primaries,color_trc"
+    )
+
+
+def has_audio(path) -> bool:
+    return bool(probe_stream(path, "a:0", "codec_name"))
+
+
+def can_copy_video(probe: dict) -> bool:
+    return probe.get("pix_fmt") in COPYABLE.get(probe.get("codec_name"), ())
+
+
+def probe_duration(path) -> float:
+    ffprobe = ffprobe_binary()
+    with metrics.span("probe"):
+        if ffprobe is None:
+            return ffmpeg_info(path).get("duration", 0.0)
+        out = run_tool([
+            ffprobe, "-v", "error", "-show_entries", "format=duration",
+            "-of", "csv=p=0", str(path)
+        ])
+    try:
+        return float(out.strip())
+    except ValueError:
+        return 0.0
@@ -0,0 +1,28 @@
+import hashlib
+import threading
+from pathlib import Path
+
+_digests = {}
+_lock = threading.Lock()
+
+
+def content_hash(path) -> str:
+    """SHA-256 of a file's bytes, memoized on (path, size, mtime)"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+
+    with _lock:
+        digest = _digests.get(memo_key)
+    if digest:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1024 * 1024):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _lock:
+        _digests[memo_key] = digest
+    return digest
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import shutil
+import time
+from pathlib import Path
+
+from app.services.job_queue import JobQueue
+from app.services.state_store import TaskTable, VersionTable
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS storage_reclaimed (
+    directory TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    files INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (directory, reason)
+);
+"""
+
+# What a finished render leaves next to its output: MoviePy's temp audio (remove_temp=False)
+# and logfiles, temp outputs, crashed chunk/smart-cut/caption work dirs and the superseded preview
+INTERMEDIATE_PATTERNS = (
+    "*.tmp.m4a", "*.tmp.mp4", "*.log", ".chunks-*", ".smartcut-*", ".captions-*", "preview_*.mp4"
+)
+
+
+def path_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def last_used(path: Path) -> float:
+    """Newest mtime in a file or directory tree"""
+    times = [path.stat().st_mtime]
+    if path.is_dir():
+        times += [p.stat().st_mtime for p in path.rglob("*")]
+    return max(times)
+
+
+class StorageJanitor:
+    """Retention, quotas and post-task cleanup for the upload, music, output and scratch directories
+
+    Entries are the top-level children of each directory (one per file_id for
+    uploads and outputs), aged by their newest mtime. Files that a queued or
+    running job reads or writes are never touched, whatever status its task
+    reports; reclaimed bytes are counted in the shared state database so every
+    process reports the same totals.
+    """
+
+    def __init__(self, settings, tasks: TaskTable, versions: VersionTable, queue: JobQueue):
+        self.tasks = tasks
+        self.versions = versions
+        self.queue = queue
+        self.processed_dir = Path(settings.PROCESSED_DIR)
+        # Directory setting name -> (retention hours, quota bytes), None for no limit
+        names = sorted({*settings.STORAGE_RETENTION_HOURS, *settings.STORAGE_QUOTA_BYTES})
+        self.policies = {
+            Path(getattr(settings, name)): (
+                settings.STORAGE_RETENTION_HOURS.get(name),
+                settings.STORAGE_QUOTA_BYTES.get(name)
+            )
+            for name in names
+        }
+        with self.tasks.db.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def release(self, file_id: str) -> int:
+        """Drop a file's render intermediates once no queued or running job uses it"""
+        if not file_id or file_id in self.queue.active_file_ids():
+            return 0
+        file_dir = self.processed_dir / file_id
+        if not file_dir.is_dir():
+            return 0
+        leftovers = {p for pattern in INTERMEDIATE_PATTERNS for p in file_dir.glob(pattern)}
+        return sum(self._remove(p, self.processed_dir, "intermediate") for p in leftovers)
+
+    def sweep(self) -> int:
+        """One pass: intermediates of idle files, then retention, then quotas"""
+        active = self.queue.active_file_ids()
+        reclaimed = 0
+        if self.processed_dir.is_dir():
+            for file_dir in self.processed_dir.iterdir():
+                if file_dir.is_dir() and file_dir.name not in active:
+                    reclaimed += self.release(file_dir.name)
+
+        now = time.time()
+        for directory, (hours, quota) in self.policies.items():
+            if not directory.is_dir():
+                continue
+            entries = []
+            for path in directory.iterdir():
+                if path.name in active:
+                    continue
+                try:
+                    entries.append((last_used(path), path_size(path), path))
+                except FileNotFoundError:
+                    continue
+            entries.sort()
+
+            if hours is not None:
+                expired = [e for e in entries if now - e[0] > hours * 3600]
+                for _, _, path in expired:
+                    reclaimed += self._remove(path, directory, "retention")
+                entries = entries[len(expired):]
+
+            if quota is not None:
+                total = sum(size for _, size, _ in entries)
+                for _, size, path in entries:
+                    if total <= quota:
+                        break
+                    reclaimed += self._remove(path, directory, "quota")
+                    total -= size
+        return reclaimed
+
+    def _remove(self, path: Path, directory: Path, reason: str) -> int:
+        try:
+            size = path_size(path)
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except FileNotFoundError:
+            return 0
+        if directory == self.processed_dir and path.parent == directory:
+            # The next step must not read an output that is gone
+            self.versions.pop(path.name, None)
+        with self.tasks.db.connect() as conn:
+            conn.execute(
+                "INSERT INTO storage_reclaimed (directory, reason, files, bytes) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(directory, reason) DO UPDATE SET files = files + 1, bytes = bytes + excluded.bytes",
+                (directory.name, reason, size)
+            )
+        return size
+
+    def reclaimed(self) -> dict:
+        """{directory: {reason: {files, bytes}}} since the state database was created"""
+        with self.tasks.db.connect() as conn:
+            rows = conn.execute("SELECT directory, reason, files, bytes FROM storage_reclaimed").fetchall()
+        totals = {}
+        for directory, reason, files, size in rows:
+            totals.setdefault(directory, {})[reason] = {"files": files, "bytes": size}
+        return totals
+
+    def usage(self) -> dict:
+        """Bytes currently held per managed directory"""
+        usage = {}
+        for directory in self.policies:
+            usage[directory.name] = path_size(directory) if directory.is_dir() else 0
+        return usage
+
+    async def run(self, interval: float):
+        """Sweep every interval seconds until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                reclaimed = await loop.run_in_executor(None, self.sweep)
+                if reclaimed:
+                    logger.info(f"Storage janitor reclaimed {reclaimed} bytes")
+            except Exception as e:
+                logger.warning(f"Storage sweep failed: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,271 @@
+import hashlib
+import json
+import os
+import time
+
+from app.services.state_store import StateDatabase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    job_type TEXT NOT NULL,
+    file_id TEXT,
+    dedupe_key TEXT,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_until REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs(state, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs(dedupe_key, state);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    pid INTEGER,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+
+# Payload keys that don't change the output, so don't make two requests different
+NON_OUTPUT_KEYS = ("task_id", "priority")
+
+
+def coalesce_key(job_type: str, file_id: str, payload: dict) -> str:
+    """Identity of the work a job does: same type, file and output-affecting params"""
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if k not in NON_OUTPUT_KEYS}
+        return value
+    raw = json.dumps([job_type, file_id, strip(payload)], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def referenced_file_ids(value) -> set:
+    """Every *file_id in a payload: extra inputs such as music, also inside AI-edit plans"""
+    found = set()
+    if isinstance(value, dict):
+        for k, v in value.items():
+            if k.endswith("file_id") and isinstance(v, str) and v:
+                found.add(v)
+            else:
+                found |= referenced_file_ids(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            found |= referenced_file_ids(v)
+    return found
+
+
+class JobQueue:
+    """Durable, prioritized job queue in the shared state database
+
+    Workers claim jobs under a lease they keep renewing; a job whose lease runs
+    out (its worker crashed) goes back to the queue until max_attempts.
+    """
+
+    def __init__(self, db: StateDatabase, concurrency: dict = None, lease_seconds: float = 60.0,
+                 max_attempts: int = 2):
+        self.db = db
+        self.concurrency = concurrency or {}
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self.db.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def enqueue(self, job_id: str, job_type: str, payload: dict, file_id: str = None, priority: int = 0) -> str:
+        """Queue a job, or return the id of an identical queued/running job instead"""
+        key = coalesce_key(job_type, file_id, payload)
+        with self.db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT job_id FROM jobs WHERE dedupe_key = ? AND state IN ('queued', 'running') "
+                    "AND cancel_requested = 0 LIMIT 1",
+                    (key,)
+                ).fetchone()
+                if row:
+                    # Honour the more urgent request
+                    conn.execute(
+                        "UPDATE jobs SET priority = MAX(priority, ?) WHERE job_id = ?", (int(priority), row[0])
+                    )
+                else:
+                    conn.execute(
+                        "INSERT INTO jobs (job_id, job_type, file_id, dedupe_key, payload, priority, state, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                        (job_id, job_type, file_id, key, json.dumps(payload, default=str), int(priority), time.time())
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return row[0] if row else job_id
+
+    def claim(self, worker_id: str, job_types=None):
+        """Atomically take the best queued job whose type is under its concurrency limit"""
+        now = time.time()
+        with self.db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(conn, now)
+                running = dict(conn.execute(
+                    "SELECT job_type, COUNT(*) FROM jobs WHERE state = 'running' GROUP BY job_type"
+                ).fetchall())
+                blocked = [t for t, limit in self.concurrency.items() if running.get(t, 0) >= limit]
+                sql = "SELECT job_id, job_type, file_id, payload FROM jobs WHERE state = 'queued'"
+                args = []
+                if blocked:
+                    sql += f" AND job_type NOT IN ({','.join('?' * len(blocked))})"
+                    args += blocked
+                if job_types:
+                    sql += f" AND job_type IN ({','.join('?' * len(job_types))})"
+                    args += list(job_types)
+                row = conn.execute(sql + " ORDER BY priority DESC, created_at LIMIT 1", args).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE jobs SET state = 'running', worker_id = ?, attempts = attempts + 1, "
+                        "lease_until = ?, started_at = ? WHERE job_id = ?",
+                        (worker_id, now + self.lease_seconds, now, row[0])
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        return {"job_id": row[0], "job_type": row[1], "file_id": row[2], "payload": json.loads(row[3])}
+
+    def _requeue_expired(self, conn, now: float):
+        conn.execute(
+            "UPDATE jobs SET state = CASE WHEN cancel_requested THEN 'cancelled' "
+            "WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+            "error = 'worker lost', worker_id = NULL "
+            "WHERE state = 'running' AND lease_until < ?",
+            (self.max_attempts, now)
+        )
+
+    def renew(self, job_id: str):
+        with self.db.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND state = 'running'",
+                (time.time() + self.lease_seconds, job_id)
+            )
+
+    def finish(self, job_id: str, error: str = None, cancelled: bool = False):
+        state = "cancelled" if cancelled else "failed" if error else "done"
+        with self.db.connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ?, lease_until = NULL WHERE job_id = ?",
+                (state, error, time.time(), job_id)
+            )
+
+    def cancel(self, job_id: str):
+        """Cancel a job: at once if still queued, else flag it for its worker
+
+        Returns "cancelled", "cancelling", the state of an already finished job,
+        or None for an unknown job.
+        """
+        with self.db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                state = row[0] if row else None
+                if state == "queued":
+                    conn.execute(
+                        "UPDATE jobs SET state = 'cancelled', cancel_requested = 1, finished_at = ? WHERE job_id = ?",
+                        (time.time(), job_id)
+                    )
+                    state = "cancelled"
+                elif state == "running":
+                    conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+                    state = "cancelling"
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return state
+
+    def cancel_requested(self, job_ids) -> list:
+        """Those of job_ids whose cancellation was requested while running"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return []
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND state = 'running' "
+                f"AND job_id IN ({','.join('?' * len(job_ids))})",
+                job_ids
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def get(self, job_id: str):
+        with self.db.connect() as conn:
+            row = conn.execute(
+                "SELECT job_type, state, priority, attempts, worker_id, error FROM jobs WHERE job_id = ?",
+                (job_id,)
+            ).fetchone()
+        if not row:
+            return None
+        return dict(zip(("job_type", "state", "priority", "attempts", "worker_id", "error"), row))
+
+    def counts(self) -> dict:
+        """{state: {job_type: count}} for queued and running jobs"""
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT state, job_type, COUNT(*) FROM jobs "
+                "WHERE state IN ('queued', 'running') GROUP BY state, job_type"
+            ).fetchall()
+        counts = {"queued": {}, "running": {}}
+        for state, job_type, count in rows:
+            counts[state][job_type] = count
+        return counts
+
+    def active_file_ids(self) -> set:
+        """Uploads, music and outputs that queued or running jobs read or write"""
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT file_id, payload FROM jobs WHERE state IN ('queued', 'running')"
+            ).fetchall()
+        active = set()
+        for file_id, payload in rows:
+            if file_id:
+                active.add(file_id)
+            active |= referenced_file_ids(json.loads(payload))
+        return active
+
+    def report_worker(self, worker_id: str, status: dict):
+        with self.db.connect() as conn:
+            conn.execute(
+                "INSERT INTO workers (worker_id, pid, status, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET pid = excluded.pid, status = excluded.status, "
+                "updated_at = excluded.updated_at",
+                (worker_id, os.getpid(), json.dumps(status, default=str), time.time())
+            )
+
+    def workers(self, max_age: float = None) -> dict:
+        max_age = max_age or self.lease_seconds
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT worker_id, pid, status, updated_at FROM workers WHERE updated_at >= ?",
+                (time.time() - max_age,)
+            ).fetchall()
+        return {
+            worker_id: {"pid": pid, "seen": updated_at, **json.loads(status)}
+            for worker_id, pid, status, updated_at in rows
+        }
+
+
+def cpu_admits(max_load: float) -> bool:
+    """True while the 1-minute load per core is below max_load"""
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return True
+    return load / (os.cpu_count() or 1) < max_load
@@ -0,0 +1,196 @@
+import contextvars
+import json
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS span_totals (
+    stage TEXT NOT NULL,
+    step TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    input_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (stage, step)
+);
+CREATE TABLE IF NOT EXISTS span_buckets (
+    stage TEXT NOT NULL,
+    step TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (stage, step, bucket)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+# Histogram upper bounds in seconds; stages range from a probe to a long encode
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+PREFIX = "video_editor"
+
+# task_id, step and input_seconds of the running task; copied into threads by progress.run_blocking
+span_tags = contextvars.ContextVar("span_tags", default=None)
+
+# Shared state database the spans and counters go to, set once per process by init()
+_db = None
+
+
+def init(db):
+    """Record into db (the shared state database) from now on"""
+    global _db
+    with db.connect() as conn:
+        conn.executescript(SCHEMA)
+    _db = db
+
+
+@contextmanager
+def bind(**tags):
+    """Tag every span opened inside this block (and its run_blocking threads)"""
+    token = span_tags.set({**(span_tags.get() or {}), **tags})
+    try:
+        yield
+    finally:
+        span_tags.reset(token)
+
+
+def tag(**tags):
+    """Add tags to the innermost bind() block; a no-op outside one"""
+    current = span_tags.get()
+    if current is not None:
+        current.update(tags)
+
+
+@contextmanager
+def span(stage: str, input_seconds: float = None):
+    """Time a pipeline stage; recorded even when it raises
+
+    Yields a dict whose input_seconds can be set once the stage knows it.
+    """
+    fields = {"input_seconds": input_seconds}
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record(stage, time.perf_counter() - start, fields["input_seconds"])
+
+
+def record(stage: str, seconds: float, input_seconds: float = None):
+    tags = span_tags.get() or {}
+    step = tags.get("step") or "none"
+    if input_seconds is None:
+        input_seconds = tags.get("input_seconds")
+    logger.info(json.dumps({
+        "span": stage,
+        "seconds": round(seconds, 4),
+        "task_id": tags.get("task_id"),
+        "step": step,
+        "input_seconds": input_seconds,
+    }))
+    if _db is None:
+        return
+    try:
+        with _db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO span_totals (stage, step, count, seconds, input_seconds) VALUES (?, ?, 1, ?, ?) "
+                    "ON CONFLICT(stage, step) DO UPDATE SET count = count + 1, seconds = seconds + excluded.seconds, "
+                    "input_seconds = input_seconds + excluded.input_seconds",
+                    (stage, step, seconds, input_seconds or 0.0)
+                )
+                conn.execute(
+                    "INSERT INTO span_buckets (stage, step, bucket, count) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(stage, step, bucket) DO UPDATE SET count = count + 1",
+                    (stage, step, bisect_left(BUCKETS, seconds))
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    except Exception as e:
+        # Metrics are advisory; never fail a render over them
+        logger.warning(f"Recording span {stage} failed: {e}")
+
+
+def count(name: str, value: float = 1, **labels):
+    """Add to a counter shared by every process"""
+    if _db is None:
+        return
+    try:
+        with _db.connect() as conn:
+            conn.execute(
+                "INSERT INTO counters (name, labels, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value",
+                (name, json.dumps(labels, sort_keys=True), value)
+            )
+    except Exception as e:
+        logger.warning(f"Counting {name} failed: {e}")
+
+
+def _labels(**labels) -> str:
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in labels.items())
+    return f"{{{inner}}}" if inner else ""
+
+
+def _format(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def exposition(gauges: dict = None, counters: dict = None) -> str:
+    """Prometheus text format of the spans, counters and the given gauges and counters
+
+    gauges, counters: {name: (help, [(labels dict, value), ...])}; counters are
+    running totals kept elsewhere (e.g. by the janitor) and are typed as such
+    """
+    lines = []
+    if _db is not None:
+        with _db.connect() as conn:
+            totals = conn.execute("SELECT stage, step, count, seconds, input_seconds FROM span_totals").fetchall()
+            buckets = {}
+            for stage, step, bucket, n in conn.execute("SELECT stage, step, bucket, count FROM span_buckets"):
+                buckets.setdefault((stage, step), {})[bucket] = n
+            counter_rows = conn.execute("SELECT name, labels, value FROM counters ORDER BY name").fetchall()
+
+        name = f"{PREFIX}_stage_seconds"
+        lines += [f"# HELP {name} Wall time of each pipeline stage", f"# TYPE {name} histogram"]
+        for stage, step, n, seconds, _ in totals:
+            counts = buckets.get((stage, step), {})
+            cumulative = 0
+            for i, bound in enumerate(BUCKETS):
+                cumulative += counts.get(i, 0)
+                lines.append(f"{name}_bucket{_labels(stage=stage, step=step, le=bound)} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(stage=stage, step=step, le='+Inf')} {n}")
+            lines.append(f"{name}_sum{_labels(stage=stage, step=step)} {_format(seconds)}")
+            lines.append(f"{name}_count{_labels(stage=stage, step=step)} {n}")
+
+        name = f"{PREFIX}_stage_input_seconds_total"
+        lines += [
+            f"# HELP {name} Seconds of input media processed per stage; stage_seconds_sum over this is the real-time factor",
+            f"# TYPE {name} counter",
+        ]
+        for stage, step, _, _, input_seconds in totals:
+            lines.append(f"{name}{_labels(stage=stage, step=step)} {_format(input_seconds)}")
+
+        seen = set()
+        for counter, labels, value in counter_rows:
+            name = f"{PREFIX}_{counter}"
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_labels(**json.loads(labels))} {_format(value)}")
+
+    for kind, families in (("gauge", gauges), ("counter", counters)):
+        for family, (help_text, samples) in (families or {}).items():
+            name = f"{PREFIX}_{family}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(**labels)} {_format(value)}")
+    return "\n".join(lines) + "\n"
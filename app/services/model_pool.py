@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from queue import Empty, Queue
+
+import numpy as np
+
+from app.services.chunking import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class WhisperModelPool:
+    """Process-wide pool of Whisper models, loaded and warmed once"""
+
+    def __init__(self, model_names, size_per_model: int = 1):
+        self.model_names = list(dict.fromkeys(model_names))
+        self.size_per_model = max(1, int(size_per_model))
+        self._pools = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load and warm every configured model (blocking, call at startup)"""
+        for name in self.model_names:
+            self._get_pool(name)
+        return self
+
+    def _get_pool(self, name: str) -> Queue:
+        pool = self._pools.get(name)
+        if pool is not None:
+            return pool
+
+        with self._lock:
+            pool = self._pools.get(name)
+            if pool is not None:
+                return pool
+
+            pool = Queue(maxsize=self.size_per_model)
+            stats = {
+                "model": name,
+                "instances": 0,
+                "in_use": 0,
+                "acquired": 0,
+                "load_seconds": 0.0,
+                "warmup_seconds": 0.0,
+                "wait_seconds": 0.0,
+                "resident_bytes": 0,
+                "device": None,
+                "loaded_at": None,
+            }
+            # Imported here so processes that never transcribe don't load torch
+            import whisper
+
+            for _ in range(self.size_per_model):
+                started = time.perf_counter()
+                model = whisper.load_model(name)
+                loaded = time.perf_counter()
+                self._warm(model)
+                warmed = time.perf_counter()
+
+                stats["instances"] += 1
+                stats["load_seconds"] += loaded - started
+                stats["warmup_seconds"] += warmed - loaded
+                stats["resident_bytes"] += sum(
+                    p.numel() * p.element_size() for p in model.parameters()
+                )
+                stats["device"] = str(model.device)
+                pool.put(model)
+
+            stats["loaded_at"] = time.time()
+            logger.info(f"Whisper model '{name}' loaded x{stats['instances']} "
+                        f"in {stats['load_seconds']:.2f}s (warmup {stats['warmup_seconds']:.2f}s)")
+            self._stats[name] = stats
+            self._pools[name] = pool
+            return pool
+
+    @staticmethod
+    def _warm(model):
+        # One second of silence is enough to initialise kernels and caches
+        silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+        model.transcribe(silence, fp16=model.device.type != "cpu")
+
+    @contextmanager
+    def acquire(self, name: str, timeout: float = None):
+        """Borrow a model instance, blocking while all instances are in use"""
+        pool = self._get_pool(name)
+        stats = self._stats[name]
+
+        started = time.perf_counter()
+        try:
+            model = pool.get(timeout=timeout)
+        except Empty:
+            raise TimeoutError(f"No Whisper '{name}' model available after {timeout}s")
+
+        with self._lock:
+            stats["in_use"] += 1
+            stats["acquired"] += 1
+            stats["wait_seconds"] += time.perf_counter() - started
+        try:
+            yield model
+        finally:
+            with self._lock:
+                stats["in_use"] -= 1
+            pool.put(model)
+
+    def status(self) -> dict:
+        with self._lock:
+            models = [
+                {**stats, "available": self._pools[name].qsize()}
+                for name, stats in self._stats.items()
+            ]
+        return {
+            "configured": self.model_names,
+            "size_per_model": self.size_per_model,
+            "models": models,
+        }
@@ -0,0 +1,115 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+
+from proglog import ProgressBarLogger
+
+from app.services import cancellation
+
+logger = logging.getLogger(__name__)
+
+# Reporter of the task whose code is running; copied into executor threads by run_blocking
+current_reporter = contextvars.ContextVar("current_reporter", default=None)
+
+# Minimum seconds between progress writes for the same stage
+MIN_INTERVAL = 0.5
+
+
+class ProgressReporter:
+    """Writes a task's stage and done/total counts into its status record, throttled"""
+
+    def __init__(self, tasks, task_id: str):
+        self.tasks = tasks
+        self.task_id = task_id
+        self.stage_name = None
+        self.stage_started = time.time()
+        self._last_write = 0.0
+
+    def stage(self, name: str):
+        self.stage_name = name
+        self.stage_started = time.time()
+        self._write({"stage": name, "fraction": None, "eta_seconds": None})
+
+    def update(self, done: float, total: float, stage: str = None):
+        if stage and stage != self.stage_name:
+            self.stage(stage)
+        now = time.time()
+        if done < total and now - self._last_write < MIN_INTERVAL:
+            return
+        fraction = min(1.0, done / total) if total else None
+        elapsed = now - self.stage_started
+        eta = elapsed * (total - done) / done if done and total else None
+        self._write({
+            "stage": self.stage_name,
+            "done": done,
+            "total": total,
+            "fraction": round(fraction, 4) if fraction is not None else None,
+            "eta_seconds": round(eta, 1) if eta is not None else None,
+        })
+
+    def _write(self, progress: dict):
+        self._last_write = time.time()
+        try:
+            self.tasks.patch(self.task_id, progress={**progress, "updated_at": self._last_write})
+        except Exception as e:
+            # Progress is advisory; never fail a render over it
+            logger.warning(f"Progress update failed for {self.task_id}: {e}")
+
+
+def stage(name: str):
+    reporter = current_reporter.get()
+    if reporter:
+        reporter.stage(name)
+
+
+def update(done: float, total: float, stage: str = None):
+    reporter = current_reporter.get()
+    if reporter:
+        reporter.update(done, total, stage)
+
+
+class MoviePyLogger(ProgressBarLogger):
+    """proglog logger feeding MoviePy's frame ('t') and audio ('chunk') bars to the reporter
+
+    It also stops the write of a cancelled task.
+    """
+
+    STAGES = {"t": "encode", "chunk": "encode_audio"}
+
+    def __init__(self, reporter: ProgressReporter):
+        super().__init__()
+        self.reporter = reporter
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # Called for every frame, so a cancelled render stops here; MoviePy then closes its ffmpeg pipes
+        cancellation.check()
+        if self.reporter and attr == "index" and bar in self.STAGES:
+            total = self.bars[bar].get("total")
+            if total:
+                self.reporter.update(value + 1, total, self.STAGES[bar])
+
+
+def moviepy_logger():
+    """MoviePy `logger` argument: task progress and cancellation inside a task, the console bar otherwise"""
+    reporter = current_reporter.get()
+    if reporter or cancellation.current_token.get():
+        return MoviePyLogger(reporter)
+    return "bar"
+
+
+def ffmpeg_callback(stage_name: str, duration: float):
+    """on_progress callback for run_tool, mapping ffmpeg's out_time to this stage"""
+    reporter = current_reporter.get()
+    if not reporter or not duration:
+        return None
+    return lambda seconds: reporter.update(min(seconds, duration), duration, stage_name)
+
+
+async def run_blocking(func, *args):
+    """run_in_executor that keeps the caller's context (its progress reporter and cancel token)"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(context.run, func, *args)
+    )
@@ -0,0 +1,26 @@
+from app.services import encoding
+from app.services.ffmpeg_tools import ffmpeg_binary, has_audio, run_tool
+
+
+def remux_music(video_path, music_path, output_path, music_volume: float, profile: dict, on_progress=None):
+    """Mix looped music into the audio track only; the video stream is copied bit for bit"""
+    # Sum without normalisation, like MoviePy's CompositeAudioClip
+    graph = f"[1:a]volume={float(music_volume)}[music];"
+    if has_audio(video_path):
+        graph += "[0:a][music]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[mixed]"
+    else:
+        graph += "[music]anull[mixed]"
+
+    run_tool([
+        ffmpeg_binary(), "-nostdin", "-y", "-v", "error",
+        "-i", str(video_path),
+        "-stream_loop", "-1", "-i", str(music_path),
+        "-filter_complex", graph,
+        "-map", "0:v:0", "-map", "[mixed]",
+        "-c:v", "copy",
+        *encoding.ffmpeg_audio_args(profile),
+        "-shortest",
+        "-movflags", "+faststart",
+        "-f", "mp4", str(output_path)
+    ], on_progress=on_progress)
+    return output_path
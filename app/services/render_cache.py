@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from app.services import metrics
+from app.services.file_hashing import content_hash
+
+# Params that change how or when a render runs, not what it produces
+NON_OUTPUT_PARAMS = ("task_id", "priority", "preview", "render_mode", "encoder_profile")
+
+ENTRY_FILE = "entry.json"
+
+
+def normalize_params(value):
+    """Canonical form of step params: no scheduling-only keys, no unset values"""
+    if isinstance(value, dict):
+        return {
+            k: normalize_params(v) for k, v in sorted(value.items())
+            if k not in NON_OUTPUT_PARAMS and v is not None
+        }
+    if isinstance(value, (list, tuple)):
+        return [normalize_params(v) for v in value]
+    return value
+
+
+def _link_or_copy(src: Path, dest: Path):
+    """Place src at dest atomically, sharing the inode when the filesystem allows
+
+    Safe to share: every render writes a temp file and renames it over its
+    output, so neither side is ever rewritten in place.
+    """
+    temp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(src, temp)
+    except OSError:
+        shutil.copyfile(src, temp)
+    os.replace(temp, dest)
+
+
+class RenderCache:
+    """On-disk cache of rendered outputs keyed by input content, step, params and encoder profile
+
+    Each entry is a directory with the output files and an entry.json recording
+    their sizes; least recently used entries are evicted to stay under max_bytes.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key_for(self, input_path, step: str, params: dict, profile: dict, extra_inputs=(), context: dict = None) -> str:
+        """extra_inputs are other files the output depends on (e.g. music); context any settings it reads"""
+        raw = json.dumps({
+            "input": content_hash(input_path),
+            "extra": [content_hash(p) for p in extra_inputs],
+            "step": step,
+            "params": normalize_params(params),
+            "profile": profile,
+            "context": context or {},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def get(self, key: str):
+        """The entry's metadata with absolute file paths, or None on a miss"""
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(entry_dir / ENTRY_FILE, 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            metrics.count("cache_requests_total", cache="render", result="miss")
+            return None
+        files = {role: entry_dir / info["name"] for role, info in entry["files"].items()}
+        if not all(path.exists() for path in files.values()):
+            metrics.count("cache_requests_total", cache="render", result="miss")
+            return None
+        try:
+            # mtime doubles as the LRU clock
+            os.utime(entry_dir / ENTRY_FILE)
+        except FileNotFoundError:
+            pass
+        metrics.count("cache_requests_total", cache="render", result="hit")
+        return {**entry, "paths": files}
+
+    def put(self, key: str, files: dict, meta: dict = None):
+        """Store {role: path} output files under key, then evict down to the budget"""
+        entry_dir = self._entry_dir(key)
+        staging = self.cache_dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        staging.mkdir()
+        try:
+            recorded = {}
+            for role, path in files.items():
+                path = Path(path)
+                _link_or_copy(path, staging / path.name)
+                recorded[role] = {"name": path.name, "size": path.stat().st_size}
+            entry = {
+                **(meta or {}),
+                "files": recorded,
+                "size": sum(info["size"] for info in recorded.values()),
+                "created_at": time.time(),
+            }
+            with open(staging / ENTRY_FILE, 'w') as f:
+                json.dump(entry, f, default=str)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging, entry_dir)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def restore(self, entry: dict, dest_dir) -> dict:
+        """Place an entry's files in dest_dir under their original names; {role: path}"""
+        dest_dir = Path(dest_dir)
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        restored = {}
+        for role, path in entry["paths"].items():
+            restored[role] = dest_dir / path.name
+            _link_or_copy(path, restored[role])
+        return restored
+
+    def evict(self):
+        """Drop least recently used entries until the recorded sizes fit max_bytes"""
+        with self._lock:
+            entries = []
+            for entry_file in self.cache_dir.glob(f"*/{ENTRY_FILE}"):
+                try:
+                    mtime = entry_file.stat().st_mtime
+                    with open(entry_file, 'r') as f:
+                        size = json.load(f).get("size", 0)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    continue
+                entries.append((mtime, size, entry_file.parent))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_dir in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
@@ -0,0 +1,154 @@
+import contextvars
+import json
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from app.services import encoding, progress
+from app.services.ffmpeg_tools import (ffmpeg_binary, ffprobe_binary,
+                                       has_audio, probe_video, run_tool)
+
+logger = logging.getLogger(__name__)
+
+# Pieces shorter than this are dropped rather than encoded
+MIN_PIECE = 0.01
+
+
+def keyframe_times(path) -> list:
+    """Keyframe timestamps from the packet index, without decoding any frames
+
+    Relative to the file's start_time, which is what ffmpeg's input -ss counts from.
+    """
+    ffprobe = ffprobe_binary()
+    if ffprobe is None:
+        # Callers fall back to a full re-encode
+        raise RuntimeError("Smart cut needs ffprobe to read the packet index")
+    out = run_tool([
+        ffprobe, "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags:format=start_time", "-of", "json", str(path)
+    ])
+    info = json.loads(out)
+    offset = float(info.get("format", {}).get("start_time") or 0.0)
+    times = []
+    for packet in info.get("packets", []):
+        pts = packet.get("pts_time")
+        if "K" in packet.get("flags", "") and pts not in (None, "N/A"):
+            times.append(float(pts) - offset)
+    return sorted(times)
+
+
+def merge_ranges(ranges, gap: float = 1e-3):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start - merged[-1][1] <= gap:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def plan_pieces(ranges, keyframes):
+    """Split kept ranges into ('copy', s, e) whole GOPs and ('encode', s, e) partial GOPs"""
+    pieces = []
+    for start, end in merge_ranges(ranges):
+        inside = [k for k in keyframes if start <= k <= end]
+        if len(inside) < 2:
+            pieces.append(("encode", start, end))
+            continue
+        first, last = inside[0], inside[-1]
+        if first - start > MIN_PIECE:
+            pieces.append(("encode", start, first))
+        pieces.append(("copy", first, last))
+        if end - last > MIN_PIECE:
+            pieces.append(("encode", last, end))
+    return [p for p in pieces if p[2] - p[1] > MIN_PIECE]
+
+
+def _piece_cmd(input_path, kind, start, end, piece_path, probe, profile, threads):
+    """Video-only piece; the audio is cut once over the whole timeline by _audio_cmd"""
+    cmd = [
+        ffmpeg_binary(), "-nostdin", "-y", "-v", "error",
+        "-ss", f"{start:.6f}", "-i", str(input_path), "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-an",
+    ]
+    if kind == "copy":
+        cmd += ["-c:v", "copy"]
+    else:
+        # Match the source stream so the pieces concatenate without a re-encode
+        cmd += ["-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"]),
+                "-pix_fmt", probe.get("pix_fmt", "yuv420p"),
+                "-r", probe.get("r_frame_rate", "30/1"),
+                "-threads", str(threads)]
+        h264_profile = (probe.get("profile") or "").lower().replace("constrained ", "")
+        if h264_profile in ("baseline", "main", "high"):
+            cmd += ["-profile:v", h264_profile]
+        level = probe.get("level")
+        if isinstance(level, int) and level > 0:
+            cmd += ["-level", f"{level / 10:.1f}"]
+        for option in ("color_range", "color_space", "color_primaries", "color_trc"):
+            if probe.get(option) not in (None, "unknown"):
+                cmd += [f"-{option}", probe[option]]
+    cmd += ["-bsf:v", "h264_mp4toannexb", "-f", "mpegts", str(piece_path)]
+    return cmd
+
+
+def _audio_cmd(input_path, pieces, audio_path, profile):
+    """Encode the kept audio in one pass, so the joins carry no per-piece encoder priming"""
+    trims = "".join(
+        f"[0:a:0]atrim={start:.6f}:{end:.6f},asetpts=PTS-STARTPTS[a{i}];"
+        for i, (_, start, end) in enumerate(pieces)
+    )
+    inputs = "".join(f"[a{i}]" for i in range(len(pieces)))
+    return [
+        ffmpeg_binary(), "-nostdin", "-y", "-v", "error", "-i", str(input_path),
+        "-filter_complex", f"{trims}{inputs}concat=n={len(pieces)}:v=0:a=1[out]",
+        "-map", "[out]", *encoding.ffmpeg_audio_args(profile), str(audio_path)
+    ]
+
+
+def smart_render(input_path, ranges, output_path, profile: dict, probe: dict = None, max_workers: int = None):
+    """Cut ranges out of input_path, stream-copying whole GOPs and re-encoding only cut boundaries"""
+    probe = probe or probe_video(input_path)
+    pieces = plan_pieces(ranges, keyframe_times(input_path))
+    if not pieces:
+        raise ValueError("Nothing to render: no kept ranges")
+
+    output_path = Path(output_path)
+    with tempfile.TemporaryDirectory(dir=output_path.parent, prefix=".smartcut-") as workdir:
+        piece_paths = [Path(workdir) / f"piece_{i:05d}.ts" for i in range(len(pieces))]
+        max_workers = max_workers or encoding.encoder_threads()
+        cmds = [
+            _piece_cmd(input_path, kind, start, end, piece_path, probe, profile,
+                       threads=max(1, encoding.encoder_threads() // max_workers))
+            for (kind, start, end), piece_path in zip(pieces, piece_paths)
+        ]
+        audio_path = Path(workdir) / "audio.m4a" if has_audio(input_path) else None
+        if audio_path is not None:
+            cmds.append(_audio_cmd(input_path, pieces, audio_path, profile))
+        with encoding.encode_slot(), ThreadPoolExecutor(max_workers=max_workers) as pool:
+            # Pieces run in the caller's context so cancelling the task reaches their ffmpeg
+            futures = [pool.submit(contextvars.copy_context().run, run_tool, cmd) for cmd in cmds]
+            try:
+                for done, future in enumerate(futures, 1):
+                    future.result()
+                    progress.update(done, len(cmds), "encode")
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        concat_list = Path(workdir) / "concat.txt"
+        concat_list.write_text("".join(f"file '{p.name}'\n" for p in piece_paths))
+        cmd = [
+            ffmpeg_binary(), "-nostdin", "-y", "-v", "error",
+            "-f", "concat", "-safe", "0", "-i", str(concat_list),
+        ]
+        if audio_path is not None:
+            cmd += ["-i", str(audio_path), "-map", "0:v:0", "-map", "1:a:0"]
+        run_tool([*cmd, "-c", "copy", "-movflags", "+faststart", str(output_path)])
+
+    copied = sum(e - s for kind, s, e in pieces if kind == "copy")
+    total = sum(e - s for _, s, e in pieces)
+    logger.info(f"Smart render: {len(pieces)} pieces, {copied:.1f}s of {total:.1f}s stream-copied")
+    return output_path
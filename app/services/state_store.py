@@ -0,0 +1,229 @@
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    file_id TEXT,
+    status TEXT,
+    data TEXT NOT NULL,
+    detached INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_file_id ON tasks(file_id);
+CREATE TABLE IF NOT EXISTS file_versions (
+    file_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+class StateDatabase:
+    """One SQLite database shared by every API worker; a connection per thread"""
+
+    def __init__(self, path: str):
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._shared = None
+        if path == ":memory:":
+            # Single-process state: one connection, serialized by a lock
+            self._shared = sqlite3.connect(":memory:", isolation_level=None, check_same_thread=False)
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.path = str(Path(path).resolve())
+        with self.connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def connect(self):
+        if self._shared is not None:
+            with self._lock:
+                yield self._shared
+            return
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        yield conn
+
+
+def _dumps(value: dict) -> str:
+    return json.dumps(value, default=str)
+
+
+class TaskTable(MutableMapping):
+    """task_id -> status dict, backed by the tasks table
+
+    Behaves like the dict it replaces; patch() merges fields in one transaction
+    for frequent progress writes. A task recorded as an alias reads as the task
+    it was coalesced into.
+    """
+
+    def __init__(self, db: StateDatabase):
+        self.db = db
+
+    def __getitem__(self, task_id):
+        with self.db.connect() as conn:
+            row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            raise KeyError(task_id)
+        value = json.loads(row[0])
+        target = value.get("alias_of")
+        if target and target != task_id:
+            return {**self[target], "alias_of": target}
+        return value
+
+    def __setitem__(self, task_id, value: dict):
+        with self.db.connect() as conn:
+            self._write(conn, task_id, value)
+
+    def _write(self, conn, task_id, value: dict):
+        conn.execute(
+            "INSERT INTO tasks (task_id, file_id, status, data, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(task_id) DO UPDATE SET file_id = COALESCE(excluded.file_id, tasks.file_id), "
+            "status = excluded.status, data = excluded.data, updated_at = excluded.updated_at",
+            (task_id, value.get("file_id"), value.get("status"), _dumps(value), time.time())
+        )
+
+    def __delitem__(self, task_id):
+        with self.db.connect() as conn:
+            cur = conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        if not cur.rowcount:
+            raise KeyError(task_id)
+
+    def __iter__(self):
+        with self.db.connect() as conn:
+            rows = conn.execute("SELECT task_id FROM tasks").fetchall()
+        return iter([r[0] for r in rows])
+
+    def __len__(self):
+        with self.db.connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def patch(self, task_id, **fields) -> dict:
+        """Merge fields into a task's record and return the new record"""
+        with self.db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+                value = {**(json.loads(row[0]) if row else {}), **fields}
+                self._write(conn, task_id, value)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def alias(self, task_id, target_id, file_id=None):
+        """Make task_id report the status of target_id, which does the actual work"""
+        self[task_id] = {"alias_of": target_id, "file_id": file_id}
+
+    def view(self, task_id):
+        """The record task_id's own client sees, or None for an unknown task
+
+        Same as get() except for a detached task, which reads as cancelled
+        while its job runs on for the requests aliased to it.
+        """
+        with self.db.connect() as conn:
+            row = conn.execute("SELECT file_id, detached FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row and row[1]:
+            return {"status": "cancelled", "stage": "cancelled", "file_id": row[0]}
+        return self.get(task_id)
+
+    def _live_aliases(self, conn, task_id) -> int:
+        return conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE json_extract(data, '$.alias_of') = ?", (task_id,)
+        ).fetchone()[0]
+
+    def detach(self, task_id) -> bool:
+        """Cancel task_id for its own client only, if other tasks are still aliased to it
+
+        Its job keeps running and writing to task_id for them. Returns False
+        when there is no live alias, so the job itself should be cancelled.
+        """
+        with self.db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                detached = self._live_aliases(conn, task_id) > 0
+                if detached:
+                    conn.execute("UPDATE tasks SET detached = 1 WHERE task_id = ?", (task_id,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return detached
+
+    def unalias(self, task_id):
+        """Cancel an aliased task without touching the task it reads through
+
+        Returns that target's id once nothing wants its job any more (it was
+        detached and this was its last alias), else None.
+        """
+        with self.db.connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+                value = json.loads(row[0]) if row else {}
+                target = value.get("alias_of")
+                self._write(conn, task_id, {"status": "cancelled", "file_id": value.get("file_id")})
+                orphaned = None
+                if target and not self._live_aliases(conn, target):
+                    detached = conn.execute("SELECT detached FROM tasks WHERE task_id = ?", (target,)).fetchone()
+                    if detached and detached[0]:
+                        orphaned = target
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return orphaned
+
+    def for_file(self, file_id) -> dict:
+        with self.db.connect() as conn:
+            rows = conn.execute(
+                "SELECT task_id, data FROM tasks WHERE file_id = ? ORDER BY updated_at", (file_id,)
+            ).fetchall()
+        return {task_id: json.loads(data) for task_id, data in rows}
+
+
+class VersionTable(MutableMapping):
+    """file_id -> latest processed version, backed by the file_versions table"""
+
+    def __init__(self, db: StateDatabase):
+        self.db = db
+
+    def __getitem__(self, file_id):
+        with self.db.connect() as conn:
+            row = conn.execute("SELECT data FROM file_versions WHERE file_id = ?", (file_id,)).fetchone()
+        if row is None:
+            raise KeyError(file_id)
+        return json.loads(row[0])
+
+    def __setitem__(self, file_id, value: dict):
+        with self.db.connect() as conn:
+            conn.execute(
+                "INSERT INTO file_versions (file_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(file_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (file_id, _dumps(value), time.time())
+            )
+
+    def __delitem__(self, file_id):
+        with self.db.connect() as conn:
+            cur = conn.execute("DELETE FROM file_versions WHERE file_id = ?", (file_id,))
+        if not cur.rowcount:
+            raise KeyError(file_id)
+
+    def __iter__(self):
+        with self.db.connect() as conn:
+            rows = conn.execute("SELECT file_id FROM file_versions").fetchall()
+        return iter([r[0] for r in rows])
+
+    def __len__(self):
+        with self.db.connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM file_versions").fetchone()[0]
@@ -0,0 +1,110 @@
+from functools import lru_cache
+from pathlib import Path
+
+from app.services import encoding
+from app.services.ffmpeg_tools import ffmpeg_binary, run_tool
+
+# Same layout as the TextClip captions: 90% wide, 8% up from the bottom
+CAPTION_WIDTH_RATIO = 0.9
+BOTTOM_MARGIN_RATIO = 0.08
+FONT = "Arial"
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 0
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Caption,{font},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,-1,0,0,0,100,100,0,0,1,1,0,2,{margin_x},{margin_x},{margin_v},1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def ass_timestamp(seconds: float) -> str:
+    cs = int(round(max(0.0, seconds) * 100))
+    h, cs = divmod(cs, 360000)
+    m, cs = divmod(cs, 6000)
+    s, cs = divmod(cs, 100)
+    return f"{h}:{m:02d}:{s:02d}.{cs:02d}"
+
+
+def srt_timestamp(seconds: float) -> str:
+    ms = int(round(max(0.0, seconds) * 1000))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def caption_events(segments, new_starts):
+    """(start, end, text) per segment, placed at its start on the output timeline"""
+    for seg, start in zip(segments, new_starts):
+        text = seg['text'].strip()
+        if text:
+            yield start, start + seg['end'] - seg['start'], text
+
+
+def write_ass(path, segments, new_starts, size, font_size=28) -> Path:
+    width, height = int(size[0]), int(size[1])
+    lines = [ASS_HEADER.format(
+        width=width,
+        height=height,
+        font=FONT,
+        font_size=font_size,
+        margin_x=int(width * (1 - CAPTION_WIDTH_RATIO) / 2),
+        margin_v=int(height * BOTTOM_MARGIN_RATIO)
+    )]
+    for start, end, text in caption_events(segments, new_starts):
+        # Braces would open ASS override blocks
+        text = text.replace('{', '(').replace('}', ')').replace('\n', '\\N')
+        lines.append(f"Dialogue: 0,{ass_timestamp(start)},{ass_timestamp(end)},Caption,,0,0,0,,{text}\n")
+
+    path = Path(path)
+    path.write_text("".join(lines), encoding="utf-8")
+    return path
+
+
+def write_srt(path, segments, new_starts) -> Path:
+    blocks = [
+        f"{i}\n{srt_timestamp(start)} --> {srt_timestamp(end)}\n{text}\n"
+        for i, (start, end, text) in enumerate(caption_events(segments, new_starts), 1)
+    ]
+    path = Path(path)
+    path.write_text("\n".join(blocks), encoding="utf-8")
+    return path
+
+
+@lru_cache(maxsize=None)
+def has_libass() -> bool:
+    """Whether this ffmpeg build has the libass subtitles filter"""
+    try:
+        out = run_tool([ffmpeg_binary(), "-hide_banner", "-filters"])
+    except (RuntimeError, OSError):
+        return False
+    return any(line.split()[1:2] == ["subtitles"] for line in out.splitlines())
+
+
+def subtitles_filter(path) -> str:
+    """ffmpeg filter that burns an ASS file into the frames"""
+    escaped = str(path).replace('\\', '/').replace(':', '\\:').replace("'", "\\'")
+    return f"subtitles='{escaped}'"
+
+
+def burn_subtitles(input_path, subtitle_path, output_path, profile: dict, on_progress=None):
+    """Decode, burn in and encode entirely inside ffmpeg"""
+    filters = encoding.video_filters(profile, [subtitles_filter(subtitle_path)])
+    run_tool([
+        ffmpeg_binary(), "-nostdin", "-y", "-v", "error",
+        "-i", str(input_path),
+        "-vf", ",".join(filters),
+        *encoding.ffmpeg_video_args(profile),
+        *encoding.ffmpeg_audio_args(profile),
+        "-movflags", "+faststart",
+        "-f", "mp4", str(output_path)
+    ], on_progress=on_progress)
+    return output_path
@@ -0,0 +1,60 @@
+import re
+from collections import deque
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case alphanumerics separated by single spaces; shared by all transcript matching"""
+    text = re.sub(r'[^a-zA-Z0-9]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class KeywordMatcher:
+    """Aho–Corasick automaton: every occurrence of every keyword in one pass over the text
+
+    Keywords and text go through normalize_text, so case and punctuation never
+    decide a match. Matches are substrings, as before ('dog' hits 'dogs').
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for idx, keyword in enumerate(self.keywords):
+            pattern = normalize_text(keyword)
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append((idx, len(pattern)))
+
+        # Breadth-first so each failure link points at an already finished state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if state else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def finditer(self, text: str):
+        """Yield (start, end, keyword index) for every match in already-normalized text"""
+        state = 0
+        for pos, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for idx, length in self._out[state]:
+                yield pos + 1 - length, pos + 1, idx
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+from app.services import metrics
+from app.services.file_hashing import content_hash
+
+
+class TranscriptStore:
+    """On-disk transcript cache keyed by content hash, model and decode options"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key_for(self, file_path, model_name: str, decode_options: dict) -> str:
+        options = json.dumps(decode_options, sort_keys=True, default=str)
+        raw = f"{content_hash(file_path)}:{model_name}:{options}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str):
+        entry = self._entry_path(key)
+        try:
+            with open(entry, 'r') as f:
+                transcript = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            metrics.count("cache_requests_total", cache="transcript", result="miss")
+            return None
+        metrics.count("cache_requests_total", cache="transcript", result="hit")
+        try:
+            # mtime doubles as the LRU clock
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return transcript
+
+    def put(self, key: str, transcript: dict):
+        entry = self._entry_path(key)
+        temp = entry.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with open(temp, 'w') as f:
+            json.dump(transcript, f, default=float)
+        os.replace(temp, entry)
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the store fits max_bytes"""
+        with self._lock:
+            entries = []
+            for entry in self.cache_dir.glob("*.json"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                entry.unlink(missing_ok=True)
+                total -= size
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import Settings
+from app.services import cancellation, progress
+from app.services.audio_store import PcmWindow
+from app.services.chunking import SAMPLE_RATE, stitch_transcripts
+from app.services.model_pool import WhisperModelPool
+
+logger = logging.getLogger(__name__)
+
+# Model pool owned by each transcription worker process
+_worker_pool = None
+
+
+def _init_worker(model_names):
+    global _worker_pool
+    _worker_pool = WhisperModelPool(model_names, 1).load()
+
+
+def _read_audio(audio):
+    # Windows are read from the memory-mapped sidecar inside the worker
+    return audio.read() if isinstance(audio, PcmWindow) else audio
+
+
+def _transcribe_job(audio, model_name: str, decode_options: dict):
+    audio = _read_audio(audio)
+    with _worker_pool.acquire(model_name) as model:
+        transcript = model.transcribe(audio, **decode_options)
+    return transcript, os.getpid(), _worker_pool.status()
+
+
+def _warm_job():
+    # The initializer has loaded the models by the time this runs
+    return os.getpid(), _worker_pool.status()
+
+
+class TranscriptionService:
+    """Whisper transcription on a dedicated process pool behind an async job queue"""
+
+    def __init__(self, settings: Settings, model_pool: WhisperModelPool = None):
+        self.workers = max(0, settings.TRANSCRIBE_WORKERS)
+        self.timeout = settings.TRANSCRIBE_TIMEOUT
+        self.model_names = [settings.WHISPER_MODEL, *settings.WHISPER_PRELOAD_MODELS]
+        self.model_pool = model_pool or WhisperModelPool(
+            self.model_names, settings.WHISPER_POOL_SIZE
+        )
+        # One single-process pool per worker, so a job that times out can be killed alone
+        self._executors = []
+        self._idle = []
+        self._slots = None
+        self._worker_status = {}
+        self.stats = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "timed_out": 0, "cancelled": 0}
+
+    def start(self):
+        """Start and warm the worker processes, or warm the in-process pool when workers == 0"""
+        if not self.workers:
+            self.model_pool.load()
+            return self
+        if not self._executors:
+            self._executors = [self._spawn() for _ in range(self.workers)]
+            self._idle = list(range(self.workers))
+        return self
+
+    def _spawn(self) -> ProcessPoolExecutor:
+        # torch does not survive fork, so workers are always spawned
+        executor = ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_names,)
+        )
+        # Processes start on the first submit; warm them now rather than on the first request
+        executor.submit(_warm_job).add_done_callback(self._warmed)
+        return executor
+
+    def _warmed(self, future):
+        try:
+            pid, pool_status = future.result()
+        except Exception as e:
+            logger.warning(f"Transcription worker failed to warm up: {e}")
+            return
+        self._worker_status[pid] = pool_status
+
+    def shutdown(self):
+        executors, self._executors = self._executors, []
+        for executor in executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle(self, index: int):
+        """Kill one worker after a timeout; a running job can't be cancelled otherwise"""
+        executor = self._executors[index]
+        for process in list(executor._processes.values()):
+            self._worker_status.pop(process.pid, None)
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._executors[index] = self._spawn()
+
+    def _run_local(self, audio, model_name: str, decode_options: dict):
+        audio = _read_audio(audio)
+        with self.model_pool.acquire(model_name) as model:
+            return model.transcribe(audio, **decode_options)
+
+    @property
+    def parallelism(self) -> int:
+        """How many transcriptions run at once"""
+        return self.workers or self.model_pool.size_per_model
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.parallelism)
+        return self._slots
+
+    async def transcribe(self, audio, model_name: str, decode_options: dict) -> dict:
+        """Queue a transcription job and await its result without blocking the loop"""
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots()
+
+        self.stats["queued"] += 1
+        try:
+            await slots.acquire()
+        finally:
+            self.stats["queued"] -= 1
+
+        self.stats["running"] += 1
+        worker = None
+        try:
+            # Windows still waiting for a slot don't start for a cancelled task
+            cancellation.check()
+            if self.workers:
+                self.start()
+                # Holding a slot guarantees an idle worker
+                worker = self._idle.pop()
+                future = loop.run_in_executor(
+                    self._executors[worker], _transcribe_job, audio, model_name, decode_options
+                )
+            else:
+                future = loop.run_in_executor(
+                    None, self._run_local, audio, model_name, decode_options
+                )
+            result = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            if worker is not None:
+                self._recycle(worker)
+            raise TimeoutError(f"Transcription exceeded {self.timeout}s")
+        except cancellation.TaskCancelled:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.stats["running"] -= 1
+            if worker is not None:
+                self._idle.append(worker)
+            slots.release()
+
+        self.stats["completed"] += 1
+        if not self.workers:
+            return result
+
+        transcript, pid, pool_status = result
+        self._worker_status[pid] = pool_status
+        return transcript
+
+    async def transcribe_chunked(self, pcm_path, windows, model_name: str, decode_options: dict) -> dict:
+        """Transcribe (start, end) sidecar windows in parallel and stitch them back together"""
+        pcm_path = str(pcm_path)
+        done = 0
+
+        async def transcribe_window(start, end, options):
+            nonlocal done
+            part = await self.transcribe(PcmWindow(pcm_path, start, end), model_name, options)
+            done += 1
+            progress.update(done, len(windows), "transcribe")
+            return part
+
+        (start, end), *rest = windows
+        first = await transcribe_window(start, end, decode_options)
+
+        # Pin the language detected on the first window so every window decodes alike
+        options = {"language": first.get("language"), **decode_options}
+        parts = [first, *await asyncio.gather(*(
+            transcribe_window(start, end, options) for start, end in rest
+        ))]
+        return stitch_transcripts(
+            [(start / SAMPLE_RATE, part) for (start, _), part in zip(windows, parts)]
+        )
+
+    def status(self) -> dict:
+        if self.workers:
+            models = {str(pid): status for pid, status in self._worker_status.items()}
+        else:
+            models = {str(os.getpid()): self.model_pool.status()}
+        return {
+            "mode": "process" if self.workers else "thread",
+            "workers": self.workers,
+            "timeout": self.timeout,
+            **self.stats,
+            "model_pools": models,
+        }
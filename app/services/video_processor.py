@@ -1,53 +1,215 @@
 import asyncio
 import hashlib
 import json
+import logging
 import os
-import re
-from difflib import SequenceMatcher
-from functools import lru_cache
+import tempfile
 from pathlib import Path
 
-import whisper
 from moviepy.audio.AudioClip import CompositeAudioClip
 from moviepy.audio.fx.all import audio_loop, volumex
 from moviepy.audio.io.AudioFileClip import AudioFileClip
 from moviepy.editor import (ColorClip, CompositeVideoClip, TextClip,
                             VideoFileClip, concatenate_videoclips)
-from werkzeug.utils import secure_filename
 
 from app.config import Settings
 from app.mcp_protocol import mcp_registry
+from app.services.audio_store import AudioStore, PcmWindow
+from app.services.broll_library import BrollLibrary
+from app.services import (cancellation, chunked_render, dedupe, encoding,
+                          metrics, progress, remux, smart_cut, subtitles,
+                          visual_dedupe)
+from app.services.chunking import SAMPLE_RATE, silence_windows
+from app.services.compositor import OverlayCompositor
+from app.services.ffmpeg_tools import (can_copy_video, probe_duration,
+                                       probe_video)
+from app.services.job_queue import coalesce_key
+from app.services.render_cache import RenderCache
+from app.services.state_store import StateDatabase, TaskTable, VersionTable
+from app.services.text_matching import KeywordMatcher, normalize_text
+from app.services.transcript_store import TranscriptStore
+from app.services.transcription import TranscriptionService
 from app.tools import *
 
+logger = logging.getLogger(__name__)
+
+# Settings a step's output depends on besides its params; all of them go into the render cache key
+OUTPUT_SETTING_PREFIXES = ('DEFAULT_', 'VISUAL_DEDUPE_', 'TRANSCRIBE_CHUNK')
+OUTPUT_SETTINGS = ('WHISPER_MODEL', 'DEDUPE_SCOPE')
+
 
 class VideoProcessor:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, transcription: TranscriptionService = None):
         self.settings = settings
-        self.active_tasks = {}
-        self.file_versions = {}
+        self.transcription = transcription or TranscriptionService(settings)
+        self.transcript_store = TranscriptStore(
+            settings.TRANSCRIPT_CACHE_DIR,
+            settings.TRANSCRIPT_CACHE_MAX_BYTES
+        )
+        self.audio_store = AudioStore(settings.AUDIO_CACHE_DIR)
+        self.render_cache = RenderCache(settings.RENDER_CACHE_DIR, settings.RENDER_CACHE_MAX_BYTES)
+        self._init_timeline()
+        # Shared with every API worker so status and cached versions survive restarts
+        state_db = StateDatabase(settings.STATE_DB_PATH)
+        metrics.init(state_db)
+        self.active_tasks = TaskTable(state_db)
+        self.file_versions = VersionTable(state_db)
+        # coalesce_key -> (task_id, future) of renders running in this process
+        self._inflight = {}
+        # transcript key -> future of the transcription running in this process
+        self._transcribing = {}
         self.mcp_registry = mcp_registry
 
         self.mcp_registry.register("remove_duplicates", RemoveDuplicatesTool)
         self.mcp_registry.register("add_captions", CaptionTool)
         self.mcp_registry.register("add_music", MusicTool)
         self.mcp_registry.register("add_broll", BrollTool)
-        
+
+    def _init_timeline(self):
+        self.broll_library = BrollLibrary(self.settings.BROLL_DIR, self.settings.BROLL_CACHE_DIR)
+        # Fused AI-edit steps: (clip, segments, args) -> (clip, segments)
+        self.timeline_steps = {
+            "remove_duplicates": self.timeline_remove_duplicates,
+            "add_captions": self.timeline_captions,
+            "add_music": self.timeline_music,
+            "add_broll": self.timeline_broll,
+        }
+
+    @classmethod
+    def timeline_only(cls, settings: Settings):
+        """An instance that can only build timelines, for chunk workers
+
+        No state database, transcription service or caches are opened.
+        """
+        processor = cls.__new__(cls)
+        processor.settings = settings
+        processor._init_timeline()
+        return processor
+
+
+    def step_plan(self, processing_step: str, params: dict) -> list:
+        """A single step as a one-entry plan; AI edits carry their own"""
+        if processing_step == 'ai_edit':
+            return params.get('plan', [])
+        return [{'name': processing_step, 'args': params}]
+
+    def input_duration(self, file_id, processing_step: str, params: dict):
+        """Seconds of media a step reads, so stage timings can be read as real-time factors"""
+        try:
+            input_path = self.resolve_plan_input(file_id, self.step_plan(processing_step, params), params)
+            return probe_duration(input_path) or None
+        except (FileNotFoundError, RuntimeError):
+            return None
+
+    def render_cache_key(self, file_id, processing_step: str, params: dict):
+        """Render cache key for a step (or a whole AI-edit plan) on its current input
+
+        None when the input can't be resolved; the step itself reports that error.
+        """
+        plan = self.step_plan(processing_step, params)
+        try:
+            input_path = self.resolve_plan_input(file_id, plan, params)
+            extra_inputs = [
+                self.resolve_music_path(step.get('args', {})) for step in plan if step['name'] == 'add_music'
+            ]
+        except (FileNotFoundError, ValueError):
+            return None
+        context = {
+            name: value for name, value in self.settings.model_dump().items()
+            if name.startswith(OUTPUT_SETTING_PREFIXES) or name in OUTPUT_SETTINGS
+        }
+        if any(step['name'] == 'add_captions' for step in plan):
+            # Without libass the same params render TextClip captions
+            context['libass'] = subtitles.has_libass()
+        if any(step['name'] == 'add_broll' for step in plan):
+            context['broll_library'] = self.broll_library.signature()
+        return self.render_cache.key_for(
+            input_path, processing_step, params, self.encoder_profile(params), extra_inputs, context
+        )
 
     def get_file_version(self, file_id, processing_steps):
         sorted_steps = json.dumps(processing_steps, sort_keys=True)
         return f"{file_id}-{hashlib.md5(sorted_steps.encode()).hexdigest()[:8]}"
 
 
-    @lru_cache(maxsize=32)
-    def transcribe_video(self, file_path):
-        model = whisper.load_model(self.settings.WHISPER_MODEL)
-        return model.transcribe(str(file_path), word_timestamps=True)
+    async def transcribe_video(self, file_path, **decode_options):
+        """Transcribe once per file content; every step and worker shares the result"""
+        settings = self.settings
+        model_name = settings.WHISPER_MODEL
+        decode_options = {"word_timestamps": True, **decode_options}
+        cache_options = dict(decode_options)
+        # Windows only pay for their stitching when more than one of them runs at a time
+        chunked = settings.TRANSCRIBE_CHUNKED and self.transcription.parallelism > 1
+        if chunked:
+            cache_options["chunk_seconds"] = settings.TRANSCRIBE_CHUNK_SECONDS
+
+        # Hashing and cache I/O are blocking, keep them off the event loop
+        key = await progress.run_blocking(
+            self.transcript_store.key_for, file_path, model_name, cache_options
+        )
+        while True:
+            transcript = await progress.run_blocking(self.transcript_store.get, key)
+            if transcript is not None:
+                return transcript
+            pending = self._transcribing.get(key)
+            if pending is None:
+                break
+            # Already being transcribed here, e.g. by the step's preview: wait for that run
+            progress.stage("transcribe")
+            try:
+                return await asyncio.shield(pending)
+            except (asyncio.CancelledError, cancellation.TaskCancelled):
+                if not pending.done():
+                    raise
+                # Its caller was stopped, not this one; transcribe here instead
+                cancellation.check()
+
+        pending = asyncio.get_running_loop().create_future()
+        self._transcribing[key] = pending
+        try:
+            transcript = await self._transcribe_uncached(file_path, model_name, decode_options, chunked)
+            await progress.run_blocking(self.transcript_store.put, key, transcript)
+            pending.set_result(transcript)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except BaseException as e:
+            pending.set_exception(e)
+            # Retrieved here so a failure nobody waited on isn't logged again
+            pending.exception()
+            raise
+        finally:
+            self._transcribing.pop(key, None)
+        return transcript
+
+    async def _transcribe_uncached(self, file_path, model_name, decode_options, chunked):
+        settings = self.settings
+        progress.stage("transcribe")
+        with metrics.span("transcribe") as span:
+            # Decode the audio once into a memory-mapped 16 kHz sidecar shared by all readers
+            pcm_path, pcm = await progress.run_blocking(self.audio_store.load, file_path)
+            span["input_seconds"] = len(pcm) / SAMPLE_RATE
+            windows = [(0, len(pcm))]
+            if chunked and len(pcm) >= settings.TRANSCRIBE_CHUNK_MIN_SECONDS * SAMPLE_RATE:
+                windows = await progress.run_blocking(
+                    silence_windows, pcm, settings.TRANSCRIBE_CHUNK_SECONDS
+                )
+
+            if len(windows) > 1:
+                transcript = await self.transcription.transcribe_chunked(
+                    pcm_path, windows, model_name, decode_options
+                )
+            else:
+                transcript = await self.transcription.transcribe(
+                    PcmWindow(str(pcm_path), 0, len(pcm)), model_name, decode_options
+                )
+        return transcript
     
     
     @staticmethod
     def handle_processing(processing_step: str):
         def decorator(func):
-            async def wrapper(self, task_id: str, file_id: str, *args, **kwargs):
+            async def process(self, task_id: str, file_id: str, *args, **kwargs):
                 # Common setup
 
                 result_template = {
@@ -59,43 +221,102 @@ class VideoProcessor:
 
                 cached = self.file_versions.get(file_id, {})
                 existing_steps = cached.get('processing_steps', [])
-
-                # Check cache first
-                if processing_step in cached:
+                params = args[0] if args else kwargs.get('params', {})
+
+                # Same input bytes, step, params and encoder profile: reuse the earlier render
+                cache_key = await progress.run_blocking(self.render_cache_key, file_id, processing_step, params)
+                entry = cache_key and await progress.run_blocking(self.render_cache.get, cache_key)
+                if entry:
+                    restored = await progress.run_blocking(
+                        self.render_cache.restore, entry, Path(self.settings.PROCESSED_DIR) / file_id
+                    )
+                    new_steps = existing_steps + entry['processing_steps']
+                    self.file_versions[file_id] = {
+                        'output_path': str(restored['output']),
+                        'segments_path': str(restored['segments']) if 'segments' in restored else cached.get('segments_path', ''),
+                        'processing_steps': new_steps
+                    }
                     self.active_tasks[task_id] = {
                         "status": "completed",
                         "result": {
-                            **cached,
-                            "output_filename": Path(cached['output_path']).name,
-                            "download_url": f"{cached['download_url']}{Path(cached['output_path']).name}",
+                            **result_template,
+                            "output_filename": restored['output'].name,
+                            "download_url": f"{result_template['download_url']}{restored['output'].name}",
                             "message": f"{processing_step.replace('_', ' ').title()} (cached)",
-
+                            'processing_steps': new_steps
                         }
                     }
                     return
 
-                # Execute the actual processing
-                # try:
-                result = await func(self, task_id, file_id, *args, **kwargs)
-                
-                new_steps = existing_steps + [processing_step]
-                # Update cache
-                self.file_versions[file_id] = {
-                    'output_path': str(result['output_path']),
-                    'segments_path': result.get('segments_path') or cached.get('segments_path',''),
-                    'processing_steps': new_steps
-                }
+                # Identical work already running in this process: report its task, don't redo it
+                key = coalesce_key(processing_step, file_id, params)
+                leader = self._inflight.get(key)
+                if leader is not None:
+                    leader_task_id, done = leader
+                    self.active_tasks.alias(task_id, leader_task_id, file_id)
+                    await asyncio.shield(done)
+                    return
 
-                # Set task status
-                self.active_tasks[task_id] = {
-                    "status": "completed",
-                    "result": {
-                        **result_template,
-                        "output_filename": Path(result['output_path']).name,
-                        "download_url": f"{result_template['download_url']}{Path(result['output_path']).name}",
+                done = asyncio.get_running_loop().create_future()
+                self._inflight[key] = (task_id, done)
+                try:
+                    metrics.tag(input_seconds=await progress.run_blocking(
+                        self.input_duration, file_id, processing_step, params
+                    ))
+                    reporter = progress.ProgressReporter(self.active_tasks, task_id)
+                    token = progress.current_reporter.set(reporter)
+                    preview = None
+                    try:
+                        # Fast low-resolution proxy alongside the full-quality render
+                        if self.settings.PREVIEW_ENABLED and params.get('preview', True):
+                            preview = self.start_preview(task_id, file_id, processing_step, params)
+
+                        # Execute the actual processing
+                        cancellation.check()
+                        reporter.stage("render")
+                        result = await func(self, task_id, file_id, *args, **kwargs)
+                    finally:
+                        # Stopped before the result is written, so a late preview can't overwrite it
+                        if preview is not None:
+                            await self.stop_preview(preview)
+                        progress.current_reporter.reset(token)
+                
+                    step_names = result.get('processing_steps', [processing_step])
+                    new_steps = existing_steps + step_names
+                    if cache_key:
+                        outputs = {'output': result['output_path']}
+                        if result.get('segments_path'):
+                            outputs['segments'] = result['segments_path']
+                        await progress.run_blocking(
+                            self.render_cache.put, cache_key, outputs, {'processing_steps': step_names}
+                        )
+                    # Update cache
+                    self.file_versions[file_id] = {
+                        'output_path': str(result['output_path']),
+                        'segments_path': result.get('segments_path') or cached.get('segments_path',''),
                         'processing_steps': new_steps
                     }
-                }
+
+                    # Set task status
+                    self.active_tasks[task_id] = {
+                        "status": "completed",
+                        "result": {
+                            **result_template,
+                            "output_filename": Path(result['output_path']).name,
+                            "download_url": f"{result_template['download_url']}{Path(result['output_path']).name}",
+                            'processing_steps': new_steps
+                        }
+                    }
+                    done.set_result(None)
+                except Exception as e:
+                    done.set_exception(e)
+                    # Retrieved here so an unawaited failure isn't logged twice
+                    done.exception()
+                    raise
+                finally:
+                    self._inflight.pop(key, None)
+                    if not done.done():
+                        done.cancel()
 
                 # except (IOError, OSError) as e:
                 #     print(f"File operation failed: {str(e)}")
@@ -110,6 +331,11 @@ class VideoProcessor:
                 #         "error": str(e)
                 #     }
 
+            async def wrapper(self, task_id: str, file_id: str, *args, **kwargs):
+                # Every stage timed inside the step is tagged with its task and step
+                with metrics.bind(task_id=task_id, step=processing_step):
+                    return await process(self, task_id, file_id, *args, **kwargs)
+
             return wrapper
         return decorator
 
@@ -124,15 +350,109 @@ class VideoProcessor:
         if not dedupe_threshold:
             dedupe_threshold = settings.DEFAULT_DUP_THRESH
 
-        segments = self.transcribe_video(input_path).get('segments', [])
+        dedupe_mode = params.get('dedupe_mode') or settings.DEFAULT_DEDUPE_MODE
+        if dedupe_mode == 'visual':
+            filtered_segments = [{'start': 0.0, 'end': await progress.run_blocking(probe_duration, input_path), 'text': ''}]
+        else:
+            segments = (await self.transcribe_video(input_path)).get('segments', [])
+            filtered_segments = await progress.run_blocking(
+                self.remove_duplicate_takes,
+                segments,
+                dedupe_threshold,
+                params.get('dedupe_scope')
+            )
+        if dedupe_mode in ('visual', 'both'):
+            repeats = await progress.run_blocking(self.visual_repeats, input_path)
+            filtered_segments = self.cut_repeated_footage(filtered_segments, repeats)
 
-        filtered_segments = await asyncio.get_running_loop().run_in_executor(
-            None,
-            self.remove_adjacent_duplicates,
-            segments,
-            dedupe_threshold
+        output_path = Path(settings.PROCESSED_DIR) / file_id / f"processed_{input_path.stem}.mp4"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Rendered aside and renamed over the output, which may be shared with the render cache
+        temp_path = output_path.with_suffix('.tmp.mp4')
+
+        profile = self.encoder_profile(params)
+        cut_mode = params.get('cut_mode') or settings.DEFAULT_CUT_MODE
+        rendered = False
+        # Stream copy keeps the source resolution, so scaled profiles always re-encode
+        if cut_mode == 'smart' and filtered_segments and not profile['max_height']:
+            rendered = await progress.run_blocking(
+                self.smart_cut_video,
+                input_path,
+                filtered_segments,
+                temp_path,
+                profile
+            )
+        if not rendered:
+            # Off the event loop, so the worker keeps renewing the lease and can cancel the encode
+            await progress.run_blocking(
+                self.reencode_cut_video,
+                input_path,
+                filtered_segments,
+                output_path,
+                profile,
+                temp_path
+            )
+        os.replace(str(temp_path), str(output_path))
+
+        segments_path = Path(settings.PROCESSED_DIR) / file_id / f"{input_path.stem}_segments.json"
+        # segments_path.parent.mkdir(parents=True, exist_ok=True) 
+
+        # On the cut video's timeline, which is what later steps and fused plans place captions and B-roll on
+        with open(segments_path, 'w') as f:
+            json.dump(self.retime_segments(filtered_segments), f, indent=2)
+
+        return {
+            'output_path': output_path,
+            'segments_path': segments_path,
+            'processing_step': 'remove_duplicates'
+        }
+
+    @metrics.span("dedupe")
+    def visual_repeats(self, input_path):
+        """Earlier takes of footage that appears again later, found from frame hashes"""
+        fps = self.settings.VISUAL_DEDUPE_FPS
+        hashes, usable = visual_dedupe.frame_hashes(input_path, fps)
+        repeats = visual_dedupe.repeated_ranges(
+            hashes, usable, fps,
+            min_seconds=self.settings.VISUAL_DEDUPE_MIN_SECONDS,
+            max_distance=self.settings.VISUAL_DEDUPE_MAX_DISTANCE
         )
+        logger.info(f"Visual dedupe: {len(hashes)} frames hashed, {len(repeats)} repeated ranges {repeats}")
+        return repeats
+
+    def cut_repeated_footage(self, segments, repeats):
+        """Remove repeated footage from kept segments; word timings stay with their piece"""
+        kept = []
+        for seg in segments:
+            pieces = visual_dedupe.subtract_ranges(seg['start'], seg['end'], repeats)
+            for n, (start, end) in enumerate(pieces):
+                piece = {**seg, 'start': start, 'end': end}
+                if seg.get('words'):
+                    piece['words'] = [w for w in seg['words'] if start <= w['start'] < end]
+                    piece['text'] = ''.join(w['word'] for w in piece['words'])
+                elif n:
+                    # Without word timings the caption stays on the first piece only
+                    piece['text'] = ''
+                kept.append(piece)
+        return kept
 
+    @metrics.span("encode")
+    def smart_cut_video(self, input_path, segments, output_path, profile) -> bool:
+        """Stream-copy kept GOPs and re-encode only cut boundaries; False if not applicable"""
+        try:
+            probe = probe_video(input_path)
+            if not can_copy_video(probe):
+                logger.info(f"Smart cut unsupported for {probe.get('codec_name')}/{probe.get('pix_fmt')}, re-encoding")
+                return False
+            ranges = [(s['start'], s['end']) for s in segments]
+            smart_cut.smart_render(input_path, ranges, output_path, profile, probe=probe)
+            return True
+        except (RuntimeError, ValueError, OSError) as e:
+            logger.warning(f"Smart cut failed, falling back to re-encode: {e}")
+            return False
+
+    def reencode_cut_video(self, input_path, filtered_segments, output_path, profile, temp_path=None):
         video = VideoFileClip(str(input_path))
         clips = [video.subclip(s['start'], s['end']) for s in filtered_segments]
 
@@ -164,43 +484,7 @@ class VideoProcessor:
         else:
             cleaned = ColorClip((640, 480), color=(0,0,0), duration=0)
 
-        output_path = Path(settings.PROCESSED_DIR) / file_id / f"processed_{input_path.stem}.mp4"
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with cleaned as cleaned_clip:
-            cleaned_clip.write_videofile(
-                str(output_path),
-                codec='libx264',
-                audio_codec='aac',
-                threads=4,
-                write_logfile=True,
-                ffmpeg_params=[
-                    '-movflags', '+faststart',        # REQUIRED for web playback
-                    '-pix_fmt', 'yuv420p',           # REQUIRED for browser compatibility
-                    '-vsync', 'vfr',                 # Better for edited content
-                    '-x264-params', 'b-adapt=2',     # Keep adaptive B-frame decision
-                    '-crf', '23',                    # Quality/compression balance
-                    '-profile:v', 'main',           # Broad device compatibility
-                    '-level', '4.0',                # H.264 level for wide support
-                    '-b:a', '192k',                 # Keep your audio bitrate
-                    '-aq', '90'                     # Audio quality VBR
-                ],
-                preset='fast',
-                audio_fps=44100,
-                temp_audiofile=str(Path(output_path).with_suffix('.tmp.m4a')),
-                remove_temp=False  # Helps prevent premature file closure
-            )
-        segments_path = Path(settings.PROCESSED_DIR) / file_id / f"{input_path.stem}_segments.json"
-        # segments_path.parent.mkdir(parents=True, exist_ok=True) 
-
-        with open(segments_path, 'w') as f:
-            json.dump(filtered_segments, f, indent=2)
-
-        return {
-            'output_path': output_path,
-            'segments_path': segments_path,
-            'processing_step': 'remove_duplicates'
-        }
+        self.write_video(cleaned, temp_path or output_path, output_path, profile)
 
     @handle_processing('add_captions')
     async def add_captions(self, task_id:str, file_id: str, params: dict):
@@ -216,7 +500,7 @@ class VideoProcessor:
                 raise FileNotFoundError(f"Input video file not found: {input_path}")
             
             # Generate segments for original video
-            transcript = self.transcribe_video(str(input_path))
+            transcript = await self.transcribe_video(str(input_path))
             segments = transcript.get('segments', [])
             
             # Save segments to file
@@ -231,8 +515,7 @@ class VideoProcessor:
 
         temp_path = Path(output_path).with_suffix('.tmp.mp4')
 
-        # Load video and segments
-        video = VideoFileClip(str(input_path))
+        # Load segments
         with open(segments_path, 'r') as f:
             segments = json.load(f)
 
@@ -243,39 +526,36 @@ class VideoProcessor:
             new_starts.append(current_time)
             current_time += seg['end'] - seg['start']
         
-        # Create captions
-        overlays = self.create_captions(
-            video, 
-            segments, 
-            new_starts, 
-            params.get('font_size', self.settings.DEFAULT_FONT_SIZE)
-        )
-        
-        final = CompositeVideoClip([video] + overlays)
-        with final as final_clip:
-            final_clip.write_videofile(
-                str(temp_path),
-                codec='libx264',
-                audio_codec='aac',
-                threads=4,
-                write_logfile=True,
-                ffmpeg_params=[
-                    '-movflags', '+faststart',        # REQUIRED for web playback
-                    '-pix_fmt', 'yuv420p',           # REQUIRED for browser compatibility
-                    '-vsync', 'vfr',                 # Better for edited content
-                    '-x264-params', 'b-adapt=2',     # Keep adaptive B-frame decision
-                    '-crf', '23',                    # Quality/compression balance
-                    '-profile:v', 'main',           # Broad device compatibility
-                    '-level', '4.0',                # H.264 level for wide support
-                    '-b:a', '192k',                 # Keep your audio bitrate
-                    '-aq', '90'                     # Audio quality VBR
-                ],
-                preset='fast',
-                audio_fps=44100,
-                temp_audiofile=str(Path(output_path).with_suffix('.tmp.m4a')),
-                remove_temp=False  # Helps prevent premature file closure
+        profile = self.encoder_profile(params)
+        font_size = params.get('font_size', self.settings.DEFAULT_FONT_SIZE)
+        if self.caption_backend(params) == 'ass':
+            await progress.run_blocking(
+                self.burn_captions,
+                input_path,
+                segments,
+                new_starts,
+                font_size,
+                temp_path,
+                profile
             )
             os.replace(str(temp_path), str(output_path))
+            return {
+                'output_path': str(output_path),
+                'segments_path': str(segments_path),
+                'processing_step': 'add_captions'
+            }
+
+        await progress.run_blocking(
+            self.composite_captions,
+            input_path,
+            segments,
+            new_starts,
+            font_size,
+            temp_path,
+            output_path,
+            profile
+        )
+        os.replace(str(temp_path), str(output_path))
 
         return {
             'output_path': str(output_path),
@@ -283,30 +563,60 @@ class VideoProcessor:
             'processing_step': 'add_captions'
         }
     
+    def composite_captions(self, input_path, segments, new_starts, font_size, temp_path, output_path, profile):
+        """Overlay TextClip captions on the video and encode it with MoviePy"""
+        video = VideoFileClip(str(input_path))
+        overlays = self.create_captions(video, segments, new_starts, font_size)
+        self.write_video(OverlayCompositor(video, overlays), temp_path, output_path, profile)
+
+    @metrics.span("encode")
+    def burn_captions(self, input_path, segments, new_starts, font_size, output_path, profile):
+        """Write an ASS/SRT track for the segments and burn it in with libass"""
+        probe = probe_video(input_path)
+        size = (probe.get('width', 1280), probe.get('height', 720))
+        # Tracks are private to this render; concurrent caption jobs on the file write their own
+        with tempfile.TemporaryDirectory(dir=Path(output_path).parent, prefix=".captions-") as workdir:
+            ass_path, _ = self.write_caption_tracks(
+                Path(workdir) / "captions", segments, new_starts, size, font_size
+            )
+            on_progress = progress.ffmpeg_callback("encode", probe_duration(input_path))
+            with encoding.encode_slot():
+                subtitles.burn_subtitles(input_path, ass_path, output_path, profile, on_progress)
+
+    def caption_backend(self, params: dict) -> str:
+        """'ass' when asked for and ffmpeg has libass, otherwise the TextClip compositor"""
+        backend = params.get('caption_backend') or self.settings.DEFAULT_CAPTION_BACKEND
+        if backend == 'ass' and not subtitles.has_libass():
+            return 'textclip'
+        return backend
+
+    @metrics.span("caption_layout")
+    def write_caption_tracks(self, base_path, segments, new_starts, size, font_size):
+        base_path = Path(base_path)
+        ass_path = subtitles.write_ass(base_path.with_suffix('.ass'), segments, new_starts, size, font_size)
+        srt_path = subtitles.write_srt(base_path.with_suffix('.srt'), segments, new_starts)
+        return ass_path, srt_path
+
     @handle_processing('add_music')
     async def add_music(self, task_id: str, file_id: str, params: dict):
-        print(f"=== ADD MUSIC FUNCTION STARTED ===")
-        print(f"Task ID: {task_id}")
-        print(f"File ID: {file_id}")
-        print(f"Params: {params}")
+        logger.info(f"add_music started: task {task_id}, file {file_id}")
+        logger.debug(f"add_music params: {params}")
         
         # Get input path - use processed file if available, otherwise use original uploaded file
         cached = self.file_versions.get(file_id, {})
         input_path = cached.get('output_path')
         
-        print(f"Cached file versions: {cached}")
-        print(f"Input path from cache: {input_path}")
+        logger.debug(f"Cached file version: {cached}")
         
         if not input_path:
             # No processed file yet, use original uploaded file
             filename = params.get('filename')
-            print(f"Filename from params: {filename}")
             
             if not filename:
                 raise ValueError("Filename parameter is required but not provided")
                 
             input_path = Path(self.settings.UPLOAD_DIR) / file_id / filename
-            print(f"Constructed input path: {input_path}")
+            logger.debug(f"No processed version, using upload {input_path}")
             
             if not input_path.exists():
                 raise FileNotFoundError(f"Input video file not found: {input_path}")
@@ -316,92 +626,106 @@ class VideoProcessor:
         output_path = Path(self.settings.PROCESSED_DIR) / file_id / f"processed_{filename}"
         output_path.parent.mkdir(parents=True, exist_ok=True)
         
-        print(f"Output path: {output_path}")
+        logger.debug(f"Output path: {output_path}")
 
         temp_path = Path(output_path).with_suffix('.tmp.mp4')
 
         # Get music file path (separate from versioned video files)
+        music_path = self.resolve_music_path(params)
+        
+        profile = self.encoder_profile(params)
+        music_mode = params.get('music_mode') or self.settings.DEFAULT_MUSIC_MODE
+        if music_mode == 'remux' and not profile['max_height']:
+            remuxed = await progress.run_blocking(
+                self.remux_music,
+                input_path,
+                music_path,
+                temp_path,
+                params.get("music_volume", 0.3),
+                profile
+            )
+            if remuxed:
+                os.replace(str(temp_path), str(output_path))
+                logger.info(f"add_music completed (remux): {output_path}")
+                return {
+                    'output_path': str(output_path),
+                    'processing_step': 'add_music'
+                }
+
+        await progress.run_blocking(
+            self.reencode_music,
+            input_path,
+            music_path,
+            params.get("music_volume", 0.3),
+            temp_path,
+            output_path,
+            profile
+        )
+        os.replace(str(temp_path), str(output_path))
+
+        logger.info(f"add_music completed: {output_path}")
+
+        return {
+            'output_path': str(output_path),
+            'processing_step': 'add_music'
+        }
+
+    @metrics.span("encode")
+    def remux_music(self, input_path, music_path, output_path, music_volume, profile) -> bool:
+        """Copy the video stream and re-encode only the mixed audio; False if not applicable"""
+        try:
+            probe = probe_video(input_path)
+            if not can_copy_video(probe):
+                logger.info(f"Remux unsupported for {probe.get('codec_name')}/{probe.get('pix_fmt')}, re-encoding")
+                return False
+            on_progress = progress.ffmpeg_callback("encode", probe_duration(input_path))
+            remux.remux_music(input_path, music_path, output_path, music_volume, profile, on_progress)
+            return True
+        except (RuntimeError, ValueError, OSError) as e:
+            logger.warning(f"Remux failed, falling back to re-encode: {e}")
+            return False
+
+    def reencode_music(self, input_path, music_path, music_volume, temp_path, output_path, profile):
+        """Mix the music in with MoviePy and re-encode the whole video"""
+        video = VideoFileClip(str(input_path))
+        logger.info(f"Mixing music into {input_path} ({video.duration:.1f}s)")
+        self.write_video(self.mix_music(video, music_path, music_volume), temp_path, output_path, profile)
+
+    def resolve_music_path(self, params: dict) -> Path:
         music_file_id = params.get("music_file_id")
         music_filename = params.get("music_filename")
         
-        print(f"Music file ID: {music_file_id}")
-        print(f"Music filename: {music_filename}")
-        
         if not music_file_id or not music_filename:
             raise ValueError("Music file ID and filename are required")
             
         music_path = Path(self.settings.MUSIC_UPLOAD_DIR) / music_file_id / music_filename
         
-        print(f"Music path: {music_path}")
+        logger.debug(f"Music path: {music_path}")
         
         if not music_path.exists():
             raise FileNotFoundError(f"Music file not found: {music_path}")
-        
-        # Actual unique processing logic
-        print("Loading video file...")
-        video = VideoFileClip(str(input_path))
-        print(f"Video loaded, duration: {video.duration}")
-        
-        print("Loading music file...")
+        return music_path
+
+    def mix_music(self, video, music_path, music_volume=0.3):
+        """Loop music under the video's own audio at the given volume"""
         music = AudioFileClip(str(music_path))
-        print(f"Music loaded, duration: {music.duration}")
+        logger.debug(f"Music loaded, duration: {music.duration}")
         
         # Apply audio loop
         try:
             music = music.fx(audio_loop, duration=video.duration)
-            print(f"Music after loop, duration: {music.duration}")
         except Exception as e:
-            print(f"Error applying audio loop: {e}")
-            print("Continuing without audio loop")
+            logger.warning(f"Error applying audio loop, continuing without it: {e}")
         
         # Apply volume effect with error handling
         try:
-            volume_factor = float(params.get("music_volume", 0.3))
+            volume_factor = float(music_volume)
             music = music.fx(volumex, volume_factor)
-            print("Music volume applied successfully")
         except Exception as e:
-            print(f"Error applying volume effect: {e}")
-            print("Continuing without volume adjustment")
-        
-        print("Music loaded and processed")
+            logger.warning(f"Error applying volume effect, continuing without it: {e}")
         
-        print("Creating composite audio...")
         composite_audio = CompositeAudioClip([video.audio, music.set_start(0)])
-        final = video.set_audio(composite_audio)
-        
-        print("Writing final video...")
-        with final as final_clip:
-            final_clip.write_videofile(
-                str(temp_path),
-                codec='libx264',
-                audio_codec='aac',
-                threads=4,
-                write_logfile=True,
-                ffmpeg_params=[
-                    '-movflags', '+faststart',        # REQUIRED for web playback
-                    '-pix_fmt', 'yuv420p',           # REQUIRED for browser compatibility
-                    '-vsync', 'vfr',                 # Better for edited content
-                    '-x264-params', 'b-adapt=2',     # Keep adaptive B-frame decision
-                    '-crf', '23',                    # Quality/compression balance
-                    '-profile:v', 'main',           # Broad device compatibility
-                    '-level', '4.0',                # H.264 level for wide support
-                    '-b:a', '192k',                 # Keep your audio bitrate
-                    '-aq', '90'                     # Audio quality VBR
-                ],
-                preset='fast',
-                audio_fps=44100,
-                temp_audiofile=str(Path(output_path).with_suffix('.tmp.m4a')),
-                remove_temp=False  # Helps prevent premature file closure
-            )
-            os.replace(str(temp_path), str(output_path))
-
-        print(f"=== ADD MUSIC FUNCTION COMPLETED ===")
-        print(f"Output file: {output_path}")
-
-        return {
-            'output_path': str(output_path),
-            'processing_step': 'add_music'
-        }
+        return video.set_audio(composite_audio)
 
     @handle_processing('add_broll')
     async def add_broll(self, task_id: str, file_id: str, params: dict):
@@ -419,110 +743,282 @@ class VideoProcessor:
         output_path = Path(self.settings.PROCESSED_DIR) / file_id / f"processed_{params.get('filename')}"
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
-        temp_path = Path(output_path).with_suffix('.tmp.mp4')
-
-        main_clip = VideoFileClip(str(input_path))
+        transcript = (await self.transcribe_video(str(input_path))).get('segments', [])
 
-        transcript = self.transcribe_video(str(input_path)).get('segments', [])
-
-        final_video = self.smart_broll_insertion(
-            main_clip,
+        await progress.run_blocking(
+            self.render_timeline,
+            input_path,
             transcript,
-            params['keywords']
+            [{'name': 'add_broll', 'args': params}],
+            output_path,
+            self.encoder_profile(params),
+            params.get('render_mode')
         )
 
-        with final_video as final_clip:
-            final_clip.write_videofile(
-                str(temp_path),
-                codec='libx264',
-                audio_codec='aac',
-                threads=4,
-                ffmpeg_params=[
-                    '-movflags', '+faststart',        # REQUIRED for web playback
-                    '-pix_fmt', 'yuv420p',           # REQUIRED for browser compatibility
-                    '-vsync', 'vfr',                 # Better for edited content
-                    '-x264-params', 'b-adapt=2',     # Keep adaptive B-frame decision
-                    '-crf', '23',                    # Quality/compression balance
-                    '-profile:v', 'main',           # Broad device compatibility
-                    '-level', '4.0',                # H.264 level for wide support
-                    '-b:a', '192k',                 # Keep your audio bitrate
-                    '-aq', '90'                     # Audio quality VBR
-                ],
-                preset='fast',
-                audio_fps=44100,
-                temp_audiofile=str(Path(output_path).with_suffix('.tmp.m4a')),
-                remove_temp=False  # Helps prevent premature file closure
-            )
-            os.replace(str(temp_path), str(output_path))
-
         return {
             'output_path': str(output_path),
             'processing_step': 'add_broll'
         }
     
-    def remove_adjacent_duplicates(self, segments, dup_threshold):
+    @handle_processing('ai_edit')
+    async def render_plan(self, task_id: str, file_id: str, params: dict):
+        """Compile a whole AI-edit plan into one timeline and encode it once"""
+        settings = self.settings
+        plan = params.get('plan', [])
+        unknown = [step['name'] for step in plan if step['name'] not in self.timeline_steps]
+        if unknown:
+            raise ValueError(f"Unknown tool(s) {unknown}")
+
+        input_path = self.resolve_plan_input(file_id, plan, params)
+        segments = await self.plan_segments(file_id, input_path, plan)
+
+        output_path = Path(settings.PROCESSED_DIR) / file_id / f"processed_{Path(params.get('filename')).stem}.mp4"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        segments = await progress.run_blocking(
+            self.render_timeline,
+            input_path,
+            segments,
+            plan,
+            output_path,
+            self.encoder_profile(params),
+            params.get('render_mode')
+        )
+
+        segments_path = None
+        if segments is not None:
+            segments_path = Path(settings.PROCESSED_DIR) / file_id / f"{output_path.stem}_segments.json"
+            with open(segments_path, 'w') as f:
+                json.dump(segments, f, indent=2)
+
+        return {
+            'output_path': str(output_path),
+            'segments_path': str(segments_path) if segments_path else None,
+            'processing_steps': [step['name'] for step in plan],
+            'processing_step': 'ai_edit'
+        }
+
+    def resolve_plan_input(self, file_id: str, plan: list, params: dict) -> Path:
+        """Start from what the first step would have read in the step-by-step flow"""
+        cached = self.file_versions.get(file_id, {})
+        input_path = cached.get('output_path')
+        if not input_path or (plan and plan[0]['name'] == 'remove_duplicates'):
+            input_path = Path(self.settings.UPLOAD_DIR) / file_id / params.get('filename')
+        if not Path(input_path).exists():
+            raise FileNotFoundError(f"Input video file not found: {input_path}")
+        return Path(input_path)
+
+    async def plan_segments(self, file_id: str, input_path, plan: list):
+        """One transcript of the input; cuts retime it instead of re-transcribing
+
+        A processed input comes with its segments, which the step-by-step flow
+        reads as they are, so they are used rather than transcribing it again.
+        """
+        if all(step['name'] == 'add_music' for step in plan):
+            return None
+        cached = self.file_versions.get(file_id, {})
+        segments_path = cached.get('segments_path')
+        if segments_path and str(input_path) == str(cached.get('output_path')) and Path(segments_path).exists():
+            with open(segments_path, 'r') as f:
+                return json.load(f)
+        return (await self.transcribe_video(str(input_path))).get('segments', [])
+
+    def start_preview(self, task_id: str, file_id: str, processing_step: str, params: dict):
+        """Run render_preview next to the step; returns what stop_preview needs"""
+        token = cancellation.CancelToken(task_id)
+
+        async def run():
+            # Its own token so the step can stop it, and no reporter: the step's render reports progress
+            cancellation.current_token.set(token)
+            progress.current_reporter.set(None)
+            # Proxy encodes are timed apart from the step's real ones
+            with metrics.bind(step=f"{processing_step}_preview"):
+                await self.render_preview(task_id, file_id, processing_step, params)
+
+        return asyncio.create_task(run()), token
+
+    async def stop_preview(self, preview):
+        """Cancel the preview if it is still rendering and wait for its threads to let go"""
+        task, token = preview
+        token.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    async def render_preview(self, task_id: str, file_id: str, processing_step: str, params: dict):
+        """Render a low-resolution proxy of the step(s) and publish it in the task status"""
+        plan = self.step_plan(processing_step, params)
+        preview_path = Path(self.settings.PROCESSED_DIR) / file_id / f"preview_{task_id}.mp4"
+        preview_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            input_path = self.resolve_plan_input(file_id, plan, params)
+            segments = await self.plan_segments(file_id, input_path, plan)
+            await progress.run_blocking(
+                self.render_timeline,
+                input_path,
+                segments,
+                plan,
+                preview_path,
+                encoding.get_profile('proxy'),
+                'single'
+            )
+        except cancellation.TaskCancelled:
+            raise
+        except Exception as e:
+            # The preview is best effort; the full render reports real errors
+            logger.warning(f"Preview render failed for {task_id}: {e}")
+            return
+
+        self.active_tasks.patch(
+            task_id,
+            status="processing",
+            preview={
+                "output_filename": preview_path.name,
+                "download_url": f"/api/files/download/{file_id}/{preview_path.name}",
+            }
+        )
+
+    def render_timeline(self, input_path, segments, plan, output_path, profile, render_mode=None):
+        """Apply every plan step to one clip graph, then encode it once (in parallel chunks when long)"""
+        # Caption tracks are private to this render; concurrent renders of the file write their own
+        with tempfile.TemporaryDirectory(dir=Path(output_path).parent, prefix=".captions-") as workdir:
+            track_base = Path(workdir) / "captions"
+            clip, timeline_segments, render = self.build_timeline(input_path, segments, plan, track_base, profile)
+
+            temp_path = Path(output_path).with_suffix('.tmp.mp4')
+            workers = self.render_workers(clip, render_mode)
+            if workers > 1:
+                spec = chunked_render.render_spec(
+                    self.settings, input_path, segments, plan, output_path, track_base, profile
+                )
+                with encoding.encode_slot(), metrics.span("encode"):
+                    chunked_render.render_chunked(clip, spec, temp_path, workers)
+                clip.close()
+            else:
+                self.write_video(clip, temp_path, output_path, profile, render['video_filters'])
+        os.replace(str(temp_path), str(output_path))
+        return timeline_segments
+
+    @metrics.span("compositing")
+    def build_timeline(self, input_path, segments, plan, track_base, profile, write_tracks=True, window=None):
+        """Return (clip, segments, render extras) for a plan without encoding anything
+
+        track_base: caption tracks go to this path plus .ass/.srt, in a directory of the render's own.
+        window: the (start, end) a chunk worker encodes; overlays outside it are not laid out.
+        """
+        probe = probe_video(input_path)
+        source_size = (int(probe.get('width', 0)), int(probe.get('height', 0)))
+        if profile['max_height'] and source_size[1] > profile['max_height']:
+            # Decode straight to the output height so compositing runs at that size too
+            clip = VideoFileClip(str(input_path), target_resolution=(profile['max_height'], None))
+        else:
+            clip = VideoFileClip(str(input_path))
+        if not all(source_size):
+            source_size = tuple(clip.size)
+
+        # Encode-time extras collected by the steps, e.g. subtitle burn-in filters
+        render = {
+            'track_base': Path(track_base),
+            'source_size': source_size,
+            'write_tracks': write_tracks,
+            'window': window,
+            'video_filters': []
+        }
+        for step in plan:
+            logger.debug(f"Timeline step: {step['name']} {step.get('args', {})}")
+            clip, segments = self.timeline_steps[step['name']](clip, segments, step.get('args', {}), render)
+        return clip, segments, render
+
+    def render_workers(self, clip, render_mode=None) -> int:
+        """Worker processes for a chunked render, or 1 to encode in this process"""
+        mode = render_mode or self.settings.DEFAULT_RENDER_MODE
+        workers = self.settings.RENDER_CHUNK_WORKERS or chunked_render.default_workers()
+        if mode != 'chunked' or workers < 2 or not clip.fps:
+            return 1
+        if clip.duration < self.settings.RENDER_CHUNK_MIN_SECONDS:
+            return 1
+        return workers
+
+    def timeline_remove_duplicates(self, clip, segments, args, render):
+        threshold = args.get('dedupe_threshold') or self.settings.DEFAULT_DUP_THRESH
+        kept = self.remove_duplicate_takes(segments, threshold, args.get('dedupe_scope'))
+        if not kept:
+            return ColorClip((640, 480), color=(0,0,0), duration=0), []
+        cut = concatenate_videoclips([clip.subclip(s['start'], s['end']) for s in kept], method="compose")
+        return cut, self.retime_segments(kept)
+
+    def timeline_captions(self, clip, segments, args, render):
+        font_size = args.get('font_size', self.settings.DEFAULT_FONT_SIZE)
+        new_starts = [s['start'] for s in segments]
+        if self.caption_backend(args) == 'ass':
+            # libass scales the source-sized script to whatever frame size is encoded
+            ass_path = render['track_base'].with_suffix('.ass')
+            if render['write_tracks']:
+                # Chunk workers reuse the tracks the parent already wrote
+                self.write_caption_tracks(
+                    render['track_base'], segments, new_starts, render['source_size'], font_size
+                )
+            render['video_filters'].append(subtitles.subtitles_filter(ass_path))
+            return clip, segments
+        font_size = max(1, int(round(font_size * clip.h / render['source_size'][1])))
+        shown = segments
+        if render['window']:
+            # A chunk only needs the captions on screen during its own frames
+            start, end = render['window']
+            shown = [s for s in segments if s['end'] > start and s['start'] < end]
+        overlays = self.create_captions(clip, shown, [s['start'] for s in shown], font_size)
+        return OverlayCompositor(clip, overlays), segments
+
+    def timeline_music(self, clip, segments, args, render):
+        music_path = self.resolve_music_path(args)
+        return self.mix_music(clip, music_path, args.get("music_volume", 0.3)), segments
+
+    def timeline_broll(self, clip, segments, args, render):
+        return self.smart_broll_insertion(clip, segments, args['keywords']), segments
+
+    def retime_segments(self, segments):
+        """Place kept segments back to back, shifting their word timings along"""
+        retimed = []
+        current = 0.0
+        for seg in segments:
+            shift = current - seg['start']
+            new_seg = {**seg, 'start': current, 'end': seg['end'] + shift}
+            if 'words' in seg:
+                new_seg['words'] = [
+                    {**w, 'start': w['start'] + shift, 'end': w['end'] + shift}
+                    for w in seg['words']
+                ]
+            retimed.append(new_seg)
+            current = new_seg['end']
+        return retimed
+
+    def encoder_profile(self, params: dict) -> dict:
+        return encoding.get_profile(params.get('encoder_profile') or self.settings.DEFAULT_ENCODER_PROFILE)
+
+    @metrics.span("encode")
+    def write_video(self, clip, path, output_path, profile, video_filters=None):
+        with encoding.encode_slot(), clip as final_clip:
+            final_clip.write_videofile(
+                str(path),
+                logger=progress.moviepy_logger(),
+                **encoding.moviepy_write_kwargs(profile, output_path, video_filters)
+            )
+
+    @metrics.span("dedupe")
+    def remove_duplicate_takes(self, segments, dup_threshold, scope=None):
         """Keep last segment in duplicate groups for natural flow"""
-        kept = []
-        i = 0
-        n = len(segments)
-        
-        while i < n:
-            group = [segments[i]]
-            j = i + 1
-            
-            # Expand group while duplicates are found
-            while j < n and self.is_duplicate(group[-1]['text'], segments[j]['text'], dup_threshold):
-                group.append(segments[j])
-                j += 1
-                
-            # Keep only the LAST segment in the group
-            kept.append(group[-1])
-            
-            print(f"Grouped {len(group)} segments:")
-            for seg in group:
-                print(f"  - {seg['text']} (confidence: {seg.get('avg_logprob', '?')})")
-            print(f"Kept: {group[-1]}\n{'-'*40}")
-            
-            i = j  # Move to next unprocessed segment
-        
-        return kept
+        return dedupe.keep_last_takes(segments, dup_threshold, scope or self.settings.DEDUPE_SCOPE)
 
     def normalize(self, text: str) -> str:
-        text = re.sub(r'[^a-zA-Z0-9]', ' ', text)
-        return re.sub(r'\s+', ' ', text).strip().lower()
-    
+        return normalize_text(text)
+
     def is_duplicate(self, a: str, b: str, threshold: float) -> bool:
         """Check for either:
         1. High similarity ratio, OR
         2. One phrase starts with the other (with minimum overlap)
         """
-        print('CHECK dedupe threshold', threshold)
-        norm_a, norm_b = self.normalize(a), self.normalize(b)
-        
-        # Calculate base similarity
-        base_ratio = SequenceMatcher(None, norm_a, norm_b).ratio()
-        if base_ratio >= threshold:
-            return True
-        
-        # Check for prefix/suffix overlap
-        min_len = min(len(norm_a), len(norm_b))
-        overlap_threshold = 0.8  # 80% of shorter phrase must match
-        
-        # Find maximum matching prefix
-        prefix_length = 0
-        for a_char, b_char in zip(norm_a, norm_b):
-            if a_char == b_char:
-                prefix_length += 1
-            else:
-                break
-        
-        # Check if prefix match meets overlap criteria
-        if prefix_length / min_len >= overlap_threshold:
-            return True
-        
-        return False
-    
+        return dedupe.is_near_duplicate(self.normalize(a), self.normalize(b), threshold)
 
+
+    @metrics.span("caption_layout")
     def create_captions(self, video, segments, new_starts, font_size=28):
         """Generate Instagram-style captions with fixed dimension handling"""
         overlays = []
@@ -597,50 +1093,19 @@ class VideoProcessor:
         
         return video_clip.set_audio(composite_audio)
 
-    def fetch_broll_from_local(self, keyword, main_clip, duration=5, broll_dir="brolls"):
-        """Maintain B-roll aspect ratio with smart padding"""
-        # try:
-        safe_keyword = secure_filename(keyword)
-        broll_files = [f for f in os.listdir(broll_dir)
-                        if safe_keyword in f.lower() and f.endswith(".mp4")]
-        if not broll_files:
-            return None
-
-        raw = VideoFileClip(os.path.join(broll_dir, broll_files[0]), audio=False)
-        clip = raw.subclip(0, min(duration, raw.duration))
-
-        main_w, main_h = main_clip.size
-        broll_w, broll_h = clip.size
-
-        print(f"\nkeyword {keyword} | DEBUG: Main={main_w}x{main_h} | B-roll={broll_w}x{broll_h}")
-
-        width_ratio  = main_w  / broll_w
-        height_ratio = main_h / broll_h
-
-        # 2) Decide which axis “fills” first, and compute integer dims
-        if width_ratio < height_ratio:
-            # B‑roll is relatively taller → fit to full width
-            new_w = main_w
-            new_h = int(broll_h * width_ratio)
-        else:
-            # B‑roll is relatively wider → fit to full height
-            new_w = int(broll_w * height_ratio)
-            new_h = main_h
-
-        print(f"Scaled to {new_w}x{new_h}")
-
-        fitted = clip.resize((new_w, new_h))
+    def fetch_broll_from_local(self, keyword, main_clip, duration=5, broll_dir=None):
+        """Letterboxed B-roll for a keyword, pre-scaled to the main clip's frame size"""
+        library = self.broll_library
+        if broll_dir and Path(broll_dir) != library.broll_dir:
+            library = BrollLibrary(broll_dir, self.settings.BROLL_CACHE_DIR)
 
-        # 3. Create centered composite with padding
-        background = ColorClip((main_w, main_h), color=(0,0,0), duration=duration)
-        output = CompositeVideoClip([
-                        background,
-                        fitted.set_position("center")
-                    ]).set_duration(duration)
-        if output.duration != main_clip.duration:
-            output = output.set_duration(main_clip.duration)
+        clip = library.find(keyword)
+        if clip is None:
+            return None
 
-        return output
+        rendition = library.rendition(clip, main_clip.size, duration)
+        logger.debug(f"keyword {keyword} | B-roll {Path(clip.path).name} {clip.width}x{clip.height} -> {rendition.name}")
+        return VideoFileClip(str(rendition), audio=False).set_duration(duration)
 
 
     def smart_broll_insertion(self, main_clip, segments, keywords):
@@ -661,56 +1126,48 @@ class VideoProcessor:
                             .set_duration(broll_duration))
                 broll_overlays.append(broll)
 
-        return CompositeVideoClip([main_clip] + broll_overlays).set_audio(main_clip.audio)
+        return OverlayCompositor(main_clip, broll_overlays)
 
 
     def find_split_points(self, segments, keywords):
         """Find exact split points based on keyword positions in text"""
+        matcher = KeywordMatcher(keywords)
         split_points = []
-        
+
         for seg in segments:
-            text = seg['text'].strip().lower()
-            original_text = seg['text'].strip()
-            
-            # Check if any keyword exists in this segment
-            found_keywords = [kw for kw in keywords if kw.lower() in text]
-            if not found_keywords:
-                continue
-            
-            # Find exact positions for each keyword
-            for keyword in found_keywords:
-                kw_lower = keyword.lower()
-                kw_idx = text.find(kw_lower)
-                
-                if kw_idx == -1:
+            # Normalized word stream, with the word each character came from
+            words = seg.get('words') or [{'word': seg['text'], 'start': seg['start']}]
+            text, owners = '', []
+            for i, word in enumerate(words):
+                token = normalize_text(word['word'])
+                if not token:
                     continue
-                
-                # Calculate timing using word-level data if available
+                if text:
+                    text += ' '
+                    owners.append(i)
+                text += token
+                owners.extend([i] * len(token))
+
+            seen = set()
+            for start, _, idx in matcher.finditer(text):
+                # First hit per keyword per segment, as before
+                if idx in seen:
+                    continue
+                seen.add(idx)
                 if 'words' in seg:
-                    # Find first matching word with exact case
-                    for word in seg['words']:
-                        if keyword in word['word']:
-                            split_time = word['start']
-                            split_points.append({
-                                'segment_start': seg['start'],
-                                'split_time': split_time,
-                                'segment_end': seg['end'],
-                                'keyword': keyword
-                            })
-                            break
+                    split_time = words[owners[start]]['start']
                 else:
                     # Fallback: Calculate position ratio in text
-                    position_ratio = kw_idx / len(original_text)
-                    split_time = seg['start'] + (seg['end'] - seg['start']) * position_ratio
-                    split_points.append({
-                        'segment_start': seg['start'],
-                        'split_time': split_time,
-                        'segment_end': seg['end'],
-                        'keyword': keyword
-                    })
-        
+                    split_time = seg['start'] + (seg['end'] - seg['start']) * start / len(text)
+                split_points.append({
+                    'segment_start': seg['start'],
+                    'split_time': split_time,
+                    'segment_end': seg['end'],
+                    'keyword': matcher.keywords[idx]
+                })
+
         return sorted(split_points, key=lambda x: x['split_time'])
-    
+
 
     async def execute_mcp_command(self, task_id: str, command: dict):
         tool_class = self.mcp_registry.tools.get(command["name"])
@@ -725,8 +1182,5 @@ class VideoProcessor:
             command.get("params", {})
         )
         
-        self.active_tasks[task_id] = {
-            **self.active_tasks.get(task_id, {}),
-            **result
-        }
+        self.active_tasks.patch(task_id, **result)
     
\ No newline at end of file
@@ -0,0 +1,177 @@
+import subprocess
+
+import numpy as np
+
+from app.services import cancellation
+from app.services.ffmpeg_tools import ffmpeg_binary
+
+# Frames are decoded straight to HASH_INPUT x HASH_INPUT grey; the hash keeps the 8x8 lowest DCT terms
+HASH_INPUT = 32
+HASH_SIDE = 8
+BATCH_FRAMES = 256
+
+# Near-uniform frames (black, fades, blank slides) would match everything
+MIN_FRAME_STD = 4.0
+
+# A repeated run must change this much somewhere (bits from its first frame); footage
+# that never leaves one hash neighbourhood is a held shot, not a retake
+MIN_RUN_CHANGE_BITS = 12
+
+# Hashes split into 4 x 16-bit bands; two hashes within 3 bits share at least one band
+BAND_BITS = 16
+MAX_BAND_CANDIDATES = 256
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(HASH_INPUT)[:HASH_SIDE]
+_BIT_WEIGHTS = (np.uint64(1) << np.arange(HASH_SIDE * HASH_SIDE, dtype=np.uint64))
+
+
+def phash_batch(frames: np.ndarray):
+    """64-bit DCT perceptual hashes for (n, 32, 32) grey frames, plus a usable-frame mask"""
+    frames = frames.astype(np.float32)
+    low = _DCT @ frames @ _DCT.T  # (n, 8, 8)
+    flat = low.reshape(len(frames), -1)
+    # Median of the AC terms; the DC term only carries overall brightness
+    median = np.median(flat[:, 1:], axis=1, keepdims=True)
+    bits = (flat > median).astype(np.uint64)
+    hashes = (bits * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+    usable = frames.reshape(len(frames), -1).std(axis=1) >= MIN_FRAME_STD
+    return hashes, usable
+
+
+def frame_hashes(path, sample_fps: float = 2.0):
+    """Hash frames sampled at sample_fps in one streaming decode; O(1) frame memory
+
+    Returns (hashes, usable) arrays with one entry per sample at t = i / sample_fps.
+    """
+    frame_bytes = HASH_INPUT * HASH_INPUT
+    proc = subprocess.Popen([
+        ffmpeg_binary(), "-nostdin", "-v", "error",
+        "-i", str(path), "-an", "-sn",
+        "-vf", f"fps={sample_fps},scale={HASH_INPUT}:{HASH_INPUT}:flags=area,format=gray",
+        "-f", "rawvideo", "-pix_fmt", "gray", "-"
+    ], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    hashes, usable = [], []
+    with cancellation.track(proc):
+        try:
+            while True:
+                data = proc.stdout.read(frame_bytes * BATCH_FRAMES)
+                n = len(data) // frame_bytes
+                if n:
+                    frames = np.frombuffer(data[:n * frame_bytes], dtype=np.uint8).reshape(n, HASH_INPUT, HASH_INPUT)
+                    batch_hashes, batch_usable = phash_batch(frames)
+                    hashes.append(batch_hashes)
+                    usable.append(batch_usable)
+                if len(data) < frame_bytes * BATCH_FRAMES:
+                    break
+        finally:
+            proc.stdout.close()
+            returncode = proc.wait()
+    # A terminated decoder ends the stream early; don't hash a truncated video as complete
+    cancellation.check()
+    if returncode != 0 and not hashes:
+        raise RuntimeError(f"ffmpeg could not decode frames from {path}")
+
+    if not hashes:
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=bool)
+    return np.concatenate(hashes), np.concatenate(usable)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(int(a) ^ int(b)).count("1")
+
+
+def pins_offset(h: int, hashes, j: int, max_distance: int) -> bool:
+    """Whether h matching hashes[j] singles out that sample
+
+    Over static footage (a talking head, a held slide) h also matches j's
+    neighbours; such a match fits every nearby offset and proves no repeat.
+    """
+    for k in (j - 1, j + 1):
+        if 0 <= k < len(hashes) and hamming(h, hashes[k]) <= max_distance:
+            return False
+    return True
+
+
+def moves(hashes, first: int, last: int) -> bool:
+    """Whether the footage between two samples changes rather than holding one shot"""
+    return any(hamming(hashes[first], h) > MIN_RUN_CHANGE_BITS for h in hashes[first + 1:last + 1])
+
+
+def repeated_ranges(hashes, usable, sample_fps: float = 2.0, min_seconds: float = 2.0,
+                    max_distance: int = 3, max_gap: int = 1):
+    """Time ranges whose footage appears again later, i.e. the earlier takes to cut
+
+    A repeat is a run of samples i.. that match samples j.. at a constant offset,
+    at least min_seconds long and not overlapping its own later copy. Matches
+    over locally static footage and runs that never change are ignored, so
+    self-similar single takes are never cut.
+    """
+    min_samples = max(1, int(round(min_seconds * sample_fps)))
+    bands = [{} for _ in range(64 // BAND_BITS)]
+    mask = (1 << BAND_BITS) - 1
+
+    # offset -> later-sample indices whose footage already appeared `offset` samples earlier
+    diagonals = {}
+    for i, (h, ok) in enumerate(zip(hashes, usable)):
+        if not ok:
+            continue
+        h = int(h)
+        keys = [(h >> (b * BAND_BITS)) & mask for b in range(len(bands))]
+        matched = set()
+        for band, key in zip(bands, keys):
+            for j in band.get(key, ())[-MAX_BAND_CANDIDATES:]:
+                offset = i - j
+                if offset < min_samples or offset in matched or hamming(h, hashes[j]) > max_distance:
+                    continue
+                matched.add(offset)
+                if pins_offset(h, hashes, j, max_distance):
+                    diagonals.setdefault(offset, []).append(i)
+            band.setdefault(key, []).append(i)
+
+    earlier = []
+    for offset, later in diagonals.items():
+        run_start = prev = later[0]
+        for i in later[1:] + [None]:
+            if i is not None and i - prev <= max_gap + 1:
+                prev = i
+                continue
+            if prev - run_start + 1 >= min_samples and prev - run_start < offset and moves(hashes, run_start, prev):
+                earlier.append(((run_start - offset) / sample_fps, (prev - offset + 1) / sample_fps))
+            if i is not None:
+                run_start = prev = i
+
+    return merge_time_ranges(earlier)
+
+
+def merge_time_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [tuple(r) for r in merged]
+
+
+def subtract_ranges(start: float, end: float, cuts):
+    """Pieces of [start, end) left after removing the cut ranges"""
+    pieces = []
+    for cut_start, cut_end in cuts:
+        if cut_end <= start or cut_start >= end:
+            continue
+        if cut_start > start:
+            pieces.append((start, cut_start))
+        start = max(start, cut_end)
+    if end > start:
+        pieces.append((start, end))
+    return pieces
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import uuid
+
+from app.config import configure_logging
+from app.dependencies import (get_graph, get_janitor, get_job_queue,
+                              get_settings, get_video_processor, init_graph,
+                              init_transcription, shutdown_transcription)
+from app.graph import execute_workflow
+from app.services import cancellation, chunked_render, encoding, metrics
+from app.services.job_queue import cpu_admits
+
+logger = logging.getLogger(__name__)
+
+# Queue job type -> VideoProcessor coroutine taking (task_id, file_id, params)
+STEP_HANDLERS = {
+    "remove_duplicates": "process_remove_duplicates",
+    "add_captions": "add_captions",
+    "add_music": "add_music",
+    "add_broll": "add_broll",
+}
+
+
+async def keep_lease(queue, job_id: str):
+    while True:
+        await asyncio.sleep(queue.lease_seconds / 3)
+        queue.renew(job_id)
+
+
+async def run_job(job: dict, processor, queue, token: cancellation.CancelToken):
+    task_id = job["job_id"]
+    logger.info(f"Worker {os.getpid()} running {job['job_type']} job {task_id}")
+    # Set inside this asyncio task, so it reaches the job's code and (via run_blocking) its threads
+    cancellation.current_token.set(token)
+    processor.active_tasks.patch(task_id, stage="running")
+    lease = asyncio.create_task(keep_lease(queue, task_id))
+
+    def cancelled():
+        logger.info(f"Job {task_id} cancelled")
+        processor.active_tasks.patch(task_id, status="cancelled", stage="cancelled")
+        queue.finish(task_id, cancelled=True)
+        metrics.count("jobs_total", job_type=job["job_type"], outcome="cancelled")
+
+    try:
+        if job["job_type"] == "ai_edit":
+            # Planning spans happen outside any step, so tag them with the job here
+            with metrics.bind(task_id=task_id, step="ai_edit"):
+                await execute_workflow(get_graph(), job["payload"]["state"], processor)
+        else:
+            handler = getattr(processor, STEP_HANDLERS[job["job_type"]])
+            await handler(task_id, job["file_id"], job["payload"]["params"])
+        queue.finish(task_id)
+        metrics.count("jobs_total", job_type=job["job_type"], outcome="completed")
+    except asyncio.CancelledError:
+        if not token.cancelled:
+            # Worker shutdown; the expired lease hands the job to another worker
+            raise
+        cancelled()
+    except Exception as e:
+        if token.cancelled:
+            cancelled()
+        else:
+            logger.error(f"Job {task_id} failed: {e}")
+            processor.active_tasks.patch(task_id, status="failed", error=str(e))
+            queue.finish(task_id, error=str(e))
+            metrics.count("jobs_total", job_type=job["job_type"], outcome="failed")
+    finally:
+        lease.cancel()
+    # Terminal now: temp audio, logs and the preview of this render are no longer needed
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, get_janitor().release, job["file_id"])
+    except Exception as e:
+        logger.warning(f"Cleanup after job {task_id} failed: {e}")
+
+
+async def serve(worker_id: str):
+    """Claim and run jobs until cancelled, within this worker's slot and CPU budget"""
+    settings = get_settings()
+    processor = get_video_processor()
+    queue = get_job_queue()
+    loop = asyncio.get_running_loop()
+    running = {}  # job_id -> (asyncio task, cancel token)
+
+    while True:
+        running = {job_id: job for job_id, job in running.items() if not job[0].done()}
+        for job_id in queue.cancel_requested(running):
+            # Kill its subprocesses, then drop the task so the slot frees now, not after the next frame
+            task, token = running.pop(job_id)
+            token.cancel()
+            task.cancel()
+        queue.report_worker(worker_id, {
+            "running": len(running),
+            "transcription": processor.transcription.status(),
+        })
+
+        # Always admit one job per worker; more only while the cores have headroom
+        if len(running) < settings.WORKER_CONCURRENCY and (not running or cpu_admits(settings.JOB_MAX_LOAD)):
+            job = await loop.run_in_executor(None, queue.claim, worker_id)
+            if job:
+                # Every live worker (API --workers, `python -m app.worker`) shares the host's cores
+                live = await loop.run_in_executor(None, queue.workers)
+                encoding.set_host_slots(settings.WORKER_CONCURRENCY * max(1, len(live)))
+                token = cancellation.CancelToken(job["job_id"])
+                running[job["job_id"]] = (asyncio.create_task(run_job(job, processor, queue, token)), token)
+                continue
+        await asyncio.sleep(settings.WORKER_POLL_SECONDS)
+
+
+def run(worker_id: str = None):
+    """Render worker entry point: `python -m app.worker`, or spawned by the API"""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    # Unwind on terminate so transcription and chunk pools shut down; leases cover a hard kill
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    configure_logging(get_settings())
+    init_transcription()
+    init_graph()
+    try:
+        asyncio.run(serve(worker_id))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_transcription()
+        chunked_render.shutdown()
+
+
+def start_workers(count: int) -> list:
+    """Spawn render worker processes alongside the API"""
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        process = context.Process(target=run, name=f"render-worker-{i}", daemon=False)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def stop_workers(processes: list, timeout: float = 10.0):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join(timeout)
+        if process.is_alive():
+            process.kill()
+
+
+if __name__ == "__main__":
+    run()
@@ -3,6 +3,7 @@ const API_BASE = "/api";
 let musicData = null;
 let editHistory = [];
 let originalFile = null;
+let previewUrl = null;
 
 // Wait for DOM to be loaded
 document.addEventListener('DOMContentLoaded', function() {
@@ -357,12 +358,7 @@ async function runRemoveDuplicates() {
         const data = await response.json();
         if (data.error) throw new Error(data.error);
 
-        let task;
-        do {
-            await new Promise(r => setTimeout(r, 1000));
-            const res = await fetch(`${API_BASE}/process/${data.task_id}/status`);
-            task = await res.json();
-        } while (task.status === "processing");
+        const task = await waitForTask(data.task_id);
 
         if (task.status === "failed") {
             throw new Error(task.error);
@@ -429,13 +425,8 @@ async function addCaptions() {
         
         if (data.error) throw new Error(data.error);
 
-        let task;
-        do {
-            await new Promise(r => setTimeout(r, 1000));
-            const res = await fetch(`${API_BASE}/process/${data.task_id}/status`);
-            task = await res.json();
-            console.log('Caption processing status:', task.status);
-        } while (task.status === "processing");
+        const task = await waitForTask(data.task_id);
+        console.log('Caption processing status:', task.status);
 
         if (task.status === "failed") {
             throw new Error(task.error);
@@ -573,20 +564,9 @@ async function addMusic() {
             throw new Error(data.error);
         }
         
-        console.log('Starting status polling...');
-        let task;
-        let pollCount = 0;
-        do {
-            await new Promise(r => setTimeout(r, 1000));
-            pollCount++;
-            console.log(`Polling attempt ${pollCount}...`);
-            
-            const res = await fetch(`${API_BASE}/process/${data.task_id}/status`);
-            console.log('Status response status:', res.status);
-            
-            task = await res.json();
-            console.log('Music processing status:', task.status);
-        } while (task.status === "processing" && pollCount < 60); // Max 60 seconds
+        console.log('Waiting for task events...');
+        const task = await waitForTask(data.task_id);
+        console.log('Music processing status:', task.status);
 
         if (task.status === "failed") {
             console.error('Task failed:', task.error);
@@ -690,13 +670,8 @@ async function addBroll() {
         
         if (data.error) throw new Error(data.error);
         
-        let task;
-        do {
-            await new Promise(r => setTimeout(r, 1000));
-            const res = await fetch(`${API_BASE}/process/${data.task_id}/status`);
-            task = await res.json();
-            console.log('B-roll processing status:', task.status);
-        } while (task.status === "processing");
+        const task = await waitForTask(data.task_id);
+        console.log('B-roll processing status:', task.status);
 
         if (task.status === "failed") {
             throw new Error(task.error);
@@ -790,6 +765,73 @@ function updateVideoPlayer(processedUrl) {
     }
 }
 
+// Follow a task over server-sent events until it completes or fails
+function waitForTask(taskId) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`${API_BASE}/process/${taskId}/events`);
+        let last = null;
+        source.onmessage = (event) => {
+            last = JSON.parse(event.data);
+            showPreview(last);
+            showProgress(last);
+            if (last.status === "completed" || last.status === "failed") {
+                source.close();
+                resolve(last);
+            } else if (last.status === "cancelled") {
+                source.close();
+                reject(new Error('Processing was cancelled'));
+            }
+        };
+        source.onerror = () => {
+            // EventSource retries on its own; give up only once the server has closed for good
+            if (source.readyState === EventSource.CLOSED) {
+                reject(new Error(last?.error || 'Lost connection to the server'));
+            }
+        };
+    });
+}
+
+const STAGE_LABELS = {
+    queued: 'Waiting for a worker',
+    running: 'Starting',
+    transcribe: 'Transcribing',
+    render: 'Rendering',
+    encode: 'Encoding',
+    encode_audio: 'Encoding audio',
+    cancelling: 'Cancelling'
+};
+
+function showProgress(task) {
+    const overlayText = document.querySelector('#processingOverlay p');
+    if (!overlayText) return;
+    const progress = task.progress || {};
+    const stage = progress.stage || task.stage;
+    if (!stage) return;
+
+    let text = STAGE_LABELS[stage] || stage;
+    if (progress.fraction != null) {
+        text += ` ${Math.round(progress.fraction * 100)}%`;
+    }
+    if (progress.eta_seconds != null) {
+        const eta = Math.round(progress.eta_seconds);
+        text += eta >= 60 ? ` · about ${Math.ceil(eta / 60)} min left` : ` · about ${eta}s left`;
+    }
+    overlayText.textContent = text;
+}
+
+// Show the low-resolution proxy while the full-quality render finishes
+function showPreview(task) {
+    if (!task || !task.preview || task.preview.download_url === previewUrl) return;
+    previewUrl = task.preview.download_url;
+    updateVideoPlayer(previewUrl);
+
+    const processingOverlay = document.getElementById('processingOverlay');
+    if (processingOverlay) {
+        processingOverlay.classList.add('d-none');
+    }
+    showMessage('Preview ready, rendering full quality...', 'info');
+}
+
 // Update showOutputResult to handle multiple output types
 function showOutputResult(data) {
     const outputSection = document.getElementById('outputSection');
@@ -954,12 +996,7 @@ async function runAiEdit() {
         if (!res.ok) throw new Error((await res.json()).detail || res.statusText);
         const data = await res.json();
 
-    let task;
-    do {
-        await new Promise(r => setTimeout(r, 1000));
-        const res = await fetch(`${API_BASE}/process/${data.task_id}/status`);
-        task = await res.json();
-    } while (task.status !== "completed" && task.status !== "failed");
+    const task = await waitForTask(data.task_id);
 
     if (task.status === "failed") {
         // Hide processing overlay and spinner
@@ -0,0 +1,96 @@
+import os
+import subprocess
+
+import pytest
+
+from app.services import broll_library
+from app.services.broll_library import BrollLibrary, clip_tags
+from app.services.ffmpeg_tools import ffmpeg_binary, probe_duration, probe_video
+
+
+def make_clip(path, seconds=1, size="160x120"):
+    subprocess.run([
+        ffmpeg_binary(), "-v", "error", "-f", "lavfi", "-i", f"testsrc=size={size}:rate=25", "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", str(path)
+    ], check=True)
+    return path
+
+
+@pytest.fixture
+def broll_dir(tmp_path):
+    path = tmp_path / "broll"
+    path.mkdir()
+    return path
+
+
+@pytest.fixture
+def library(broll_dir, tmp_path):
+    return BrollLibrary(str(broll_dir), str(tmp_path / "renditions"))
+
+
+def touch_dir(path, seconds):
+    # Directory mtimes can be coarser than the test; move them explicitly
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_clip_tags():
+    assert clip_tags("City_Night-2.mp4") == ("city", "night", "2")
+
+
+def test_index_is_rebuilt_when_the_folder_changes(library, broll_dir, monkeypatch):
+    make_clip(broll_dir / "city_night.mp4")
+    (broll_dir / "notes.txt").write_text("not a clip")
+    probed = []
+    probe = library._probe
+    monkeypatch.setattr(library, "_probe", lambda name: probed.append(name) or probe(name))
+
+    assert library.find("city").path == str(broll_dir / "city_night.mp4")
+    assert library.find("beach") is None
+    assert probed == ["city_night.mp4"]
+    signature = library.signature()
+
+    make_clip(broll_dir / "beach.mp4")
+    touch_dir(broll_dir, 1)
+    assert library.find("beach").duration == pytest.approx(1.0, abs=0.1)
+    # Clips already indexed are not probed again
+    assert probed == ["city_night.mp4", "beach.mp4"]
+    assert library.signature() != signature
+
+    os.remove(broll_dir / "city_night.mp4")
+    touch_dir(broll_dir, 2)
+    assert library.find("city") is None
+
+
+def test_missing_folder_is_an_empty_library(tmp_path):
+    library = BrollLibrary(str(tmp_path / "nowhere"), str(tmp_path / "renditions"))
+    assert library.find("city") is None and library.signature() is None
+
+
+def test_exact_tag_beats_an_earlier_substring_match(library, broll_dir):
+    for name in ("a_cityscape.mp4", "new_york.mp4", "z_city.mp4"):
+        make_clip(broll_dir / name)
+    assert library.find("City").path == str(broll_dir / "z_city.mp4")
+    # No tag 'scape' or 'new_york', so the filename substring decides
+    assert library.find("scape").path == str(broll_dir / "a_cityscape.mp4")
+    assert library.find("new york").path == str(broll_dir / "new_york.mp4")
+    assert library.find("../") is None
+    assert library.find("forest") is None
+
+
+def test_rendition_is_letterboxed_padded_and_reused(library, broll_dir, monkeypatch):
+    make_clip(broll_dir / "wide.mp4", size="320x120")
+    clip = library.find("wide")
+
+    target = library.rendition(clip, (160, 120), 2.5)
+    assert target.parent == library.cache_dir
+    assert target.name.endswith("_160x120_2.5s.mp4")
+    probe = probe_video(target)
+    assert (probe["width"], probe["height"]) == (160, 120)
+    assert probe_duration(target) == pytest.approx(2.5, abs=0.1)
+    assert [p.name for p in library.cache_dir.iterdir()] == [target.name]
+
+    # Another size or duration is its own rendition; the same one is not encoded again
+    assert library.rendition(clip, (320, 240), 2.5).name.endswith("_320x240_2.5s.mp4")
+    monkeypatch.setattr(broll_library, "run_tool", lambda cmd: pytest.fail("re-encoded a cached rendition"))
+    assert library.rendition(clip, (160, 120), 2.5) == target
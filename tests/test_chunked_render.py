@@ -0,0 +1,35 @@
+import pickle
+
+from app.config import Settings
+from app.services import chunked_render, encoding
+
+
+def test_chunk_bounds_join_on_frame_boundaries():
+    bounds = chunked_render.chunk_bounds(95.0, 25.0, 4)
+    assert len(bounds) == 4
+    assert bounds[0][0] == 0.0 and bounds[-1][1] == 95.0
+    for (_, end), (next_start, _) in zip(bounds, bounds[1:]):
+        # Each chunk stops half a frame before the next one's first frame
+        assert abs(next_start - end - 0.5 / 25.0) < 1e-9
+
+
+def test_short_timelines_are_not_split_below_the_minimum_chunk():
+    assert len(chunked_render.chunk_bounds(15.0, 30.0, 8)) == 1
+
+
+def test_default_workers_are_capped():
+    assert 1 <= chunked_render.default_workers() <= chunked_render.MAX_AUTO_WORKERS
+
+
+def test_render_spec_is_picklable_and_leaves_audio_to_the_parent():
+    plan = [
+        {"name": "remove_duplicates", "args": {}},
+        {"name": "add_music", "args": {"music_file_id": "m"}},
+        {"name": "add_captions", "args": {"font_size": 30}},
+    ]
+    spec = chunked_render.render_spec(
+        Settings(), "in.mp4", [{"start": 0.0, "end": 1.0, "text": "hi"}], plan, "out.mp4",
+        ".captions-x/captions", encoding.get_profile("final")
+    )
+    assert [step["name"] for step in spec["plan"]] == ["remove_duplicates", "add_captions"]
+    assert pickle.loads(pickle.dumps(spec)) == spec
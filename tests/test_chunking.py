@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from app.services.chunking import SAMPLE_RATE, silence_windows, stitch_transcripts
+
+
+def noise(seconds, quiet=()):
+    """Loud noise with silent (start, end) spans, in seconds"""
+    audio = np.random.default_rng(0).uniform(-0.5, 0.5, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    for start, end in quiet:
+        audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] = 0
+    return audio
+
+
+@pytest.mark.parametrize("seconds", [
+    5,     # shorter than a chunk
+    30,    # exactly one chunk
+    44,    # a tail under half a chunk stays with the first window
+])
+def test_short_audio_is_one_window(seconds):
+    audio = noise(seconds)
+    assert silence_windows(audio, chunk_seconds=30) == [(0, len(audio))]
+
+
+def test_long_audio_is_cut_at_the_silence_nearest_each_boundary():
+    audio = noise(100, quiet=[(26.0, 26.5), (60.0, 60.5)])
+    windows = silence_windows(audio, chunk_seconds=30, search_seconds=10)
+    assert len(windows) == 3
+    assert windows[0][0] == 0 and windows[-1][1] == len(audio)
+    assert all(a[1] == b[0] for a, b in zip(windows, windows[1:]))
+    cuts = [end / SAMPLE_RATE for _, end in windows[:-1]]
+    # The second boundary is searched around the first cut + 30s, not around 60s
+    assert 26.0 <= cuts[0] < 26.5
+    assert 60.0 <= cuts[1] < 60.5
+
+
+def test_cut_falls_back_near_the_target_without_silence():
+    audio = noise(70)
+    windows = silence_windows(audio, chunk_seconds=30, search_seconds=2)
+    assert len(windows) == 2
+    assert windows[0][0] == 0 and windows[0][1] == windows[1][0] and windows[1][1] == len(audio)
+    # Still within search_seconds of the 30s target
+    assert 28 <= windows[0][1] / SAMPLE_RATE <= 32
+
+
+def test_stitch_offsets_every_timestamp_and_renumbers():
+    first = {"text": " Hello", "language": "en", "segments": [
+        {"id": 0, "seek": 0, "start": 0.0, "end": 2.5, "text": " Hello",
+         "words": [{"word": " Hello", "start": 0.5, "end": 1.0}]},
+    ]}
+    second = {"text": " again there", "language": "fr", "segments": [
+        {"id": 0, "seek": 0, "start": 0.2, "end": 1.0, "text": " again"},
+        {"id": 1, "seek": 100, "start": 1.5, "end": 2.25, "text": " there",
+         "words": [{"word": " there", "start": 1.5, "end": 2.25}]},
+    ]}
+    merged = stitch_transcripts([(0.0, first), (28.37, second)])
+
+    assert merged["text"] == " Hello again there"
+    assert merged["language"] == "en"
+    segments = merged["segments"]
+    assert [s["id"] for s in segments] == [0, 1, 2]
+    assert [s["seek"] for s in segments] == [0, 2837, 2937]
+    assert [(s["start"], s["end"]) for s in segments] == [(0.0, 2.5), (28.57, 29.37), (29.87, 30.62)]
+    assert segments[0]["words"] == [{"word": " Hello", "start": 0.5, "end": 1.0}]
+    assert segments[2]["words"] == [{"word": " there", "start": 29.87, "end": 30.62}]
+    assert "words" not in segments[1]
+    # The chunk transcripts are left as they were
+    assert second["segments"][1]["start"] == 1.5 and second["segments"][1]["words"][0]["start"] == 1.5
+
+
+def test_stitch_of_nothing_is_an_empty_transcript():
+    assert stitch_transcripts([]) == {"text": "", "segments": [], "language": None}
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from moviepy.editor import ColorClip, CompositeVideoClip
+
+from app.services.compositor import OverlayCompositor, resolve_position
+
+
+def base_clip():
+    return ColorClip((64, 48), color=(10, 20, 30), duration=10).set_fps(10)
+
+
+def overlays():
+    return [
+        ColorClip((16, 8), color=(255, 0, 0)).set_start(1).set_duration(3).set_position(("center", "bottom")),
+        ColorClip((20, 20), color=(0, 255, 0)).set_start(2).set_duration(5).set_position((-6, 40)),
+        ColorClip((30, 10), color=(0, 0, 255)).set_start(6).set_duration(2).set_position((0.5, 0.25), relative=True)
+        .set_opacity(0.5),
+    ]
+
+
+def test_resolve_position_named_and_pixel_forms():
+    assert resolve_position("center", (100, 50), (20, 10)) == (40, 20)
+    assert resolve_position(("right", "top"), (100, 50), (20, 10)) == (80, 0)
+    assert resolve_position((3.4, 7.6), (100, 50), (20, 10)) == (3, 8)
+
+
+def test_active_overlays_by_time():
+    comp = OverlayCompositor(base_clip(), overlays())
+    assert comp.active_overlays(0.5) == []
+    assert [c.size for c in comp.active_overlays(2.5)] == [(16, 8), (20, 20)]
+    assert [c.size for c in comp.active_overlays(6.5)] == [(20, 20), (30, 10)]
+    assert comp.active_overlays(9) == []
+
+
+@pytest.mark.parametrize("t", [0.5, 1.0, 2.5, 3.9, 4.0, 6.5, 7.5, 9.0])
+def test_frames_match_moviepy_composite(t):
+    base = base_clip()
+    expected = CompositeVideoClip([base, *overlays()]).get_frame(t)
+    actual = OverlayCompositor(base, overlays()).get_frame(t)
+    assert actual.shape == expected.shape
+    assert np.abs(actual.astype(int) - expected.astype(int)).max() <= 1
+
+
+def test_frame_without_overlays_is_the_base_frame():
+    base = base_clip()
+    comp = OverlayCompositor(base, overlays())
+    assert np.array_equal(comp.get_frame(0.5), base.get_frame(0.5))
+    assert comp.duration == base.duration and comp.size == base.size
@@ -0,0 +1,49 @@
+from app.services import dedupe
+
+
+def seg(text, start=0.0):
+    return {"start": start, "end": start + 1.0, "text": text}
+
+
+def texts(segments):
+    return [s["text"] for s in segments]
+
+
+def test_adjacent_restart_keeps_the_last_take():
+    segments = [seg("So today we are"), seg("So today we are going to look at pricing"), seg("Thanks")]
+    assert texts(dedupe.keep_last_takes(segments, 0.85)) == ["So today we are going to look at pricing", "Thanks"]
+
+
+def test_default_scope_only_compares_neighbours():
+    segments = [
+        seg("Welcome back to the channel everyone"),
+        seg("Let me share my screen"),
+        seg("Welcome back to the channel everyone"),
+    ]
+    assert len(dedupe.keep_last_takes(segments, 0.85)) == 3
+
+
+def test_transcript_scope_finds_distant_retakes():
+    segments = [
+        seg("Welcome back to the channel everyone"),
+        seg("Let me share my screen"),
+        seg("Hmm one second"),
+        seg("Welcome back to the channel, everyone!"),
+    ]
+    kept = dedupe.keep_last_takes(segments, 0.85, "transcript")
+    assert texts(kept) == ["Let me share my screen", "Hmm one second", "Welcome back to the channel, everyone!"]
+
+
+def test_transcript_scope_keeps_distant_sentences_that_only_share_an_opening():
+    segments = [
+        seg("I want to show you"),
+        seg("how the old report looked"),
+        seg("before we changed anything"),
+        seg("I want to show you the new dashboard we built"),
+    ]
+    assert len(dedupe.keep_last_takes(segments, 0.85, "transcript")) == 4
+
+
+def test_groups_are_ordered_by_their_last_take():
+    segments = [seg("alpha beta gamma delta"), seg("one two three four"), seg("alpha beta gamma delta")]
+    assert dedupe.duplicate_groups(segments, 0.85, "transcript") == [[1], [0, 2]]
@@ -0,0 +1,39 @@
+import pytest
+
+from app.services import encoding
+
+
+@pytest.fixture
+def eight_cores(monkeypatch):
+    monkeypatch.setattr(encoding.os, "cpu_count", lambda: 8)
+    yield
+    encoding.set_host_slots(1)
+
+
+def test_threads_are_shared_over_the_hosts_job_slots(eight_cores):
+    encoding.set_host_slots(4)
+    # The first encode on an idle host still leaves cores for the jobs claimed after it
+    with encoding.encode_slot():
+        assert encoding.encoder_threads() == 2
+
+
+def test_more_local_encodes_than_slots_split_further(eight_cores):
+    encoding.set_host_slots(2)
+    with encoding.encode_slot(), encoding.encode_slot(), encoding.encode_slot(), encoding.encode_slot():
+        assert encoding.encoder_threads() == 2
+
+
+def test_explicit_job_count_and_floor_of_one_thread(eight_cores):
+    encoding.set_host_slots(0)
+    assert encoding.encoder_threads() == 8
+    assert encoding.encoder_threads(concurrent_jobs=3) == 2
+    assert encoding.encoder_threads(concurrent_jobs=32) == 1
+
+
+def test_profiles_reach_the_ffmpeg_arguments(eight_cores):
+    encoding.set_host_slots(2)
+    args = encoding.ffmpeg_video_args(encoding.get_profile("draft"))
+    assert args[args.index("-threads") + 1] == "4"
+    assert args[args.index("-preset") + 1] == "ultrafast"
+    with pytest.raises(ValueError):
+        encoding.get_profile("nope")
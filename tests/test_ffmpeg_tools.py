@@ -0,0 +1,41 @@
+import subprocess
+
+from app.services.ffmpeg_tools import _frame_rate, _parse_stream, ffmpeg_binary, ffmpeg_info
+
+
+def test_parse_video_stream_description():
+    stream = _parse_stream(
+        "Video",
+        "h264 (Main) (avc1 / 0x31637661), yuv420p(tv, bt709, progressive), 1920x1080 [SAR 1:1 DAR 16:9], "
+        "4000 kb/s, 29.97 fps, 29.97 tbr, 30k tbn (default)"
+    )
+    assert stream == {
+        "codec_name": "h264", "profile": "Main", "pix_fmt": "yuv420p",
+        "width": 1920, "height": 1080, "r_frame_rate": "30000/1001",
+    }
+
+
+def test_parse_stream_without_profile():
+    stream = _parse_stream("Video", "mpeg4 (mp4v / 0x7634706D), yuv420p, 640x480, 25 fps, 25 tbr")
+    assert "profile" not in stream
+    assert stream["r_frame_rate"] == "25/1"
+
+
+def test_frame_rate_keeps_integer_and_ntsc_rates():
+    assert _frame_rate(30.0) == "30/1"
+    assert _frame_rate(23.98) == "24000/1001"
+    assert _frame_rate(12.5) == "25/2"
+
+
+def test_ffmpeg_info_reads_a_clip(tmp_path):
+    clip = tmp_path / "clip.mp4"
+    subprocess.run([
+        ffmpeg_binary(), "-v", "error", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=25",
+        "-f", "lavfi", "-i", "sine=sample_rate=44100", "-t", "2",
+        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac", str(clip)
+    ], check=True)
+    info = ffmpeg_info(clip)
+    assert abs(info["duration"] - 2.0) < 0.1
+    assert info["streams"]["Video"]["codec_name"] == "h264"
+    assert info["streams"]["Video"]["width"] == 160
+    assert info["streams"]["Audio"]["codec_name"] == "aac"
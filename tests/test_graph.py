@@ -0,0 +1,38 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.graph import execute_workflow
+
+
+class FakeGraph:
+    def __init__(self, processor, updates, fail_with=None):
+        self.processor = processor
+        self.updates = updates
+        self.fail_with = fail_with
+
+    async def astream(self, state):
+        for node, update in self.updates:
+            if node == "error_handler":
+                # What error_handler_node writes
+                self.processor.active_tasks[state["task_id"]] = {"status": "failed", "error": self.fail_with}
+            yield {node: update}
+
+
+def run(updates, fail_with=None):
+    processor = SimpleNamespace(active_tasks={})
+    state = {"task_id": "t1", "current_step": 0, "plan": [{"name": "add_captions"}]}
+    graph = FakeGraph(processor, [(node, {**state, **update}) for node, update in updates], fail_with)
+    asyncio.run(execute_workflow(graph, state, processor))
+    return processor.active_tasks["t1"]
+
+
+def test_completed_workflow_is_recorded():
+    task = run([("planner", {}), ("render_plan", {"current_step": 1})])
+    assert task["status"] == "completed"
+
+
+def test_failed_workflow_raises_so_the_job_fails():
+    with pytest.raises(RuntimeError, match="no plan"):
+        run([("planner", {"error": "no plan"}), ("error_handler", {"error": "no plan"})], fail_with="no plan")
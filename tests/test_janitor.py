@@ -0,0 +1,76 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.janitor import StorageJanitor
+from app.services.job_queue import JobQueue, referenced_file_ids
+from app.services.state_store import StateDatabase, TaskTable, VersionTable
+
+
+@pytest.fixture
+def env(tmp_path):
+    settings = SimpleNamespace(
+        PROCESSED_DIR=str(tmp_path / "processed"),
+        MUSIC_UPLOAD_DIR=str(tmp_path / "bg_music"),
+        STORAGE_RETENTION_HOURS={"MUSIC_UPLOAD_DIR": 1},
+        STORAGE_QUOTA_BYTES={},
+    )
+    db = StateDatabase(":memory:")
+    tasks, queue = TaskTable(db), JobQueue(db)
+    return SimpleNamespace(
+        tasks=tasks, queue=queue, janitor=StorageJanitor(settings, tasks, VersionTable(db), queue),
+        processed=tmp_path / "processed", music=tmp_path / "bg_music",
+    )
+
+
+def intermediates(file_dir):
+    (file_dir / ".chunks-abc").mkdir(parents=True)
+    (file_dir / ".chunks-abc" / "chunk_0000.mp4").write_bytes(b"x" * 10)
+    (file_dir / ".smartcut-abc").mkdir()
+    (file_dir / "processed_in.tmp.mp4").write_bytes(b"x" * 10)
+    (file_dir / "processed_in.mp4").write_bytes(b"x" * 10)
+
+
+def test_payload_file_ids_include_music_inside_plans():
+    payload = {"state": {"file_id": "f1", "music_file_id": "m1", "plan": [{"args": {"music_file_id": "m2"}}]}}
+    assert referenced_file_ids(payload) == {"f1", "m1", "m2"}
+
+
+def test_running_ai_edit_keeps_its_intermediates_whatever_the_task_status(env):
+    intermediates(env.processed / "f1")
+    env.queue.enqueue("t1", "ai_edit", {"state": {"file_id": "f1"}}, file_id="f1")
+    env.queue.claim("w1")
+    # What execute_workflow records between steps
+    env.tasks["t1"] = {"status": "step_1", "current_step": 1}
+
+    assert env.janitor.sweep() == 0
+    assert env.janitor.release("f1") == 0
+    assert (env.processed / "f1" / ".chunks-abc").exists()
+    assert (env.processed / "f1" / ".smartcut-abc").exists()
+    assert (env.processed / "f1" / "processed_in.tmp.mp4").exists()
+
+
+def test_intermediates_go_once_the_job_finishes(env):
+    intermediates(env.processed / "f1")
+    env.queue.enqueue("t1", "add_captions", {"params": {}}, file_id="f1")
+    env.queue.claim("w1")
+    env.queue.finish("t1")
+
+    assert env.janitor.release("f1") == 20
+    assert sorted(p.name for p in (env.processed / "f1").iterdir()) == ["processed_in.mp4"]
+
+
+def test_music_of_a_queued_job_outlives_retention(env):
+    for music_id in ("m1", "m2"):
+        (env.music / music_id).mkdir(parents=True)
+        (env.music / music_id / "song.mp3").write_bytes(b"x")
+        old = time.time() - 2 * 3600
+        os.utime(env.music / music_id / "song.mp3", (old, old))
+        os.utime(env.music / music_id, (old, old))
+    env.queue.enqueue("t1", "add_music", {"params": {"music_file_id": "m1"}}, file_id="f1")
+
+    env.janitor.sweep()
+    assert (env.music / "m1").exists()
+    assert not (env.music / "m2").exists()
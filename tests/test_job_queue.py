@@ -0,0 +1,102 @@
+import pytest
+
+from app.services.job_queue import JobQueue, coalesce_key
+from app.services.state_store import StateDatabase
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(StateDatabase(":memory:"), concurrency={"ai_edit": 1})
+
+
+def test_claims_by_priority_then_age(queue):
+    queue.enqueue("low", "add_captions", {"n": 1})
+    queue.enqueue("high", "add_captions", {"n": 2}, priority=5)
+    queue.enqueue("low2", "add_captions", {"n": 3})
+    assert [queue.claim("w1")["job_id"] for _ in range(3)] == ["high", "low", "low2"]
+    assert queue.claim("w1") is None
+
+
+def test_concurrency_limit_holds_back_a_job_type(queue):
+    queue.enqueue("a1", "ai_edit", {"n": 1})
+    queue.enqueue("a2", "ai_edit", {"n": 2})
+    queue.enqueue("c1", "add_captions", {"n": 3})
+    assert queue.claim("w1")["job_id"] == "a1"
+    assert queue.claim("w2")["job_id"] == "c1"
+    assert queue.claim("w3") is None
+    queue.finish("a1")
+    assert queue.claim("w3")["job_id"] == "a2"
+
+
+def test_claim_only_listed_job_types(queue):
+    queue.enqueue("a1", "ai_edit", {})
+    assert queue.claim("w1", job_types=["add_music"]) is None
+    assert queue.claim("w1", job_types=["ai_edit"])["job_id"] == "a1"
+
+
+def test_finish_records_the_outcome(queue):
+    for job_id in ("ok", "bad", "stopped"):
+        queue.enqueue(job_id, "add_music", {"job": job_id})
+        queue.claim("w1")
+    queue.finish("ok")
+    queue.finish("bad", error="boom")
+    queue.finish("stopped", cancelled=True)
+    assert [queue.get(j)["state"] for j in ("ok", "bad", "stopped")] == ["done", "failed", "cancelled"]
+    assert queue.get("bad")["error"] == "boom"
+
+
+def test_expired_lease_requeues_until_max_attempts():
+    queue = JobQueue(StateDatabase(":memory:"), lease_seconds=-1, max_attempts=2)
+    queue.enqueue("j1", "add_captions", {})
+    assert queue.claim("w1")["job_id"] == "j1"
+    # w1 never renewed: the next claim finds its lease gone and takes the job over
+    assert queue.claim("w2")["job_id"] == "j1"
+    assert queue.get("j1")["attempts"] == 2
+    assert queue.claim("w3") is None
+    assert queue.get("j1")["state"] == "failed"
+    assert queue.get("j1")["error"] == "worker lost"
+
+
+def test_cancel_queued_and_running_jobs(queue):
+    queue.enqueue("queued", "add_captions", {"n": 1})
+    queue.enqueue("running", "add_captions", {"n": 2}, priority=1)
+    queue.claim("w1")
+    assert queue.cancel("queued") == "cancelled"
+    assert queue.cancel("running") == "cancelling"
+    assert queue.cancel_requested(["queued", "running"]) == ["running"]
+    assert queue.cancel("unknown") is None
+    assert queue.claim("w2") is None
+
+
+def test_identical_requests_coalesce_into_one_job(queue):
+    payload = {"params": {"filename": "in.mp4", "font_size": 28}}
+    assert queue.enqueue("t1", "add_captions", payload, file_id="f1") == "t1"
+    same = {"params": {"font_size": 28, "filename": "in.mp4", "priority": 9, "task_id": "t2"}}
+    assert queue.enqueue("t2", "add_captions", same, file_id="f1", priority=9) == "t1"
+    assert queue.get("t1")["priority"] == 9
+    assert queue.enqueue("t3", "add_captions", payload, file_id="f2") == "t3"
+    assert queue.enqueue("t4", "add_captions", {"params": {"filename": "in.mp4"}}, file_id="f1") == "t4"
+
+
+def test_finished_or_cancelled_jobs_are_not_joined(queue):
+    queue.enqueue("t1", "add_music", {}, file_id="f1")
+    queue.claim("w1")
+    queue.cancel("t1")
+    assert queue.enqueue("t2", "add_music", {}, file_id="f1") == "t2"
+    queue.claim("w1")
+    queue.finish("t2")
+    assert queue.enqueue("t3", "add_music", {}, file_id="f1") == "t3"
+
+
+def test_coalesce_key_ignores_scheduling_fields():
+    assert coalesce_key("x", "f", {"a": 1, "priority": 1}) == coalesce_key("x", "f", {"a": 1})
+    assert coalesce_key("x", "f", {"a": 1}) != coalesce_key("y", "f", {"a": 1})
+
+
+def test_counts_and_worker_reports(queue):
+    queue.enqueue("a", "add_captions", {"n": 1})
+    queue.enqueue("b", "add_captions", {"n": 2})
+    queue.claim("w1")
+    queue.report_worker("w1", {"running": 1})
+    assert queue.counts() == {"queued": {"add_captions": 1}, "running": {"add_captions": 1}}
+    assert queue.workers()["w1"]["running"] == 1
@@ -0,0 +1,64 @@
+import pytest
+
+from app.services import metrics
+from app.services.state_store import StateDatabase
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(metrics, "_db", None)
+    db = StateDatabase(":memory:")
+    metrics.init(db)
+    return db
+
+
+def families(text):
+    """{metric name: TYPE} of an exposition"""
+    return {
+        line.split()[2]: line.split()[3]
+        for line in text.splitlines() if line.startswith("# TYPE ")
+    }
+
+
+def test_stage_histogram_is_cumulative(db):
+    with metrics.bind(task_id="t1", step="add_captions"):
+        metrics.record("encode", 0.3, input_seconds=10.0)
+        metrics.record("encode", 7.0, input_seconds=20.0)
+    lines = metrics.exposition().splitlines()
+    labels = 'stage="encode",step="add_captions"'
+    assert f'video_editor_stage_seconds_bucket{{{labels},le="0.25"}} 0' in lines
+    assert f'video_editor_stage_seconds_bucket{{{labels},le="0.5"}} 1' in lines
+    assert f'video_editor_stage_seconds_bucket{{{labels},le="10"}} 2' in lines
+    assert f'video_editor_stage_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f'video_editor_stage_seconds_count{{{labels}}} 2' in lines
+    assert f'video_editor_stage_input_seconds_total{{{labels}}} 30.0' in lines
+
+
+def test_counters_add_up_per_label_set(db):
+    metrics.count("cache_hits", step="add_music")
+    metrics.count("cache_hits", step="add_music")
+    metrics.count("cache_hits", step="add_captions")
+    text = metrics.exposition()
+    assert families(text)["video_editor_cache_hits"] == "counter"
+    assert 'video_editor_cache_hits{step="add_music"} 2.0' in text.splitlines()
+    assert 'video_editor_cache_hits{step="add_captions"} 1.0' in text.splitlines()
+
+
+def test_given_gauges_and_counters_are_typed_as_such():
+    gauges = {"queue_depth": ("Jobs waiting", [({"job_type": "add_music"}, 3)])}
+    counters = {"storage_reclaimed_bytes_total": ("Bytes deleted", [({"reason": "quota"}, 2048)])}
+    text = metrics.exposition(gauges, counters)
+    assert families(text) == {
+        "video_editor_queue_depth": "gauge",
+        "video_editor_storage_reclaimed_bytes_total": "counter",
+    }
+    assert "# HELP video_editor_storage_reclaimed_bytes_total Bytes deleted" in text
+    assert 'video_editor_storage_reclaimed_bytes_total{reason="quota"} 2048' in text.splitlines()
+    assert 'video_editor_queue_depth{job_type="add_music"} 3' in text.splitlines()
+
+
+def test_without_a_database_only_the_given_metrics_are_exposed(monkeypatch):
+    monkeypatch.setattr(metrics, "_db", None)
+    metrics.count("cache_hits")
+    assert metrics.exposition() == "\n"
+    assert families(metrics.exposition({"workers": ("Live workers", [({}, 2)])})) == {"video_editor_workers": "gauge"}
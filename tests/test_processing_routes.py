@@ -0,0 +1,72 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.routes.processing import cancel_task, enqueue_job, get_status
+from app.services.job_queue import JobQueue
+from app.services.state_store import StateDatabase, TaskTable
+
+PARAMS = {"params": {"filename": "in.mp4"}}
+
+
+@pytest.fixture
+def env():
+    db = StateDatabase(":memory:")
+    return SimpleNamespace(active_tasks=TaskTable(db)), JobQueue(db)
+
+
+def request(env):
+    processor, queue = env
+    return enqueue_job(processor, queue, "add_captions", "f1", PARAMS)
+
+
+def cancel(env, task_id):
+    processor, queue = env
+    return asyncio.run(cancel_task(task_id, processor, queue))["status"]
+
+
+def status(env, task_id):
+    return asyncio.run(get_status(task_id, env[0]))["status"]
+
+
+def test_identical_requests_share_one_job(env):
+    leader, follower = request(env), request(env)
+    assert env[0].active_tasks[follower]["alias_of"] == leader
+    assert env[1].counts()["queued"] == {"add_captions": 1}
+
+
+def test_cancelling_the_leader_keeps_the_job_for_its_aliases(env):
+    leader, follower = request(env), request(env)
+    assert cancel(env, leader) == "cancelled"
+    assert env[1].get(leader)["state"] == "queued"
+    assert status(env, leader) == "cancelled"
+    assert status(env, follower) == "processing"
+
+    # The worker still reports progress under the leader's id, and the alias sees it
+    env[0].active_tasks.patch(leader, stage="running")
+    assert env[0].active_tasks[follower]["stage"] == "running"
+    assert status(env, leader) == "cancelled"
+
+
+def test_job_is_cancelled_once_no_request_wants_it(env):
+    leader, follower = request(env), request(env)
+    cancel(env, leader)
+    assert cancel(env, follower) == "cancelled"
+    assert env[1].get(leader)["state"] == "cancelled"
+
+
+def test_cancelling_an_alias_leaves_the_leader_running(env):
+    leader, follower = request(env), request(env)
+    assert cancel(env, follower) == "cancelled"
+    assert env[1].get(leader)["state"] == "queued"
+    assert status(env, leader) == "processing"
+    assert cancel(env, leader) == "cancelled"
+    assert env[1].get(leader)["state"] == "cancelled"
+
+
+def test_running_job_is_flagged_for_its_worker(env):
+    leader = request(env)
+    env[1].claim("w1")
+    assert cancel(env, leader) == "cancelling"
+    assert env[1].cancel_requested([leader]) == [leader]
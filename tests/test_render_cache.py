@@ -0,0 +1,78 @@
+import os
+import time
+
+import pytest
+
+from app.services.render_cache import RenderCache, normalize_params
+
+PROFILE = {"crf": 20, "preset": "medium"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return RenderCache(str(tmp_path / "cache"), max_bytes=1000)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "in.mp4"
+    path.write_bytes(b"video")
+    return path
+
+
+def output(tmp_path, name, size):
+    path = tmp_path / "out" / name
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_normalize_params_drops_scheduling_keys_and_unset_values():
+    params = {"b": 1, "a": None, "priority": 3, "preview": True, "plan": [{"args": {"task_id": "t", "x": 2}}]}
+    assert normalize_params(params) == {"b": 1, "plan": [{"args": {"x": 2}}]}
+
+
+def test_key_depends_on_content_and_output_params_only(cache, source, tmp_path):
+    key = cache.key_for(source, "add_captions", {"font_size": 28}, PROFILE)
+    assert key == cache.key_for(source, "add_captions", {"font_size": 28, "priority": 9}, PROFILE)
+
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(source.read_bytes())
+    assert key == cache.key_for(copy, "add_captions", {"font_size": 28}, PROFILE)
+
+    assert key != cache.key_for(source, "add_captions", {"font_size": 30}, PROFILE)
+    assert key != cache.key_for(source, "add_captions", {"font_size": 28}, {**PROFILE, "crf": 23})
+    assert key != cache.key_for(source, "add_captions", {"font_size": 28}, PROFILE, context={"burn": "ass"})
+    music = output(tmp_path, "song.mp3", 3)
+    assert key != cache.key_for(source, "add_captions", {"font_size": 28}, PROFILE, extra_inputs=[music])
+
+
+def test_put_get_and_restore(cache, tmp_path):
+    video = output(tmp_path, "processed_in.mp4", 100)
+    segments = output(tmp_path, "segments.json", 10)
+    cache.put("k1", {"video": video, "segments": segments}, {"duration": 4.0})
+
+    entry = cache.get("k1")
+    assert entry["duration"] == 4.0 and entry["size"] == 110
+    restored = cache.restore(entry, tmp_path / "restored")
+    assert restored["video"].name == "processed_in.mp4"
+    assert restored["video"].read_bytes() == video.read_bytes()
+    assert cache.get("missing") is None
+
+
+def test_entry_with_a_missing_file_is_a_miss(cache, tmp_path):
+    cache.put("k1", {"video": output(tmp_path, "a.mp4", 10)})
+    os.remove(cache.get("k1")["paths"]["video"])
+    assert cache.get("k1") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache, tmp_path):
+    for i, key in enumerate(("used", "old", "new")):
+        cache.put(key, {"video": output(tmp_path, f"{key}.mp4", 300)})
+        past = time.time() - 100 + i
+        os.utime(cache.cache_dir / key / "entry.json", (past, past))
+    # "used" was stored first, but a hit makes it the most recently used
+    assert cache.get("used") is not None
+    cache.put("newest", {"video": output(tmp_path, "newest.mp4", 200)})
+    assert cache.get("old") is None
+    assert all(cache.get(key) is not None for key in ("used", "new", "newest"))
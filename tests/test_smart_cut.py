@@ -0,0 +1,49 @@
+from app.services import encoding
+from app.services.smart_cut import _audio_cmd, _piece_cmd, merge_ranges, plan_pieces
+
+H264_PROBE = {"codec_name": "h264", "pix_fmt": "yuv420p", "profile": "High", "level": 40, "r_frame_rate": "30/1"}
+
+
+def test_merge_ranges_joins_touching_ranges():
+    assert merge_ranges([(5, 6), (0, 1), (1.0005, 2)]) == [(0, 2), (5, 6)]
+
+
+def test_plan_pieces_copies_whole_gops_and_encodes_the_edges():
+    pieces = plan_pieces([(0.5, 3.2), (5.0, 7.5)], [0.0, 1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+    assert pieces == [
+        ("encode", 0.5, 1.0), ("copy", 1.0, 3.0), ("encode", 3.0, 3.2),
+        ("copy", 5.0, 7.0), ("encode", 7.0, 7.5),
+    ]
+
+
+def test_plan_pieces_encodes_ranges_without_two_keyframes():
+    assert plan_pieces([(1.2, 1.8)], [0.0, 2.0]) == [("encode", 1.2, 1.8)]
+
+
+def test_copy_piece_stream_copies_video_only():
+    cmd = _piece_cmd("in.mp4", "copy", 2.0, 6.0, "piece.ts", H264_PROBE, encoding.get_profile("final"), threads=2)
+    assert cmd[cmd.index("-c:v") + 1] == "copy"
+    assert "-an" in cmd and "-c:a" not in cmd
+    assert "-profile:v" not in cmd
+    assert cmd[-1] == "piece.ts"
+
+
+def test_encode_piece_matches_source_profile_and_level():
+    profile = encoding.get_profile("final")
+    cmd = _piece_cmd("in.mp4", "encode", 0.5, 2.0, "piece.ts", H264_PROBE, profile, threads=2)
+    assert cmd[cmd.index("-c:v") + 1] == "libx264"
+    assert cmd[cmd.index("-profile:v") + 1] == "high"
+    assert cmd[cmd.index("-level") + 1] == "4.0"
+    assert cmd[cmd.index("-crf") + 1] == str(profile["crf"])
+    assert cmd[cmd.index("-threads") + 1] == "2"
+    assert "-an" in cmd
+
+
+def test_audio_is_cut_once_over_every_piece():
+    pieces = [("encode", 0.5, 1.0), ("copy", 1.0, 3.0), ("copy", 5.0, 7.0)]
+    cmd = _audio_cmd("in.mp4", pieces, "audio.m4a", encoding.get_profile("final"))
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.count("atrim=") == 3
+    assert "atrim=5.000000:7.000000" in graph
+    assert "concat=n=3:v=0:a=1" in graph
+    assert cmd[cmd.index("-c:a") + 1] == "aac"
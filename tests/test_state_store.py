@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from app.services.state_store import StateDatabase, TaskTable, VersionTable
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "state" / "state.db")
+
+
+def test_task_table_behaves_like_a_dict(db_path):
+    tasks = TaskTable(StateDatabase(db_path))
+    tasks["t1"] = {"status": "processing", "file_id": "f1"}
+    assert tasks["t1"] == {"status": "processing", "file_id": "f1"}
+    assert tasks.get("missing") is None
+    assert list(tasks) == ["t1"] and len(tasks) == 1
+    del tasks["t1"]
+    with pytest.raises(KeyError):
+        tasks["t1"]
+
+
+def test_state_is_shared_between_connections(db_path):
+    # Each API or render worker process opens its own StateDatabase on the same file
+    writer, reader = TaskTable(StateDatabase(db_path)), TaskTable(StateDatabase(db_path))
+    writer["t1"] = {"status": "processing"}
+    writer.patch("t1", progress=0.5)
+    assert reader["t1"] == {"status": "processing", "progress": 0.5}
+
+
+def test_patch_merges_concurrent_writers(db_path):
+    db = StateDatabase(db_path)
+    tasks = TaskTable(db)
+    tasks["t1"] = {"status": "processing"}
+
+    def write(i):
+        TaskTable(db).patch("t1", **{f"field_{i}": i})
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tasks["t1"] == {"status": "processing", **{f"field_{i}": i for i in range(8)}}
+
+
+def test_alias_reads_its_target(db_path):
+    tasks = TaskTable(StateDatabase(db_path))
+    tasks["leader"] = {"status": "processing", "file_id": "f1"}
+    tasks.alias("follower", "leader", "f1")
+    tasks.patch("leader", status="completed", result={"path": "out.mp4"})
+    assert tasks["follower"] == {
+        "status": "completed", "file_id": "f1", "result": {"path": "out.mp4"}, "alias_of": "leader"
+    }
+
+
+def test_for_file_lists_a_files_tasks_in_update_order(db_path):
+    tasks = TaskTable(StateDatabase(db_path))
+    tasks["a"] = {"status": "completed", "file_id": "f1"}
+    tasks["b"] = {"status": "processing", "file_id": "f2"}
+    tasks["c"] = {"status": "processing", "file_id": "f1"}
+    assert list(tasks.for_file("f1")) == ["a", "c"]
+
+
+def test_version_table_round_trip(db_path):
+    versions = VersionTable(StateDatabase(db_path))
+    versions["f1"] = {"path": "processed/f1/out.mp4", "step": "add_captions"}
+    versions["f1"] = {"path": "processed/f1/out2.mp4", "step": "add_music"}
+    assert versions["f1"]["step"] == "add_music"
+    assert versions.pop("f1")["path"] == "processed/f1/out2.mp4"
+    assert "f1" not in versions
+
@@ -0,0 +1,33 @@
+from app.services import subtitles
+
+
+def test_timestamps():
+    assert subtitles.ass_timestamp(3725.456) == "1:02:05.46"
+    assert subtitles.srt_timestamp(3725.456) == "01:02:05,456"
+    assert subtitles.ass_timestamp(-1) == "0:00:00.00"
+
+
+def test_write_ass_places_segments_on_the_output_timeline(tmp_path):
+    segments = [
+        {"start": 10.0, "end": 12.5, "text": " Hello {world}"},
+        {"start": 20.0, "end": 21.0, "text": "  "},
+        {"start": 30.0, "end": 31.0, "text": "Bye"},
+    ]
+    path = subtitles.write_ass(tmp_path / "captions.ass", segments, [0.0, 2.5, 3.5], (1280, 720), font_size=32)
+    dialogue = [line for line in path.read_text().splitlines() if line.startswith("Dialogue:")]
+    assert dialogue == [
+        "Dialogue: 0,0:00:00.00,0:00:02.50,Caption,,0,0,0,,Hello (world)",
+        "Dialogue: 0,0:00:03.50,0:00:04.50,Caption,,0,0,0,,Bye",
+    ]
+    assert "PlayResX: 1280" in path.read_text()
+    assert "Style: Caption,Arial,32," in path.read_text()
+
+
+def test_write_srt_numbers_non_empty_captions(tmp_path):
+    segments = [{"start": 0.0, "end": 1.0, "text": ""}, {"start": 1.0, "end": 2.0, "text": "Hi"}]
+    text = subtitles.write_srt(tmp_path / "captions.srt", segments, [0.0, 1.0]).read_text()
+    assert text == "1\n00:00:01,000 --> 00:00:02,000\nHi\n"
+
+
+def test_subtitles_filter_escapes_the_path():
+    assert subtitles.subtitles_filter("C:\\tmp\\it's.ass") == "subtitles='C\\:/tmp/it\\'s.ass'"
@@ -0,0 +1,39 @@
+import random
+
+from app.services.text_matching import KeywordMatcher, normalize_text
+
+
+def test_normalize_text_drops_case_and_punctuation():
+    assert normalize_text("  Hello,   WORLD!  It's 2024 ") == "hello world it s 2024"
+
+
+def test_keywords_match_normalized_text_as_substrings():
+    matcher = KeywordMatcher(["Dog", "hot-dog", "cat"])
+    text = normalize_text("My dogs love hot dogs, not cats.")
+    found = [(text[start:end], matcher.keywords[idx]) for start, end, idx in matcher.finditer(text)]
+    assert found == [("dog", "Dog"), ("hot dog", "hot-dog"), ("dog", "Dog"), ("cat", "cat")]
+
+
+def test_overlapping_and_nested_keywords_all_match():
+    matcher = KeywordMatcher(["he", "she", "his", "hers"])
+    matches = sorted(matcher.finditer("ushers"))
+    assert matches == [(1, 4, 1), (2, 4, 0), (2, 6, 3)]
+
+
+def test_blank_keywords_never_match():
+    matcher = KeywordMatcher(["", "!!", "a"])
+    assert [idx for _, _, idx in matcher.finditer("banana")] == [2, 2, 2]
+
+
+def test_matches_agree_with_brute_force_search():
+    rng = random.Random(0)
+    keywords = ["".join(rng.choice("ab ") for _ in range(rng.randint(1, 4))).strip() or "a" for _ in range(20)]
+    text = "".join(rng.choice("ab ") for _ in range(300))
+    matcher = KeywordMatcher(keywords)
+    expected = sorted(
+        (start, start + len(kw), idx)
+        for idx, kw in enumerate(normalize_text(k) for k in keywords)
+        for start in range(len(text) - len(kw) + 1)
+        if text.startswith(kw, start)
+    )
+    assert sorted(matcher.finditer(text)) == expected
@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+from app.services.transcript_store import TranscriptStore
+
+TRANSCRIPT = {"text": " Hi", "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": " Hi"}], "language": "en"}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TranscriptStore(str(tmp_path / "transcripts"), max_bytes=1000)
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "in.mp4"
+    path.write_bytes(b"video")
+    return path
+
+
+def test_key_is_the_same_for_path_and_str_callers(store, source, tmp_path):
+    key = store.key_for(source, "base", {"language": None})
+    assert key == store.key_for(str(source), "base", {"language": None})
+
+    # Keyed on content, so a copy of the upload hits too
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(source.read_bytes())
+    assert key == store.key_for(copy, "base", {"language": None})
+
+
+def test_model_and_options_change_the_key(store, source):
+    key = store.key_for(source, "base", {"language": None, "word_timestamps": True})
+    assert key == store.key_for(source, "base", {"word_timestamps": True, "language": None})
+    assert key != store.key_for(source, "small", {"language": None, "word_timestamps": True})
+    assert key != store.key_for(source, "base", {"language": "en", "word_timestamps": True})
+    assert key != store.key_for(source, "base", {"language": None, "word_timestamps": True, "chunked": 30.0})
+
+
+def test_put_then_get(store, source):
+    key = store.key_for(source, "base", {})
+    assert store.get(key) is None
+    store.put(key, TRANSCRIPT)
+    assert store.get(key) == TRANSCRIPT
+    assert not list(store.cache_dir.glob("*.tmp"))
+
+
+def test_least_recently_used_entries_are_evicted(store):
+    padded = {**TRANSCRIPT, "text": "x" * 200}
+    for i, key in enumerate(("used", "old", "new")):
+        store.put(key, padded)
+        past = time.time() - 100 + i
+        os.utime(store.cache_dir / f"{key}.json", (past, past))
+    # "used" was stored first, but a hit makes it the most recently used
+    assert store.get("used") is not None
+    store.put("newest", padded)
+    assert sorted(p.stem for p in store.cache_dir.glob("*.json")) == ["new", "newest", "used"]
+    assert sum(p.stat().st_size for p in store.cache_dir.glob("*.json")) <= store.max_bytes
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app import worker
+from app.config import Settings
+from app.services.cancellation import CancelToken
+from app.services.ffmpeg_tools import ffmpeg_binary
+from app.services.job_queue import JobQueue
+from app.services.video_processor import VideoProcessor
+
+SEGMENTS = [
+    {"id": 0, "start": 1.0, "end": 4.0, "text": " First take of the intro line here",
+     "words": [{"word": " First", "start": 1.0, "end": 1.5}]},
+    {"id": 1, "start": 5.0, "end": 9.0, "text": " Something else entirely is said now",
+     "words": [{"word": " Something", "start": 5.0, "end": 5.6}]},
+]
+
+
+class StubTranscription:
+    """Stands in for the Whisper workers; counts how often the model would run"""
+
+    parallelism = 1
+
+    def __init__(self, segments=SEGMENTS, delay=0.0):
+        self.segments = segments
+        self.delay = delay
+        self.calls = 0
+
+    async def transcribe(self, window, model_name, options):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return {"text": "", "segments": self.segments, "language": "en"}
+
+
+def make_clip(path, seconds=10, size="640x360"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run([
+        ffmpeg_binary(), "-v", "error", "-f", "lavfi", "-i", f"testsrc=size={size}:rate=25",
+        "-f", "lavfi", "-i", "sine=sample_rate=44100", "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-c:a", "aac", str(path)
+    ], check=True)
+    return path
+
+
+@pytest.fixture
+def processor(tmp_path):
+    settings = Settings(
+        UPLOAD_DIR=str(tmp_path / "uploads"),
+        PROCESSED_DIR=str(tmp_path / "processed"),
+        TRANSCRIPT_CACHE_DIR=str(tmp_path / "transcripts"),
+        AUDIO_CACHE_DIR=str(tmp_path / "audio_cache"),
+        RENDER_CACHE_DIR=str(tmp_path / "render_cache"),
+        STATE_DB_PATH=":memory:",
+        PREVIEW_ENABLED=False,
+        DEFAULT_CUT_MODE="reencode",
+    )
+    make_clip(tmp_path / "uploads" / "f1" / "in.mp4")
+    return VideoProcessor(settings, transcription=StubTranscription())
+
+
+PARAMS = {"filename": "in.mp4", "dedupe_mode": "transcript"}
+
+
+def test_reencode_leaves_the_event_loop_free_to_renew_the_lease(processor):
+    renewals = []
+    queue = SimpleNamespace(lease_seconds=0.3, renew=renewals.append)
+
+    async def scenario():
+        lease = asyncio.create_task(worker.keep_lease(queue, "t1"))
+        try:
+            await processor.process_remove_duplicates("t1", "f1", PARAMS)
+        finally:
+            lease.cancel()
+
+    asyncio.run(scenario())
+    assert processor.active_tasks["t1"]["status"] == "completed"
+    # A lease of 0.3s renewed every 0.1s; a blocked loop would renew at most once, after the encode
+    assert len(renewals) >= 5
+
+
+def test_cancelling_a_running_reencode_stops_the_job(processor, monkeypatch):
+    monkeypatch.setattr(worker, "get_janitor", lambda: SimpleNamespace(release=lambda file_id: 0))
+    queue = JobQueue(processor.active_tasks.db)
+    processor.active_tasks["t1"] = {"status": "processing", "file_id": "f1"}
+    queue.enqueue("t1", "remove_duplicates", {"params": PARAMS}, file_id="f1")
+    job = queue.claim("w1")
+
+    async def scenario():
+        token = CancelToken("t1")
+        task = asyncio.create_task(worker.run_job(job, processor, queue, token))
+        while (processor.active_tasks["t1"].get("progress") or {}).get("stage") not in ("encode", "encode_audio"):
+            assert not task.done(), "the encode finished before the loop could see it running"
+            await asyncio.sleep(0.02)
+        # DELETE /api/process/t1, then what serve() does on its next pass
+        assert queue.cancel("t1") == "cancelling"
+        for job_id in queue.cancel_requested(["t1"]):
+            token.cancel()
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert processor.active_tasks["t1"]["status"] == "cancelled"
+    assert queue.get("t1")["state"] == "cancelled"
+    assert "f1" not in processor.file_versions
+    assert not list(Path(processor.settings.PROCESSED_DIR, "f1").glob("processed_*.mp4"))
+
+
+def test_concurrent_transcriptions_of_one_file_share_a_whisper_run(processor):
+    processor.transcription = stub = StubTranscription(delay=0.2)
+    path = Path(processor.settings.UPLOAD_DIR, "f1", "in.mp4")
+
+    async def scenario():
+        # The step and its preview both need the transcript of a fresh upload
+        return await asyncio.gather(processor.transcribe_video(path), processor.transcribe_video(str(path)))
+
+    step, preview = asyncio.run(scenario())
+    assert step == preview
+    assert stub.calls == 1
+
+
+def test_waiter_transcribes_itself_when_the_first_caller_is_stopped(processor):
+    processor.transcription = stub = StubTranscription(delay=0.2)
+    path = Path(processor.settings.UPLOAD_DIR, "f1", "in.mp4")
+
+    async def scenario():
+        preview = asyncio.create_task(processor.transcribe_video(path))
+        await asyncio.sleep(0.1)
+        step = asyncio.create_task(processor.transcribe_video(path))
+        await asyncio.sleep(0.05)
+        preview.cancel()
+        return await step
+
+    assert asyncio.run(scenario())["segments"] == SEGMENTS
+    assert stub.calls == 2
+
+
+def test_cut_segments_are_stored_on_the_output_timeline(processor):
+    asyncio.run(processor.process_remove_duplicates("t1", "f1", PARAMS))
+    version = processor.file_versions["f1"]
+    with open(version["segments_path"]) as f:
+        stored = json.load(f)
+    assert [(s["start"], s["end"]) for s in stored] == [(0.0, 3.0), (3.0, 7.0)]
+    assert [s["words"][0]["start"] for s in stored] == [0.0, 3.0]
+
+    # A fused caption/B-roll plan on the cut video reads those times as they are
+    plan = [{"name": "add_captions", "args": {}}]
+    segments = asyncio.run(processor.plan_segments("f1", Path(version["output_path"]), plan))
+    assert segments == stored
+    split = processor.find_split_points(segments, ["something"])
+    assert split[0]["split_time"] == 3.0
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("VISUAL_DEDUPE_FPS", 4.0),
+    ("VISUAL_DEDUPE_MIN_SECONDS", 9.0),
+    ("VISUAL_DEDUPE_MAX_DISTANCE", 1),
+    ("TRANSCRIBE_CHUNKED", False),
+    ("TRANSCRIBE_CHUNK_SECONDS", 30.0),
+    ("TRANSCRIBE_CHUNK_MIN_SECONDS", 5.0),
+    ("DEDUPE_SCOPE", "transcript"),
+    ("WHISPER_MODEL", "small"),
+    ("DEFAULT_DUP_THRESH", 0.5),
+])
+def test_render_cache_key_changes_with_settings_the_output_reads(processor, setting, value):
+    key = processor.render_cache_key("f1", "remove_duplicates", PARAMS)
+    processor.settings = processor.settings.model_copy(update={setting: value})
+    assert processor.render_cache_key("f1", "remove_duplicates", PARAMS) != key
+
+
+def test_render_cache_key_ignores_scheduling_settings(processor):
+    key = processor.render_cache_key("f1", "remove_duplicates", PARAMS)
+    processor.settings = processor.settings.model_copy(update={"WORKER_CONCURRENCY": 8, "PREVIEW_ENABLED": True})
+    assert processor.render_cache_key("f1", "remove_duplicates", PARAMS) == key
+
+
+@pytest.mark.parametrize("render_mode", ["single", "chunked"])
+def test_timeline_caption_tracks_stay_private_to_the_render(processor, tmp_path, render_mode):
+    processor.settings = processor.settings.model_copy(update={
+        "DEFAULT_CAPTION_BACKEND": "ass", "RENDER_CHUNK_WORKERS": 2, "RENDER_CHUNK_MIN_SECONDS": 0.0,
+    })
+    source = make_clip(tmp_path / "long.mp4", seconds=20, size="320x180")
+    output_path = Path(processor.settings.PROCESSED_DIR, "f1", "processed_long.mp4")
+    output_path.parent.mkdir(parents=True)
+    plan = [{"name": "add_captions", "args": {}}]
+
+    processor.render_timeline(source, SEGMENTS, plan, output_path, processor.encoder_profile({}), render_mode)
+    assert output_path.exists()
+    # No .ass/.srt next to the output for another render of the file to overwrite, nor a leftover track dir
+    assert [p.name for p in output_path.parent.iterdir() if p.suffix in (".ass", ".srt") or p.is_dir()] == []
@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.services import visual_dedupe
+
+FPS = 2.0
+
+
+def noisy(base: int, rng, flips: int = 1) -> np.uint64:
+    """base with up to `flips` random bits changed, like consecutive hashes of one scene"""
+    for bit in rng.choice(64, size=rng.integers(0, flips + 1), replace=False):
+        base ^= 1 << int(bit)
+    return np.uint64(base)
+
+
+def random_hashes(rng, n: int) -> list:
+    return [int(h) for h in rng.integers(0, 1 << 63, size=n, dtype=np.int64)]
+
+
+def test_static_single_take_is_not_cut():
+    for flips in (1, 3):
+        rng = np.random.default_rng(flips)
+        base = random_hashes(rng, 1)[0]
+        # Ten minutes of a talking head: every sample a few bits away from one scene hash
+        hashes = np.array([noisy(base, rng, flips) for _ in range(int(600 * FPS))], dtype=np.uint64)
+        usable = np.ones(len(hashes), dtype=bool)
+        assert visual_dedupe.repeated_ranges(hashes, usable, FPS) == []
+
+
+def test_repeated_moving_footage_is_found():
+    rng = np.random.default_rng(1)
+    take = random_hashes(rng, 10)
+    filler = random_hashes(rng, 8)
+    sequence = take + filler + [int(noisy(h, rng)) for h in take]
+    hashes = np.array(sequence, dtype=np.uint64)
+    usable = np.ones(len(hashes), dtype=bool)
+    assert visual_dedupe.repeated_ranges(hashes, usable, FPS) == [(0.0, 5.0)]
+
+
+def test_unusable_frames_never_match():
+    hashes = np.zeros(40, dtype=np.uint64)
+    usable = np.zeros(40, dtype=bool)
+    assert visual_dedupe.repeated_ranges(hashes, usable, FPS) == []
+
+
+def test_phash_ignores_brightness_and_flags_flat_frames():
+    rng = np.random.default_rng(2)
+    frame = rng.integers(0, 200, size=(32, 32)).astype(np.uint8)
+    flat = np.full((32, 32), 128, dtype=np.uint8)
+    hashes, usable = visual_dedupe.phash_batch(np.stack([frame, frame + 40, flat]))
+    assert visual_dedupe.hamming(hashes[0], hashes[1]) == 0
+    assert usable.tolist() == [True, True, False]
+
+
+def test_subtract_ranges():
+    assert visual_dedupe.subtract_ranges(0.0, 10.0, [(2.0, 3.0), (8.0, 12.0)]) == [(0.0, 2.0), (3.0, 8.0)]
+    assert visual_dedupe.merge_time_ranges([(3, 5), (0, 2), (1, 4)]) == [(0, 5)]